@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Trace which installed packages the inference handler actually imports at runtime
+
+Loads deployment/04-sagemaker/code/inference.fixed.py and calls model_fn against
+a model directory, recording every module imported (sys.modules diff) and every
+import attempted (meta path hook). The result is cross-referenced with
+REQUIREMENTS from test_requirements.py to produce a minimal runtime
+requirements set and a list of packages that are safe to remove from the
+container image.
+
+The trace only means something if model_fn really loads SAM 3 and SAM 3D, so
+point --model-dir at the extracted model.tar.gz (real checkpoints). Without it
+a directory of empty stub checkpoints is used, which only works where the
+libraries accept them. Either way the tool aborts, writing nothing, when
+model_fn returns without both models loaded.
+
+Usage:
+    python analyze_runtime_imports.py [--model-dir DIR]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import importlib.util
+from importlib import metadata
+from datetime import datetime
+
+from test_requirements import REQUIREMENTS, get_package_name
+from analyze_library_usage import get_import_name
+
+CODE_DIR = "deployment/04-sagemaker/code"
+INFERENCE_SCRIPT = CODE_DIR + "/inference.fixed.py"
+
+# Stub checkpoint layout mirroring the model.tar.gz produced for SageMaker
+STUB_CHECKPOINTS = [
+    "sam3/sam3.pt",
+    "sam3d/checkpoints/pipeline.ckpt",
+]
+
+# Models model_fn must load for the trace to cover the real load path
+REQUIRED_MODELS = ["sam3_predictor", "sam3d_model"]
+WARMUP_THREAD_NAME = "import-warmup"  # inference.fixed.warm_imports
+
+
+class ImportRecorder:
+    """Meta path finder that records attempted imports without resolving them"""
+
+    def __init__(self):
+        self.attempted = set()
+
+    def find_spec(self, fullname, path=None, target=None):
+        self.attempted.add(fullname)
+        return None  # Defer to the regular finders
+
+
+def normalize(name):
+    """Normalize a distribution name for comparison (PEP 503)"""
+    return name.lower().replace("_", "-").replace(".", "-")
+
+
+def create_stub_model_dir(root):
+    """Create a model directory with empty checkpoint files"""
+    for relpath in STUB_CHECKPOINTS:
+        path = os.path.join(root, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "wb").close()
+    return root
+
+
+def local_modules(code_dir):
+    """Top-level module names of the handler's sibling modules in code_dir"""
+    return {
+        os.path.splitext(name)[0]
+        for name in os.listdir(code_dir)
+        if name.endswith(".py")
+    }
+
+
+def join_warmup_threads():
+    """Wait for the handler's background import warm-up, so its imports are recorded."""
+    for thread in threading.enumerate():
+        if thread.name == WARMUP_THREAD_NAME:
+            thread.join()
+
+
+def trace_model_fn(script_path, model_dir=None):
+    """
+    Import the inference script and run model_fn on model_dir (stub checkpoints when None).
+
+    The script's directory is put on sys.path, as SageMaker does for the
+    code/ directory, so the handler's own modules resolve; they are not
+    reported as third-party imports.
+
+    Returns:
+        tuple: (set of loaded top-level modules, set of attempted top-level modules)
+
+    Raises:
+        RuntimeError: If model_fn did not load every model in REQUIRED_MODELS
+    """
+    code_dir = os.path.dirname(os.path.abspath(script_path))
+    baseline = set(sys.modules)
+    recorder = ImportRecorder()
+    sys.path.insert(0, code_dir)
+    sys.meta_path.insert(0, recorder)
+
+    try:
+        spec = importlib.util.spec_from_file_location("gen3d_inference", script_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        if model_dir is not None:
+            models = module.model_fn(model_dir)
+        else:
+            with tempfile.TemporaryDirectory() as stub_dir:
+                models = module.model_fn(create_stub_model_dir(stub_dir))
+        join_warmup_threads()
+    finally:
+        sys.meta_path.remove(recorder)
+        sys.path.remove(code_dir)
+
+    missing = [name for name in REQUIRED_MODELS if models.get(name) is None]
+    if missing:
+        raise RuntimeError(
+            f"model_fn did not load {', '.join(missing)}; the trace would miss the imports of the "
+            f"real model load. Run with --model-dir pointing at real checkpoints in an environment "
+            f"with the sam3 and sam3d packages installed."
+        )
+
+    loaded = {name.split(".")[0] for name in set(sys.modules) - baseline}
+    attempted = {name.split(".")[0] for name in recorder.attempted}
+    stdlib = set(sys.stdlib_module_names) | set(sys.builtin_module_names)
+    loaded = {m for m in loaded - stdlib if not m.startswith("_")}
+    attempted = {m for m in attempted - stdlib if not m.startswith("_")}
+    local = local_modules(code_dir) | {"gen3d_inference"}
+    loaded -= local
+    attempted -= local
+    return loaded, attempted
+
+
+def resolve_distributions(modules):
+    """Map top-level module names to installed distribution names"""
+    mapping = metadata.packages_distributions()
+    dists = set()
+    for module in modules:
+        for dist in mapping.get(module, []):
+            dists.add(normalize(dist))
+    return dists
+
+
+def classify_requirements(loaded, attempted):
+    """
+    Split REQUIREMENTS into packages needed at runtime and packages safe to remove.
+
+    A requirement is needed if its installed distribution owns a loaded module,
+    or if its import name was attempted (even when the import failed locally).
+    """
+    loaded_dists = resolve_distributions(loaded)
+    modules = {m.lower() for m in loaded | attempted}
+
+    needed, removable = [], []
+    for requirement in REQUIREMENTS:
+        package_name = get_package_name(requirement)
+        import_name = get_import_name(package_name).lower()
+        if normalize(package_name) in loaded_dists or import_name in modules:
+            needed.append(requirement)
+        else:
+            removable.append(requirement)
+    return needed, removable
+
+
+def generate_report(loaded, attempted, needed, removable):
+    """Generate markdown report"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    missing = sorted(attempted - loaded)
+
+    report = f"""# Gen3D Runtime Import Analysis
+
+**Generated**: {timestamp}
+**Python Version**: {sys.version}
+**Traced Entry Point**: `{INFERENCE_SCRIPT}` (`model_fn` with stub checkpoints)
+
+## Summary
+
+- **Third-party modules loaded**: {len(loaded)}
+- **Imports attempted but not available**: {len(missing)}
+- **Requirements needed at runtime**: {len(needed)}/{len(REQUIREMENTS)}
+- **Requirements safe to remove**: {len(removable)}/{len(REQUIREMENTS)}
+
+## Loaded Modules
+
+"""
+    for module in sorted(loaded):
+        report += f"- {module}\n"
+
+    if missing:
+        report += "\n## Attempted But Not Installed\n\n"
+        for module in missing:
+            report += f"- {module}\n"
+
+    report += "\n## Minimal Runtime Requirements\n\n"
+    for requirement in needed:
+        report += f"- `{requirement}`\n"
+
+    report += "\n## Safe To Remove\n\n"
+    for requirement in removable:
+        report += f"- `{requirement}`\n"
+
+    report += "\n*Note: only imports reachable from `model_fn` are traced. Modules that the "
+    report += "sam3/sam3d libraries import lazily at request time are not captured; run a "
+    report += "test invocation before removing packages from the production image.*\n"
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", help="extracted model.tar.gz with real checkpoints (default: stubs)")
+    args = parser.parse_args()
+
+    print("Tracing runtime imports of the inference handler...")
+    try:
+        loaded, attempted = trace_model_fn(INFERENCE_SCRIPT, args.model_dir)
+    except RuntimeError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+    needed, removable = classify_requirements(loaded, attempted)
+
+    with open("runtime_requirements.txt", "w") as f:
+        f.write("\n".join(needed) + "\n")
+    print(f"✓ Minimal requirements saved to runtime_requirements.txt ({len(needed)} packages)")
+
+    with open("removable_requirements.txt", "w") as f:
+        f.write("\n".join(removable) + "\n")
+    print(f"✓ Removable packages saved to removable_requirements.txt ({len(removable)} packages)")
+
+    report = generate_report(loaded, attempted, needed, removable)
+    with open("docs/SAM3D-Runtime-Import-Analysis.md", "w") as f:
+        f.write(report)
+    print("✓ Report saved to docs/SAM3D-Runtime-Import-Analysis.md")
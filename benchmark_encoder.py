@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark the SAM3 image encoder in eager vs compiled mode on CPU
+
+Builds the encoder from the sam3 (or segment_anything) registry, optionally
+with a checkpoint, and measures per-image latency for eager execution and for
+each compiled mode in compiled_encoder. Each compiled encoder's features are
+compared with the eager features on the same input; the script exits non-zero
+if any compiled mode that built successfully falls outside tolerance.
+
+Each mode runs in a fresh interpreter (the encoder's 1024x1024 activations
+are several GB on CPU). The TorchScript mode runs twice against the same
+cache directory: the second run loads the saved trace, as a container restart
+would.
+
+Usage:
+    python benchmark_encoder.py [model_type] [checkpoint]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+CODE_DIR = "deployment/04-sagemaker/code"
+WARMUP_RUNS = 1
+RUNS = 3
+
+MEASURE_SNIPPET = """
+import json, os, statistics, sys, time
+sys.path.insert(0, {code_dir!r})
+import torch
+import compiled_encoder
+try:
+    from sam3 import sam_model_registry
+except ImportError:
+    from segment_anything import sam_model_registry
+
+mode, cache_dir = {mode!r}, {cache_dir!r}
+torch.manual_seed(0)  # Same random weights in every process when no checkpoint is given
+encoder = sam_model_registry[{model_type!r}](checkpoint={checkpoint!r}).image_encoder.eval()
+report = {{"compiled": mode == "eager"}}
+if mode != "eager":
+    encoder, report = compiled_encoder.compile_encoder(
+        encoder, mode, "cpu", search_dirs=[cache_dir], cache_dir=cache_dir, checkpoint={checkpoint!r}
+    )
+
+result = {{"build_seconds": report.get("seconds", 0.0), "compiled": report["compiled"],
+           "error": report.get("error")}}
+if report["compiled"]:
+    x = compiled_encoder.example_input(encoder, "cpu", seed=1)  # Differs from the verification input
+    with torch.no_grad():
+        for _ in range({warmup}):
+            encoder(x)
+        timings = []
+        for _ in range({runs}):
+            start = time.perf_counter()
+            features = encoder(x)
+            timings.append(time.perf_counter() - start)
+    result["seconds"] = statistics.median(timings)
+
+    reference_path = os.path.join(cache_dir, "eager_features.pt")
+    if mode == "eager":
+        torch.save(features, reference_path)
+    else:
+        match, max_diff = compiled_encoder.outputs_match(torch.load(reference_path), features)
+        result.update(match=match, max_abs_diff=max_diff)
+print(json.dumps(result))
+"""
+
+
+def measure(mode, model_type, checkpoint, cache_dir):
+    snippet = MEASURE_SNIPPET.format(
+        code_dir=CODE_DIR, mode=mode, cache_dir=cache_dir, model_type=model_type,
+        checkpoint=checkpoint, warmup=WARMUP_RUNS, runs=RUNS
+    )
+    result = subprocess.run([sys.executable, "-W", "ignore", "-c", snippet],
+                            capture_output=True, text=True, timeout=3600)
+    if result.returncode != 0:
+        raise RuntimeError(f"Measurement of {mode} failed (code {result.returncode}):\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    model_type = sys.argv[1] if len(sys.argv) > 1 else "vit_b"
+    checkpoint = os.path.abspath(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    print("=" * 60)
+    print("SAM3 Encoder Benchmark (CPU)")
+    print("=" * 60)
+    print(f"Model: {model_type}; checkpoint: {checkpoint or 'random weights'}\n")
+
+    sys.path.insert(0, CODE_DIR)
+    from compiled_encoder import ATOL, MODES, RTOL
+
+    failed = False
+    with tempfile.TemporaryDirectory() as cache_dir:
+        eager = measure("eager", model_type, checkpoint, cache_dir)
+        print(f"{'eager':<22} {eager['seconds'] * 1000:8.0f} ms")
+
+        runs = [(mode, mode) for mode in MODES]
+        runs.insert(MODES.index("torchscript") + 1, ("torchscript", "torchscript (reload)"))
+        for mode, label in runs:
+            r = measure(mode, model_type, checkpoint, cache_dir)
+            if not r["compiled"]:
+                print(f"{label:<22} unavailable ({r['error']}) - eager fallback")
+                continue
+            failed |= not r["match"]
+            print(f"{label:<22} {r['seconds'] * 1000:8.0f} ms  speedup {eager['seconds'] / r['seconds']:.2f}x  "
+                  f"build {r['build_seconds']:.1f} s  max abs diff {r['max_abs_diff']:.2e} "
+                  f"{'✓' if r['match'] else '✗'}")
+
+    if failed:
+        print(f"✗ Compiled features differ from eager beyond rtol={RTOL}, atol={ATOL}")
+        sys.exit(1)
+    print(f"✓ Compiled features match eager within rtol={RTOL}, atol={ATOL}")
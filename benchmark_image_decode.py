@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark the image ingestion path against the original full-resolution decode
+
+For each sample image in images/, measures decode time and peak memory for:
+- baseline: Image.open(BytesIO(data)).convert("RGB") followed by np.array(image)
+- fast: image_io.decode_image (format sniffing, JPEG draft mode, no extra copies)
+
+Each measurement runs in a fresh interpreter so peak RSS is not polluted by
+earlier runs. Results are reported per megapixel of the source image.
+
+Usage:
+    python benchmark_image_decode.py [target_size]
+"""
+import json
+import os
+import subprocess
+import sys
+
+CODE_DIR = "deployment/04-sagemaker/code"
+IMAGES_DIR = "images"
+RUNS = 5
+
+MEASURE_SNIPPET = """
+import json, resource, statistics, sys, time
+from io import BytesIO
+sys.path.insert(0, {code_dir!r})
+import numpy as np
+from PIL import Image
+import image_io
+
+with open({path!r}, "rb") as f:
+    data = f.read()
+
+def baseline():
+    image = Image.open(BytesIO(data)).convert("RGB")
+    return np.array(image)
+
+def fast():
+    return image_io.decode_image(data, target_size={target_size})[0]
+
+decode = {{"baseline": baseline, "fast": fast}}[{method!r}]
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+array = decode()
+rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+del array
+
+timings = []
+for _ in range({runs}):
+    start = time.perf_counter()
+    decode()
+    timings.append(time.perf_counter() - start)
+
+print(json.dumps({{
+    "seconds": statistics.median(timings),
+    "peak_kb": rss_after - rss_before,
+    "shape": list(decode().shape),
+}}))
+"""
+
+
+def measure(path, method, target_size):
+    """Run one decode method on one image in a fresh interpreter."""
+    snippet = MEASURE_SNIPPET.format(
+        code_dir=CODE_DIR, path=path, method=method, target_size=target_size, runs=RUNS
+    )
+    result = subprocess.run([sys.executable, "-c", snippet], capture_output=True, text=True, timeout=300)
+    if result.returncode != 0:
+        raise RuntimeError(f"Decode benchmark failed for {path} ({method}):\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    from PIL import Image
+
+    target_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+
+    print("=" * 60)
+    print("Gen3D Image Decode Benchmark")
+    print("=" * 60)
+    print(f"Target size: {target_size} px, median of {RUNS} runs\n")
+
+    header = f"{'Image':<14} {'MP':>5} {'Method':<9} {'Shape':<16} {'ms':>7} {'ms/MP':>7} {'MB/MP':>7}"
+    print(header)
+    print("-" * len(header))
+
+    for name in sorted(os.listdir(IMAGES_DIR)):
+        path = os.path.join(IMAGES_DIR, name)
+        with Image.open(path) as image:
+            megapixels = image.size[0] * image.size[1] / 1e6
+
+        for method in ["baseline", "fast"]:
+            r = measure(path, method, target_size)
+            ms = r["seconds"] * 1000
+            peak_mb = r["peak_kb"] / 1024
+            shape = "x".join(str(d) for d in r["shape"])
+            print(f"{name:<14} {megapixels:>5.1f} {method:<9} {shape:<16} {ms:>7.1f} "
+                  f"{ms / megapixels:>7.1f} {peak_mb / megapixels:>7.2f}")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark surface meshing against dense point cloud output per quality preset
+
+For each quality preset, samples a synthetic reconstruction (points on a
+noisy torus with per-point colors), meshes it with the preset's surface_mesh
+defaults and serializes both the point cloud and the mesh with the handler's
+PLY writer. Prints vertex/face counts, PLY sizes and meshing time.
+
+Usage:
+    python benchmark_meshing.py [points_scale]
+"""
+import logging
+import sys
+import time
+
+import numpy as np
+
+from handler_stubs import load_handler
+
+# Points per reconstruction, per preset
+PRESET_POINTS = {"fast": 250000, "balanced": 1000000, "high": 2000000}
+MAJOR_RADIUS = 1.0
+MINOR_RADIUS = 0.35
+NOISE = 0.003
+
+
+def torus_point_cloud(num_points, seed=0):
+    """Points sampled uniformly by angle on a torus surface, with colors."""
+    rng = np.random.default_rng(seed)
+    u, v = rng.uniform(0, 2 * np.pi, size=(2, num_points))
+    ring = MAJOR_RADIUS + MINOR_RADIUS * np.cos(v)
+    points = np.stack([ring * np.cos(u), ring * np.sin(u), MINOR_RADIUS * np.sin(v)], axis=1)
+    points += rng.normal(scale=NOISE, size=points.shape)
+    colors = rng.integers(0, 255, size=(num_points, 3), dtype=np.uint8)
+    return {"points": points.astype(np.float32), "colors": colors}
+
+
+if __name__ == "__main__":
+    scale = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+
+    handler = load_handler()
+    logging.getLogger(handler.__name__).setLevel(logging.WARNING)
+    import surface_mesh
+    logging.getLogger(surface_mesh.__name__).setLevel(logging.WARNING)
+
+    print("=" * 60)
+    print("Gen3D Surface Meshing Benchmark")
+    print("=" * 60)
+    print(f"{'preset':<9} {'points':>9} {'cloud MB':>9} {'res':>4} {'vertices':>9} {'faces':>8} "
+          f"{'mesh MB':>8} {'ratio':>6} {'mesh s':>7}")
+
+    for preset, num_points in PRESET_POINTS.items():
+        point_cloud = torus_point_cloud(int(num_points * scale))
+        cloud_size = len(handler.convert_to_ply(point_cloud))
+
+        params = surface_mesh.parse_options(True, preset)
+        start = time.perf_counter()
+        mesh, report = surface_mesh.mesh_point_cloud(point_cloud, params)
+        seconds = time.perf_counter() - start
+        mesh_size = len(handler.convert_to_ply(mesh))
+
+        print(f"{preset:<9} {len(point_cloud['points']):>9} {cloud_size / 1024**2:>9.2f} {params['resolution']:>4} "
+              f"{report['vertices']:>9} {report['faces']:>8} {mesh_size / 1024**2:>8.2f} "
+              f"{cloud_size / mesh_size:>5.0f}x {seconds:>7.2f}")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark end-to-end latency for small inputs per request content type
+
+Runs input_fn -> predict_fn -> output_fn of the inference handler with a
+synthetic S3 (fixed per-request latency) and fast synthetic models, for a
+small image and mask. Compares the S3 round trip with JSON keys (stdlib json,
+as before, and orjson) against inline inputs and outputs sent as JSON
+(base64), msgpack, multipart/form-data and x-npy.
+
+Usage:
+    python benchmark_payloads.py [runs]
+"""
+import base64
+import io
+import json
+import logging
+import statistics
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from handler_stubs import SyntheticS3, load_handler, synthetic_models
+
+S3_LATENCY = 0.03   # seconds per GET/PUT
+IMAGE_SIZE = 256    # pixels per side
+NUM_POINTS = 20000  # points per reconstruction
+BOUNDARY = "gen3d-benchmark-boundary"
+
+
+def sample_inputs():
+    """Small JPEG image and PNG mask (bytes), plus the decoded arrays."""
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 255, size=(IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.uint8)
+    mask = np.zeros((IMAGE_SIZE, IMAGE_SIZE), dtype=np.uint8)
+    mask[IMAGE_SIZE // 4:3 * IMAGE_SIZE // 4, IMAGE_SIZE // 4:3 * IMAGE_SIZE // 4] = 255
+
+    image_buffer, mask_buffer = io.BytesIO(), io.BytesIO()
+    Image.fromarray(image).save(image_buffer, format="JPEG", quality=90)
+    Image.fromarray(mask).save(mask_buffer, format="PNG")
+    return image_buffer.getvalue(), mask_buffer.getvalue(), image, mask
+
+
+def multipart_body(fields, files):
+    """Encode a multipart/form-data body."""
+    parts = [
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"request\"\r\n"
+        f"Content-Type: application/json\r\n\r\n{json.dumps(fields)}\r\n".encode()
+    ]
+    for name, data in files.items():
+        parts.append(
+            f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"{name}\"; filename=\"{name}\"\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n".encode() + data + b"\r\n"
+        )
+    parts.append(f"--{BOUNDARY}--\r\n".encode())
+    return b"".join(parts)
+
+
+def build_requests(task, image_bytes, mask_bytes, image, mask):
+    """(label, body, content type, accept) per transport for one task."""
+    import msgpack
+
+    fields = {"task": task, "bucket": "bench", "session_id": "s", "user_id": "u"}
+    files = {"image": image_bytes}
+    keys = {"image_s3_key": "users/u/sessions/s/image.jpg"}
+    if task == "generate_3d":
+        files["mask"] = mask_bytes
+        keys["mask_s3_key"] = "users/u/sessions/s/mask.png"
+
+    npy = io.BytesIO()
+    np.save(npy, np.dstack([image, mask]) if task == "generate_3d" else image)
+    npy_params = "; ".join(f"{k}={v}" for k, v in fields.items())
+
+    inline_json = dict(fields, **{name: base64.b64encode(data).decode() for name, data in files.items()})
+    return [
+        ("json + S3 (stdlib json)", json.dumps(dict(fields, **keys)), "application/json", "application/json"),
+        ("json + S3 (orjson)", json.dumps(dict(fields, **keys)), "application/json", "application/json"),
+        ("json inline (base64)", json.dumps(inline_json), "application/json", "application/json"),
+        ("msgpack inline", msgpack.packb(dict(fields, **files)), "application/msgpack", "application/msgpack"),
+        ("multipart inline", multipart_body(fields, files),
+         f"multipart/form-data; boundary={BOUNDARY}", "application/msgpack"),
+        ("x-npy inline", npy.getvalue(), f"application/x-npy; {npy_params}", "application/msgpack"),
+    ]
+
+
+def time_request(handler, models, body, content_type, accept, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        prediction = handler.predict_fn(handler.input_fn(body, content_type), models)
+        response = handler.output_fn(prediction, accept)
+        timings.append(time.perf_counter() - start)
+        if prediction["status"] != "success":
+            raise RuntimeError(f"Request failed: {prediction}")
+    return statistics.median(timings), len(response), prediction
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    handler = load_handler()
+    logging.getLogger(handler.__name__).setLevel(logging.WARNING)
+    import content_types
+
+    s3 = SyntheticS3(S3_LATENCY)
+    handler.s3_client = s3
+    models = synthetic_models(num_points=NUM_POINTS)
+
+    image_bytes, mask_bytes, image, mask = sample_inputs()
+    s3.objects[("bench", "users/u/sessions/s/image.jpg")] = image_bytes
+    s3.objects[("bench", "users/u/sessions/s/mask.png")] = mask_bytes
+
+    print("=" * 60)
+    print("Gen3D Request Content Type Benchmark")
+    print("=" * 60)
+    print(f"Image {IMAGE_SIZE}x{IMAGE_SIZE} ({len(image_bytes) / 1024:.0f} KB JPEG), "
+          f"S3 latency {S3_LATENCY * 1000:.0f} ms, {NUM_POINTS} points, median of {runs} runs\n")
+
+    fast_json = content_types.orjson
+    for task in ["get_embedding", "generate_3d"]:
+        print(f"{task}:")
+        baseline = None
+        for label, body, content_type, accept in build_requests(task, image_bytes, mask_bytes, image, mask):
+            content_types.orjson = None if "stdlib" in label else fast_json
+            seconds, response_size, prediction = time_request(handler, models, body, content_type, accept, runs)
+            baseline = baseline or seconds
+            print(f"  {label:<26} {seconds * 1000:7.1f} ms  ({baseline / seconds:.2f}x)  "
+                  f"request {len(body) / 1024:7.0f} KB  response {response_size / 1024:7.0f} KB"
+                  + (f"  {prediction['embedding_format']}" if "embedding_format" in prediction else ""))
+        print()
+    content_types.orjson = fast_json
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark sequential vs pipelined request execution under synthetic load
+
+Runs the inference handler's task stages against a synthetic S3 (fixed
+per-request latency) and synthetic models (fixed inference time), decoding the
+real sample images from images/. Compares requests/second of the sequential
+predict_fn path with pipeline.PipelineExecutor and prints per-stage queue depth
+and utilization.
+
+Usage:
+    python benchmark_pipeline.py [num_requests]
+"""
+import logging
+import os
+import sys
+import time
+from io import BytesIO
+
+import numpy as np
+
+from handler_stubs import SyntheticS3, load_handler, synthetic_models
+
+IMAGES_DIR = "images"
+
+S3_LATENCY = 0.05       # seconds per GET/PUT
+ENCODER_TIME = 0.15     # seconds per set_image
+RECONSTRUCT_TIME = 0.30 # seconds per reconstruct
+NUM_POINTS = 50000
+
+
+def build_workload(s3, num_requests):
+    """Upload sample images and masks and return a list of mixed requests."""
+    from PIL import Image
+
+    images = sorted(f for f in os.listdir(IMAGES_DIR) if f.lower().endswith((".jpg", ".jpeg", ".png")))
+    requests = []
+    for i in range(num_requests):
+        name = images[i % len(images)]
+        with open(os.path.join(IMAGES_DIR, name), "rb") as f:
+            image_bytes = f.read()
+        width, height = Image.open(BytesIO(image_bytes)).size
+
+        mask = np.zeros((height, width), dtype=np.uint8)
+        mask[height // 4:3 * height // 4, width // 4:3 * width // 4] = 255
+        mask_buffer = BytesIO()
+        Image.fromarray(mask).save(mask_buffer, format="PNG")
+
+        prefix = f"users/bench/sessions/{i}"
+        s3.objects[("bench", f"{prefix}/image.jpg")] = image_bytes
+        s3.objects[("bench", f"{prefix}/mask.png")] = mask_buffer.getvalue()
+
+        request = {"bucket": "bench", "image_s3_key": f"{prefix}/image.jpg", "session_id": str(i)}
+        if i % 2:
+            request.update(task="generate_3d", mask_s3_key=f"{prefix}/mask.png", quality="balanced")
+        else:
+            request.update(task="get_embedding")
+        requests.append(request)
+    return requests
+
+
+def run_sequential(handler, models, requests):
+    start = time.perf_counter()
+    results = [handler.predict_fn(request, models) for request in requests]
+    return time.perf_counter() - start, results
+
+
+def run_pipelined(handler, models, requests):
+    from pipeline import PipelineExecutor
+
+    executor = PipelineExecutor(handler, models)
+    executor.start()
+    start = time.perf_counter()
+    futures = [executor.submit(request) for request in requests]
+    results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+    metrics = executor.metrics()
+    executor.shutdown()
+    return elapsed, results, metrics
+
+
+if __name__ == "__main__":
+    num_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+
+    handler = load_handler()
+    logging.getLogger(handler.__name__).setLevel(logging.WARNING)
+    logging.getLogger("pipeline").setLevel(logging.WARNING)
+
+    s3 = SyntheticS3(S3_LATENCY)
+    handler.s3_client = s3
+    models = synthetic_models(ENCODER_TIME, RECONSTRUCT_TIME, NUM_POINTS)
+    requests = build_workload(s3, num_requests)
+
+    print("=" * 60)
+    print("Gen3D Pipeline Benchmark")
+    print("=" * 60)
+    print(f"Requests: {num_requests} (mixed get_embedding / generate_3d)")
+    print(f"S3 latency: {S3_LATENCY * 1000:.0f} ms, encoder: {ENCODER_TIME * 1000:.0f} ms, "
+          f"reconstruct: {RECONSTRUCT_TIME * 1000:.0f} ms\n")
+
+    seq_time, seq_results = run_sequential(handler, models, requests)
+    pipe_time, pipe_results, metrics = run_pipelined(handler, models, requests)
+
+    failures = [r for r in seq_results + pipe_results if r["status"] != "success"]
+    if failures:
+        print(f"✗ {len(failures)} requests failed: {failures[0]}")
+        sys.exit(1)
+
+    print(f"Sequential: {seq_time:.2f} s ({num_requests / seq_time:.2f} req/s)")
+    print(f"Pipelined:  {pipe_time:.2f} s ({num_requests / pipe_time:.2f} req/s)")
+    print(f"Speedup:    {seq_time / pipe_time:.2f}x\n")
+
+    print(f"{'Stage':<8} {'Workers':>7} {'Done':>5} {'Mean Q':>7} {'Max Q':>6} {'Busy s':>7} {'Util':>6}")
+    for name, m in metrics.items():
+        print(f"{name:<8} {m['workers']:>7} {m['processed']:>5} {m['mean_queue_depth']:>7.1f} "
+              f"{m['max_queue_depth']:>6} {m['busy_seconds']:>7.2f} {m['utilization'] * 100:>5.0f}%")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Sweep worker-process / thread splits for CPU inference throughput
+
+For each split of the host's cores into W worker processes x T intra-op
+threads, starts W fresh interpreters that size their thread pools through
+thread_tuning (as model_fn does) and run an encoder-like workload (a stack
+of ViT-B sized transformer layers) for a fixed duration. Aggregate throughput
+is compared with the untuned default, where every worker uses all cores.
+
+Usage:
+    python benchmark_threads.py [duration_seconds] [max_workers]
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, "deployment/04-sagemaker/code")
+import thread_tuning
+
+CODE_DIR = "deployment/04-sagemaker/code"
+DEFAULT_DURATION = 10.0
+STARTUP_GRACE = 15.0  # seconds for workers to import torch before the timed window
+
+WORKER_SNIPPET = """
+import json, sys, time
+sys.path.insert(0, {code_dir!r})
+import thread_tuning
+plan = thread_tuning.configure_from_environment()
+if plan is not None:
+    thread_tuning.apply_torch_threads(plan)
+import torch
+
+# ViT-B sized encoder stand-in: 4 layers, 768 wide, 256 tokens
+layers = torch.nn.TransformerEncoder(
+    torch.nn.TransformerEncoderLayer(768, 12, 3072, batch_first=True), num_layers=4
+).eval()
+x = torch.randn(1, 256, 768)
+with torch.no_grad():
+    layers(x)
+    while time.time() < {start}:
+        time.sleep(0.01)
+    done = 0
+    while time.time() < {end}:
+        layers(x)
+        done += 1
+print(json.dumps({{"requests": done, "threads": torch.get_num_threads()}}))
+"""
+
+
+def run_split(workers, threads, duration):
+    """Run `workers` processes with `threads` intra-op threads each (None = untuned)."""
+    env = dict(os.environ)
+    if threads is None:
+        env["GEN3D_THREAD_TUNING"] = "0"
+        for var in thread_tuning.BLAS_ENV_VARS:
+            env.pop(var, None)
+    else:
+        env.update({
+            "GEN3D_THREAD_TUNING": "1",
+            "GEN3D_INFERENCE_WORKERS": str(workers),
+            "GEN3D_INTRA_OP_THREADS": str(threads),
+        })
+
+    start = time.time() + STARTUP_GRACE
+    snippet = WORKER_SNIPPET.format(code_dir=CODE_DIR, start=start, end=start + duration)
+    processes = [
+        subprocess.Popen([sys.executable, "-c", snippet], env=env, stdout=subprocess.PIPE, text=True)
+        for _ in range(workers)
+    ]
+    results = []
+    for process in processes:
+        stdout, _ = process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f"Worker failed with code {process.returncode}")
+        results.append(json.loads(stdout.strip().splitlines()[-1]))
+
+    return {
+        "workers": workers,
+        "threads": results[0]["threads"],
+        "throughput": sum(r["requests"] for r in results) / duration,
+    }
+
+
+def candidate_splits(cores, max_workers):
+    """(workers, threads) pairs with workers x threads <= cores (1 thread once workers exceed cores)."""
+    splits = []
+    workers = 1
+    while workers <= max_workers:
+        threads = max(1, cores // workers)
+        while threads >= 1:
+            splits.append((workers, threads))
+            threads //= 2
+        workers *= 2
+    return splits
+
+
+if __name__ == "__main__":
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_DURATION
+    cores = thread_tuning.detect_cores()
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else cores
+
+    print("=" * 60)
+    print("CPU Worker / Thread Split Sweep")
+    print("=" * 60)
+    print(f"Detected cores: {cores}; {duration:.0f} s per split\n")
+    print(f"{'workers':>7} {'threads':>7} {'req/s':>8}")
+
+    results = []
+    for workers, threads in candidate_splits(cores, max_workers):
+        r = run_split(workers, threads, duration)
+        results.append(r)
+        print(f"{workers:>7} {r['threads']:>7} {r['throughput']:>8.2f}")
+
+    print("\nUntuned (every worker uses all cores):")
+    workers = 1
+    while workers <= max_workers:
+        r = run_split(workers, None, duration)
+        print(f"{workers:>7} {r['threads']:>7} {r['throughput']:>8.2f}")
+        workers *= 2
+
+    best = max(results, key=lambda r: r["throughput"])
+    plan = thread_tuning.plan_threads(cores, best["workers"], intra_op=best["threads"])
+    print(f"\nBest split: {best['workers']} workers x {best['threads']} threads "
+          f"({best['throughput']:.2f} req/s)")
+    print(f"Set GEN3D_INFERENCE_WORKERS={plan['workers']} GEN3D_INTRA_OP_THREADS={plan['intra_op']} "
+          f"(SAGEMAKER_MODEL_SERVER_WORKERS={plan['workers']})")
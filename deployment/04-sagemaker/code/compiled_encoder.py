@@ -0,0 +1,176 @@
+"""
+Gen3D Compiled SAM3 Encoder
+Opt-in graph-compiled execution of the SAM3 image encoder
+
+The vit_h image encoder dominates get_embedding latency. Two compiled modes
+are supported (GEN3D_ENCODER_COMPILE):
+- "torchscript": trace the encoder at its fixed 1024x1024 input and save the
+  traced module to disk. Later container starts load the saved trace instead
+  of tracing again. A trace shipped in the model archive under
+  sam3/<artifact name> is used first. Saved traces are keyed by checkpoint,
+  device and torch version.
+- "torch_compile": torch.compile with GEN3D_COMPILE_BACKEND (default
+  "inductor"). Inductor's kernel cache is pointed at the compile cache dir
+  so it can be reused across starts when that dir is persistent.
+
+The compiled encoder is checked against eager output on a synthetic input;
+on any failure or mismatch the eager encoder is kept.
+"""
+
+import hashlib
+import logging
+import os
+import time
+import warnings
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+MODES = ["torchscript", "torch_compile"]
+DEFAULT_BACKEND = "inductor"
+DEFAULT_CACHE_DIR = "/tmp/gen3d-compiled"
+RTOL = 1e-3
+ATOL = 1e-3
+
+
+def checkpoint_key(checkpoint):
+    """Short key identifying a checkpoint file by path, size and mtime."""
+    if not checkpoint or not os.path.exists(checkpoint):
+        return "random"
+    stat = os.stat(checkpoint)
+    identity = f"{os.path.abspath(checkpoint)}:{stat.st_size}:{int(stat.st_mtime)}"
+    return hashlib.sha256(identity.encode()).hexdigest()[:12]
+
+
+def artifact_name(device, checkpoint=None):
+    """File name of the saved TorchScript encoder for a checkpoint, device and torch version."""
+    version = torch.__version__.split('+')[0]
+    return f"sam3_image_encoder_{checkpoint_key(checkpoint)}_{device}_torch{version}.pt"
+
+
+def example_input(encoder, device, seed=0):
+    """Synthetic normalized image batch at the encoder's input size."""
+    size = getattr(encoder, "img_size", 1024)
+    generator = torch.Generator().manual_seed(seed)
+    return torch.randn(1, 3, size, size, generator=generator).to(device)
+
+
+def outputs_match(reference, candidate, rtol=RTOL, atol=ATOL):
+    """
+    Compare encoder outputs.
+
+    Returns:
+        tuple: (bool match, float max absolute difference)
+    """
+    max_diff = (reference.float() - candidate.float()).abs().max().item()
+    return torch.allclose(reference.float(), candidate.float(), rtol=rtol, atol=atol), max_diff
+
+
+def load_or_trace(encoder, device, search_dirs, cache_dir, checkpoint=None):
+    """
+    Load a saved TorchScript encoder, or trace and save one.
+
+    Args:
+        encoder: Eager image encoder module
+        device: "cuda" or "cpu"
+        search_dirs: Directories checked for a previously saved trace
+        cache_dir: Directory a new trace is saved to
+        checkpoint: Checkpoint path the encoder weights came from
+
+    Returns:
+        torch.jit.ScriptModule: Traced encoder
+    """
+    name = artifact_name(device, checkpoint)
+    for directory in search_dirs:
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            logger.info(f"Loading TorchScript encoder from {path}")
+            return torch.jit.load(path, map_location=device)
+
+    logger.info("Tracing SAM3 image encoder (first start on this device)...")
+    with torch.no_grad(), warnings.catch_warnings():
+        # Shape-dependent Python branches are constant at the fixed input size
+        warnings.simplefilter("ignore", torch.jit.TracerWarning)
+        # Output is checked against eager in compile_encoder; the tracer's own
+        # check would run two more full forward passes
+        traced = torch.jit.trace(encoder, example_input(encoder, device), check_trace=False)
+    traced = torch.jit.freeze(traced.eval())
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, name)
+    torch.jit.save(traced, path)
+    logger.info(f"Saved TorchScript encoder to {path}")
+    return traced
+
+
+def compile_encoder(encoder, mode, device, search_dirs=(), cache_dir=DEFAULT_CACHE_DIR,
+                    backend=DEFAULT_BACKEND, checkpoint=None):
+    """
+    Build a compiled encoder and verify it against eager output.
+
+    Args:
+        encoder: Eager image encoder module (in eval mode, on device)
+        mode: "torchscript" or "torch_compile"
+        device: "cuda" or "cpu"
+        search_dirs: Directories checked for a saved TorchScript trace
+        cache_dir: Directory for saved traces and inductor's cache
+        backend: torch.compile backend
+        checkpoint: Checkpoint path (keys the saved trace)
+
+    Returns:
+        tuple: (encoder to use, report dict)
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown encoder compile mode: {mode}. Valid modes: {', '.join(MODES)}")
+
+    report = {"mode": mode, "compiled": False}
+    start = time.perf_counter()
+    try:
+        if mode == "torchscript":
+            compiled = load_or_trace(encoder, device, search_dirs, cache_dir, checkpoint)
+        else:
+            os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.join(cache_dir, "inductor"))
+            compiled = torch.compile(encoder, backend=backend)
+            report["backend"] = backend
+
+        x = example_input(encoder, device)
+        with torch.no_grad():
+            reference = encoder(x)
+            candidate = compiled(x)  # Also triggers torch.compile's first compilation
+        match, max_diff = outputs_match(reference, candidate)
+        report["max_abs_diff"] = max_diff
+        if not match:
+            raise RuntimeError(f"compiled encoder output differs from eager (max abs diff {max_diff:.2e})")
+
+        report["compiled"] = True
+        return compiled, report
+
+    except Exception as e:
+        logger.warning(f"Encoder compilation ({mode}) failed, using eager mode: {e}")
+        report["error"] = str(e)
+        return encoder, report
+
+    finally:
+        report["seconds"] = time.perf_counter() - start
+        logger.info(f"Encoder compilation report: {report}")
+
+
+def apply_to_model(sam_model, mode, device, search_dirs=(), cache_dir=DEFAULT_CACHE_DIR,
+                   backend=DEFAULT_BACKEND, checkpoint=None):
+    """
+    Replace sam_model.image_encoder with its compiled version (if it verifies).
+
+    Returns:
+        dict: Compilation report
+    """
+    compiled, report = compile_encoder(
+        sam_model.image_encoder, mode, device, search_dirs, cache_dir, backend, checkpoint
+    )
+    if report["compiled"]:
+        # Keep attributes the predictor reads from the encoder (e.g. img_size)
+        for attr in ("img_size",):
+            if hasattr(sam_model.image_encoder, attr) and not hasattr(compiled, attr):
+                setattr(compiled, attr, getattr(sam_model.image_encoder, attr))
+        sam_model.image_encoder = compiled
+    return report
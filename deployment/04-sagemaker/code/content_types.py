@@ -0,0 +1,291 @@
+"""
+Gen3D Request/Response Content Types
+Deserialization for input_fn and serialization for output_fn
+
+Request content types:
+- application/json: request fields; parsed with orjson when installed.
+  "image" and "mask" may carry the file bytes inline as base64 strings
+- application/msgpack, application/cbor: a map of request fields where
+  "image" and "mask" may carry the encoded file bytes inline
+- multipart/form-data: a "request" part with the JSON fields, plus optional
+  "image" and "mask" file parts
+- application/x-npy: one decoded array, with the request fields given as
+  content-type parameters (e.g. "application/x-npy; task=get_embedding;
+  session_id=s1"). An (H, W, 3) uint8 array is the image; (H, W, 4) is the
+  image with the mask in the last channel; (H, W) is a mask.
+
+x-npy parameters and multipart form fields are text: list and object fields
+(JSON_FIELDS, e.g. labels=[1,3] or postprocess={"normals":true}) are decoded
+as JSON, and flags are interpreted by parse_bool.
+
+Inline inputs are returned as image_bytes/mask_bytes (encoded) or
+image_array/mask_array (decoded) fields, which the fetch stages use instead of
+downloading from S3. Inline payloads above GEN3D_INLINE_MAX_BYTES are
+rejected, since they belong in S3.
+
+Response content types: application/json (orjson when installed; bytes
+fields base64-encoded), application/msgpack and application/cbor (bytes
+fields sent raw).
+
+msgpack, cbor2 and orjson are optional; a missing package only disables its
+content type (or, for orjson, falls back to the stdlib json module).
+"""
+
+import base64
+import json
+import logging
+import os
+from email.parser import BytesParser
+from email.policy import HTTP
+from io import BytesIO
+
+logger = logging.getLogger(__name__)
+
+JSON = "application/json"
+NPY = "application/x-npy"
+MULTIPART = "multipart/form-data"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+INPUT_TYPES = [JSON, NPY, MULTIPART, MSGPACK, CBOR]
+OUTPUT_TYPES = [JSON, MSGPACK, CBOR]
+
+# SageMaker real-time payloads are capped at 6 MB
+INLINE_MAX_BYTES = int(os.environ.get("GEN3D_INLINE_MAX_BYTES", 5 * 1024 * 1024))
+
+INLINE_FIELDS = ("image", "mask")
+
+# Request fields holding lists or objects -> accepted decoded types
+JSON_FIELDS = {
+    "labels": (list,),
+    "mask_s3_keys": (list,),
+    "postprocess": (dict,),
+    "mesh": (bool, dict),
+}
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def parse_content_type(content_type):
+    """
+    Split a content type into its media type and parameters.
+
+    Returns:
+        tuple: (lower-case media type, dict of parameters)
+    """
+    media_type, _, rest = (content_type or JSON).partition(";")
+    params = {}
+    for item in rest.split(";"):
+        name, sep, value = item.strip().partition("=")
+        if sep:
+            params[name.strip()] = value.strip().strip('"')
+    return media_type.strip().lower(), params
+
+
+TRUE_STRINGS = ("1", "true", "yes", "on")
+FALSE_STRINGS = ("0", "false", "no", "off", "")
+
+
+def parse_bool(value, name="value"):
+    """
+    Interpret a request flag that may arrive as text.
+
+    x-npy parameters and multipart form fields are strings, so "false" and
+    "0" must not count as true the way bool() would.
+    """
+    if not isinstance(value, str):
+        return bool(value)
+    text = value.strip().lower()
+    if text in TRUE_STRINGS:
+        return True
+    if text in FALSE_STRINGS:
+        return False
+    raise ValueError(f"Invalid boolean for {name}: {value!r}. Use true or false")
+
+
+def check_inline_size(name, size):
+    """Reject inline payloads that should have gone through S3."""
+    if size > INLINE_MAX_BYTES:
+        raise ValueError(
+            f"Inline {name} is {size} bytes (limit {INLINE_MAX_BYTES}); upload it to S3 and pass {name}_s3_key"
+        )
+
+
+def _json_default(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode("ascii")
+    if hasattr(value, "tolist"):  # numpy arrays and scalars
+        return value.tolist()
+    if hasattr(value, "_asdict"):
+        return value._asdict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_loads(body):
+    """Parse JSON bytes or text (orjson when available)."""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def json_dumps(obj):
+    """Serialize to JSON bytes (orjson when available); bytes become base64 strings."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_json_default).encode("utf-8")
+
+
+def _inline_fields(fields):
+    """Move inline image/mask bytes (raw or base64) to image_bytes/mask_bytes."""
+    for name in INLINE_FIELDS:
+        value = fields.pop(name, None)
+        if value is None:
+            continue
+        if isinstance(value, str):  # base64 in a JSON request part
+            value = base64.b64decode(value)
+        check_inline_size(name, len(value))
+        fields[f"{name}_bytes"] = bytes(value)
+    return fields
+
+
+def _text_fields(fields):
+    """
+    Decode the JSON_FIELDS of a request whose fields arrived as text.
+
+    mesh may also be a plain flag ("yes", "off", ...), left for parse_bool.
+    """
+    for name, types in JSON_FIELDS.items():
+        value = fields.get(name)
+        if not isinstance(value, str):
+            continue
+        try:
+            decoded = json_loads(value)
+        except ValueError:
+            if name == "mesh":
+                continue
+            decoded = None
+        if not isinstance(decoded, types):
+            expected = " or ".join("an object" if t is dict else f"a {t.__name__}" for t in types)
+            raise ValueError(f"Invalid {name}: {value!r}. Give it as JSON ({expected})")
+        fields[name] = decoded
+    return fields
+
+
+def decode_npy(body, params):
+    """Decode an application/x-npy request (array plus content-type parameters)."""
+    import numpy as np
+
+    check_inline_size("image", len(body))
+    array = np.load(BytesIO(body), allow_pickle=False)
+    fields = _text_fields(dict(params))
+    if array.ndim == 3 and array.shape[2] == 4:
+        fields["image_array"] = array[:, :, :3]
+        fields["mask_array"] = array[:, :, 3]
+    elif array.ndim == 3 and array.shape[2] == 3:
+        fields["image_array"] = array
+    elif array.ndim == 2:
+        fields["mask_array"] = array
+    else:
+        raise ValueError(f"Unsupported x-npy array shape {array.shape}; expected (H, W, 3), (H, W, 4) or (H, W)")
+    return fields
+
+
+def decode_multipart(body, content_type):
+    """Decode a multipart/form-data request into fields and inline files."""
+    message = BytesParser(policy=HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body
+    )
+    if not message.is_multipart():
+        raise ValueError("multipart/form-data request without parts (missing boundary?)")
+
+    fields = {}
+    text_fields = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        payload = part.get_payload(decode=True) or b""
+        if name == "request":
+            fields.update(json_loads(payload))
+        elif name in INLINE_FIELDS:
+            fields[name] = payload
+        elif name:
+            text_fields[name] = payload.decode("utf-8")
+    fields.update(_text_fields(text_fields))
+    return _inline_fields(fields)
+
+
+def decode_msgpack(body):
+    try:
+        import msgpack
+    except ImportError:
+        raise ValueError(f"{MSGPACK} requires the msgpack package")
+    return _inline_fields(msgpack.unpackb(body, raw=False))
+
+
+def decode_cbor(body):
+    try:
+        import cbor2
+    except ImportError:
+        raise ValueError(f"{CBOR} requires the cbor2 package")
+    return _inline_fields(cbor2.loads(body))
+
+
+def deserialize(body, content_type):
+    """
+    Parse a request body.
+
+    Args:
+        body: Request payload (bytes or str)
+        content_type: Request content type, including parameters
+
+    Returns:
+        dict: Request fields, with inline inputs as image_bytes/mask_bytes or
+        image_array/mask_array
+    """
+    media_type, params = parse_content_type(content_type)
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+
+    if media_type == JSON:
+        return _inline_fields(json_loads(body))
+    if media_type == NPY:
+        return decode_npy(body, params)
+    if media_type == MULTIPART:
+        return decode_multipart(body, content_type)
+    if media_type == MSGPACK:
+        return decode_msgpack(body)
+    if media_type == CBOR:
+        return decode_cbor(body)
+    raise ValueError(f"Unsupported content type: {content_type}. Supported: {', '.join(INPUT_TYPES)}")
+
+
+def serialize(prediction, accept):
+    """
+    Serialize a response.
+
+    Args:
+        prediction: Response dict
+        accept: Requested content type (JSON when empty or */*)
+
+    Returns:
+        tuple: (body bytes, content type)
+    """
+    media_type, _ = parse_content_type(accept if accept and accept != "*/*" else JSON)
+
+    if media_type == JSON:
+        return json_dumps(prediction), JSON
+    if media_type == MSGPACK:
+        try:
+            import msgpack
+        except ImportError:
+            raise ValueError(f"{MSGPACK} requires the msgpack package")
+        return msgpack.packb(prediction, default=_json_default, use_bin_type=True), MSGPACK
+    if media_type == CBOR:
+        try:
+            import cbor2
+        except ImportError:
+            raise ValueError(f"{CBOR} requires the cbor2 package")
+        return cbor2.dumps(prediction, default=lambda encoder, value: encoder.encode(_json_default(value))), CBOR
+    raise ValueError(f"Unsupported accept type: {accept}. Supported: {', '.join(OUTPUT_TYPES)}")
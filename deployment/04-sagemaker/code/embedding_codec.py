@@ -0,0 +1,170 @@
+"""
+Gen3D Embedding Codec
+Compact storage of the SAM 3 image embedding for the browser decoder
+
+The (1, 256, 64, 64) float32 embedding is 4 MB and is downloaded by every
+browser session. It can instead be stored as:
+- float16: 2 MB, restored with a plain cast
+- int8: 1 MB, per-channel affine quantization; the client restores each
+  channel c as value = q * scale[c] + offset[c]
+
+The scale/offset vectors are stored next to the embedding in embeddings.json,
+together with error statistics against the float32 original.
+"""
+
+import base64
+
+import numpy as np
+
+FORMATS = ["float32", "float16", "int8"]
+CHANNEL_AXIS = 1
+
+
+def encode_embedding(features, fmt="float32"):
+    """
+    Encode a float32 embedding for storage.
+
+    Args:
+        features: float32 array of shape (1, C, H, W)
+        fmt: "float32", "float16" or "int8"
+
+    Returns:
+        tuple: (stored array, dequantization dict or None)
+    """
+    if fmt == "float32":
+        return features, None
+    if fmt == "float16":
+        return features.astype(np.float16), None
+    if fmt != "int8":
+        raise ValueError(f"Unknown embedding format: {fmt}. Valid formats: {', '.join(FORMATS)}")
+
+    reduce_axes = tuple(a for a in range(features.ndim) if a != CHANNEL_AXIS)
+    channel_min = features.min(axis=reduce_axes, keepdims=True)
+    channel_max = features.max(axis=reduce_axes, keepdims=True)
+    offset = (channel_max + channel_min) / 2
+    scale = (channel_max - channel_min) / 254
+    scale[scale == 0] = 1.0  # Constant channels
+
+    quantized = np.clip(np.rint((features - offset) / scale), -127, 127).astype(np.int8)
+    dequantization = {
+        "scheme": "per_channel_affine",
+        "axis": CHANNEL_AXIS,
+        "scale": scale.ravel().astype(np.float32).tolist(),
+        "offset": offset.ravel().astype(np.float32).tolist(),
+    }
+    return quantized, dequantization
+
+
+def decode_embedding(stored, dequantization=None):
+    """
+    Restore a float32 embedding (the same computation the client performs).
+
+    Args:
+        stored: Array returned by encode_embedding
+        dequantization: Dequantization dict returned by encode_embedding
+
+    Returns:
+        numpy.ndarray: float32 embedding
+    """
+    if dequantization is None:
+        return stored.astype(np.float32)
+
+    shape = [1] * stored.ndim
+    shape[dequantization["axis"]] = -1
+    scale = np.asarray(dequantization["scale"], dtype=np.float32).reshape(shape)
+    offset = np.asarray(dequantization["offset"], dtype=np.float32).reshape(shape)
+    return stored.astype(np.float32) * scale + offset
+
+
+def error_statistics(original, restored):
+    """
+    Compare a restored embedding with the float32 original.
+
+    Returns:
+        dict: max/mean absolute error, RMSE and signal-to-noise ratio (dB).
+        snr_db is None when it is not finite (exact restore or all-zero
+        original), so the dict stays valid JSON.
+    """
+    error = restored.astype(np.float64) - original.astype(np.float64)
+    rmse = float(np.sqrt(np.mean(error ** 2)))
+    signal = float(np.sqrt(np.mean(original.astype(np.float64) ** 2)))
+    return {
+        "max_abs_error": float(np.max(np.abs(error))),
+        "mean_abs_error": float(np.mean(np.abs(error))),
+        "rmse": rmse,
+        "snr_db": float(20 * np.log10(signal / rmse)) if rmse > 0 and signal > 0 else None,
+    }
+
+
+def to_document(stored, dequantization, stats):
+    """
+    Build the embeddings.json document.
+
+    The float32 document keeps the original layout (embedding, shape, dtype).
+    """
+    document = {
+        "embedding": base64.b64encode(stored.tobytes()).decode('utf-8'),
+        "shape": list(stored.shape),
+        "dtype": str(stored.dtype)
+    }
+    if dequantization is not None:
+        document["dequantization"] = dequantization
+    if stats is not None:
+        document["error"] = stats
+    return document
+
+
+def mask_iou(a, b):
+    """Intersection over union of two boolean masks."""
+    union = np.logical_or(a, b).sum()
+    if union == 0:
+        return 1.0
+    return float(np.logical_and(a, b).sum() / union)
+
+
+def prompt_grid(image_size, points_per_side=3):
+    """Single-point prompts on a regular grid over the image (x, y)."""
+    width, height = image_size
+    xs = (np.arange(points_per_side) + 0.5) * width / points_per_side
+    ys = (np.arange(points_per_side) + 0.5) * height / points_per_side
+    return [np.array([[x, y]]) for y in ys for x in xs]
+
+
+def validate_with_decoder(predictor, restored, image_size, points_per_side=3):
+    """
+    Compare decoder masks from the restored embedding with the float32 ones.
+
+    The predictor must currently hold the image (after set_image). Its
+    features are swapped for the restored embedding while decoding and put
+    back afterwards.
+
+    Args:
+        predictor: SAM 3 predictor with set_image already called
+        restored: float32 array restored by decode_embedding
+        image_size: (width, height) of the image passed to set_image
+        points_per_side: Prompt grid size
+
+    Returns:
+        dict: mean and minimum mask IoU over the prompts
+    """
+    import torch
+
+    original = predictor.features
+    restored_tensor = torch.from_numpy(restored).to(original.device, original.dtype)
+    labels = np.array([1])
+    ious = []
+    try:
+        for points in prompt_grid(image_size, points_per_side):
+            predictor.features = original
+            reference, _, _ = predictor.predict(point_coords=points, point_labels=labels, multimask_output=False)
+            predictor.features = restored_tensor
+            candidate, _, _ = predictor.predict(point_coords=points, point_labels=labels, multimask_output=False)
+            ious.append(mask_iou(reference[0], candidate[0]))
+    finally:
+        predictor.features = original
+
+    return {
+        "prompts": len(ious),
+        "mean_mask_iou": float(np.mean(ious)),
+        "min_mask_iou": float(np.min(ious)),
+    }
@@ -0,0 +1,237 @@
+"""
+Gen3D Image Ingestion
+Fast decode path for uploaded images and masks
+
+Phone uploads are often 12-48 MP while the SAM encoder works at 1024 px, so
+decoding at full resolution wastes time and memory. This module:
+- sniffs the format from the leading bytes
+- uses JPEG draft mode to decode directly at a reduced scale (1/2, 1/4, 1/8)
+  that is still at least the target size
+- reduces other formats with a fast integer box filter after decode
+- applies EXIF orientation once
+- returns a contiguous uint8 array without extra copies (read-only, as it
+  wraps the decoded buffer directly)
+"""
+
+import logging
+import os
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Longest side to decode to; 0 decodes at full resolution
+DEFAULT_TARGET_SIZE = int(os.environ.get("GEN3D_DECODE_TARGET_SIZE", "1024"))
+
+EXIF_ORIENTATION = 0x0112
+
+MAGIC_NUMBERS = [
+    (b"\xff\xd8\xff", "JPEG"),
+    (b"\x89PNG\r\n\x1a\n", "PNG"),
+    (b"GIF87a", "GIF"),
+    (b"GIF89a", "GIF"),
+    (b"BM", "BMP"),
+    (b"II*\x00", "TIFF"),
+    (b"MM\x00*", "TIFF"),
+]
+
+# Modes whose pixels can be box-filtered directly; palette, bilevel and 16-bit
+# images (GIF, PNG-8, fax/16-bit TIFF) are converted to the output mode first
+REDUCIBLE_MODES = {"L", "LA", "RGB", "RGBA", "CMYK", "YCbCr"}
+
+
+def sniff_format(data):
+    """
+    Identify the image format from its leading bytes.
+
+    Args:
+        data: Encoded image bytes
+
+    Returns:
+        str or None: Format name as used by PIL, or None if unknown
+    """
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "WEBP"
+    for magic, fmt in MAGIC_NUMBERS:
+        if data.startswith(magic):
+            return fmt
+    return None
+
+
+def _draft_size(size, target_size):
+    """Smallest size with the same aspect ratio whose longest side is target_size."""
+    width, height = size
+    scale = target_size / max(width, height)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def decode_image(data, target_size=DEFAULT_TARGET_SIZE, mode="RGB"):
+    """
+    Decode image bytes into a contiguous uint8 array.
+
+    The longest side of the result is at least target_size (unless the image
+    is smaller), so downstream resizing to target_size loses no detail.
+
+    Args:
+        data: Encoded image bytes
+        target_size: Longest side to decode to; 0 for full resolution
+        mode: PIL mode of the result ("RGB" or "L")
+
+    Returns:
+        tuple: (read-only numpy array, info dict with format, original_size and decoded_size)
+    """
+    fmt = sniff_format(data)
+    image = Image.open(BytesIO(data), formats=[fmt] if fmt else None)
+    original_size = image.size
+
+    if target_size and max(original_size) > target_size:
+        if image.format == "JPEG":
+            # Decoder-level downscaling: only the needed DCT coefficients are decoded
+            image.draft(mode, _draft_size(original_size, target_size))
+        else:
+            factor = max(original_size) // target_size
+            if factor > 1:
+                if image.mode not in REDUCIBLE_MODES:
+                    image = image.convert(mode)
+                image = image.reduce(factor)
+
+    # Checking the tag first avoids the copy exif_transpose makes when there is nothing to do
+    if image.getexif().get(EXIF_ORIENTATION, 1) != 1:
+        image = ImageOps.exif_transpose(image)
+    if image.mode != mode:
+        image = image.convert(mode)
+
+    array = np.asarray(image)
+    info = {
+        "format": fmt or image.format,
+        "original_size": original_size,
+        "decoded_size": image.size,
+    }
+    return array, info
+
+
+def decode_mask(data, size):
+    """
+    Decode a mask and threshold it to a boolean array of the given size.
+
+    Masks are drawn against the full-resolution image, so they are resized
+    with nearest-neighbour sampling to match the decoded image.
+
+    Args:
+        data: Encoded mask bytes
+        size: (width, height) of the decoded image
+
+    Returns:
+        numpy.ndarray: Boolean mask of shape (height, width)
+    """
+    mask = Image.open(BytesIO(data))
+    if mask.mode != "L":
+        mask = mask.convert("L")
+    if mask.size != tuple(size):
+        mask = mask.resize(tuple(size), Image.NEAREST)
+    return np.asarray(mask) > 128  # Threshold
+
+
+def image_from_array(array, target_size=DEFAULT_TARGET_SIZE):
+    """
+    Prepare an already decoded (H, W, 3) uint8 image, e.g. from an inline request.
+
+    Arrays larger than target_size are reduced with the same integer box
+    filter used for non-JPEG files.
+
+    Returns:
+        tuple: (read-only numpy array, info dict as returned by decode_image)
+    """
+    array = np.asarray(array)
+    if array.ndim != 3 or array.shape[2] != 3 or array.dtype != np.uint8:
+        raise ValueError(f"Expected an (H, W, 3) uint8 image array, got {array.shape} {array.dtype}")
+
+    original_size = (array.shape[1], array.shape[0])
+    factor = max(original_size) // target_size if target_size else 1
+    if factor > 1:
+        array = np.asarray(Image.fromarray(array).reduce(factor))
+    else:
+        array = np.ascontiguousarray(array)
+        array.flags.writeable = False
+
+    info = {
+        "format": "array",
+        "original_size": original_size,
+        "decoded_size": (array.shape[1], array.shape[0]),
+    }
+    return array, info
+
+
+def mask_from_array(array, size):
+    """
+    Threshold an already decoded (H, W) mask to a boolean array of the given size.
+
+    Non-zero pixels are selected; the mask is resized with nearest-neighbour
+    sampling when it does not match the image.
+    """
+    mask = np.asarray(array) != 0
+    if (mask.shape[1], mask.shape[0]) != tuple(size):
+        resized = Image.fromarray(mask.astype(np.uint8) * 255).resize(tuple(size), Image.NEAREST)
+        mask = np.asarray(resized) > 128
+    return mask
+
+
+def _resize_labels(labels, size):
+    """Nearest-neighbour resize of an integer label array to (width, height)."""
+    if (labels.shape[1], labels.shape[0]) == tuple(size):
+        return labels
+    image = Image.fromarray(labels.astype(np.int32, copy=False))  # Mode "I"
+    return np.asarray(image.resize(tuple(size), Image.NEAREST))
+
+
+def decode_label_mask(data, size):
+    """
+    Decode a labeled mask (one integer value per object, 0 = background).
+
+    Grayscale values, palette indices and 16-bit PNG values are used as
+    labels. Labels are resized with nearest-neighbour sampling, so they are
+    never blended.
+
+    Args:
+        data: Encoded mask bytes
+        size: (width, height) of the decoded image
+
+    Returns:
+        numpy.ndarray: int32 label array of shape (height, width)
+    """
+    mask = Image.open(BytesIO(data))
+    if mask.mode not in ("L", "P", "I"):
+        mask = mask.convert("I" if mask.mode.startswith("I;16") else "L")
+    return _resize_labels(np.asarray(mask), size).astype(np.int32, copy=False)
+
+
+def label_mask_from_array(array, size):
+    """Resize an already decoded (H, W) label array to the image size."""
+    array = np.asarray(array)
+    if array.ndim != 2 or array.dtype.kind not in "uib":
+        raise ValueError(f"Expected an (H, W) integer label array, got {array.shape} {array.dtype}")
+    return _resize_labels(array, size).astype(np.int32, copy=False)
+
+
+def split_labels(label_image, labels=None):
+    """
+    Split a label array into one boolean mask per label.
+
+    Args:
+        label_image: Integer label array (H, W), 0 = background
+        labels: Labels to keep (default: every non-zero label present)
+
+    Returns:
+        tuple: (int array of labels (K,), boolean masks (K, H, W))
+    """
+    present = np.unique(label_image)
+    present = present[present != 0]
+    if labels is not None:
+        labels = np.asarray(labels, dtype=label_image.dtype)
+        missing = np.setdiff1d(labels, present)
+        if missing.size:
+            raise ValueError(f"Labels not present in the mask: {missing.tolist()}")
+        present = labels
+    return present, label_image[None, :, :] == present[:, None, None]
@@ -8,21 +8,21 @@ Changes from original:
 3. Support for multiple checkpoint formats (.pt, .pth, .safetensors, .ckpt)
 4. Explicit error handling (fails instead of returning mock data)
 5. Directory structure logging for troubleshooting
+6. Lazy imports of heavy dependencies so the handler module loads in milliseconds
 """
 
+import hashlib
 import json
 import os
 import sys
-import base64
 import logging
+import importlib
+import tempfile
+import threading
+import time
 from io import BytesIO
 import glob
 
-import boto3
-import numpy as np
-import torch
-from PIL import Image
-
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -30,12 +30,81 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize S3 client
-s3_client = boto3.client('s3')
+
+class LazyObject:
+    """
+    Proxy that creates the wrapped object on first attribute access.
+
+    Used for heavy modules (torch, numpy, PIL, boto3) and the S3 client so that
+    importing this module stays cheap for health checks and worker forks.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._obj = None
+        self._lock = threading.Lock()
+
+    def _resolve(self):
+        if self._obj is None:
+            with self._lock:
+                if self._obj is None:
+                    self._obj = self._factory()
+        return self._obj
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+
+def lazy_import(name):
+    """Return a proxy that imports module `name` on first use."""
+    return LazyObject(lambda: importlib.import_module(name))
+
+
+boto3 = lazy_import("boto3")
+np = lazy_import("numpy")
+torch = lazy_import("torch")
+Image = lazy_import("PIL.Image")
+image_io = lazy_import("image_io")
+embedding_codec = lazy_import("embedding_codec")
+point_cloud_postprocess = lazy_import("point_cloud_postprocess")
+surface_mesh = lazy_import("surface_mesh")
+session_cache = lazy_import("session_cache")
+content_types = lazy_import("content_types")
+
+# Initialize S3 client (created on first use)
+s3_client = LazyObject(lambda: boto3.client('s3'))
 
 # Global model storage
 MODELS = {}
 
+# Memory-bounded serialization: points per PLY write and in-memory spool limit
+PLY_CHUNK_POINTS = 65536
+SPOOL_MAX_BYTES = int(os.environ.get("GEN3D_SPOOL_MAX_BYTES", 64 * 1024 * 1024))
+
+
+def warm_imports():
+    """
+    Resolve the lazy dependencies in a background thread.
+
+    Called at the start of model_fn so numpy, PIL and the S3 client are ready
+    by the time the first request arrives, while torch loads in the caller.
+
+    Returns:
+        threading.Thread: The started warm-up thread
+    """
+    def _warm():
+        for proxy in (np, Image, image_io, boto3, s3_client):
+            if not isinstance(proxy, LazyObject):
+                continue
+            try:
+                proxy._resolve()
+            except Exception as e:
+                logger.warning(f"Background import warm-up failed: {e}")
+
+    thread = threading.Thread(target=_warm, name="import-warmup", daemon=True)
+    thread.start()
+    return thread
+
 
 def log_directory_structure(path, max_depth=2, current_depth=0):
     """
@@ -89,6 +158,67 @@ def find_checkpoint_file(model_dir, patterns):
     return None
 
 
+def warm_up(models):
+    """
+    Run synthetic requests through the loaded models.
+
+    Runs set_image at each GEN3D_WARMUP_SIZES resolution and reconstruct for
+    each GEN3D_WARMUP_PRESETS preset. Failures are logged, not raised.
+
+    Args:
+        models: Dictionary of loaded models
+
+    Returns:
+        dict: warmup_seconds and per-run timings
+    """
+    sizes = [int(v) for v in os.environ.get("GEN3D_WARMUP_SIZES", "1024").split(",") if v]
+    presets = [v for v in os.environ.get("GEN3D_WARMUP_PRESETS", "fast,balanced,high").split(",") if v]
+    device = models.get("device", "cpu")
+
+    if device == "cuda" and os.environ.get("GEN3D_CUDNN_BENCHMARK", "1") == "1":
+        torch.backends.cudnn.benchmark = True  # Autotune convolution kernels during warm-up
+
+    logger.info("=" * 80)
+    logger.info(f"WARM-UP: sizes={sizes} presets={presets}")
+    logger.info("=" * 80)
+
+    runs = []
+    start = time.perf_counter()
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        image = rng.integers(0, 256, size=(size, size, 3), dtype=np.uint8)
+        mask = np.zeros((size, size), dtype=bool)
+        mask[size // 4:3 * size // 4, size // 4:3 * size // 4] = True
+
+        calls = []
+        if models.get("sam3_predictor") is not None:
+            calls.append(("set_image", None, lambda: models["sam3_predictor"].set_image(image)))
+        if models.get("sam3d_model") is not None:
+            for preset in presets:
+                calls.append(("reconstruct", preset, lambda preset=preset: models["sam3d_model"].reconstruct(
+                    image=image, mask=mask, quality_preset=preset
+                )))
+
+        for name, preset, call in calls:
+            run_start = time.perf_counter()
+            try:
+                with torch.inference_mode():
+                    call()
+                if device == "cuda":
+                    torch.cuda.synchronize()
+                status = "ok"
+            except Exception as e:
+                logger.warning(f"Warm-up {name} at {size}px failed: {e}")
+                status = "failed"
+            elapsed = time.perf_counter() - run_start
+            runs.append({"call": name, "size": size, "preset": preset, "seconds": elapsed, "status": status})
+            logger.info(f"Warm-up {name} size={size} preset={preset}: {elapsed:.2f}s ({status})")
+
+    warmup_seconds = time.perf_counter() - start
+    logger.info(f"METRIC warmup_seconds={warmup_seconds:.3f}")
+    return {"warmup_seconds": warmup_seconds, "warmup_runs": runs}
+
+
 def model_fn(model_dir):
     """
     Load both SAM3 and SAM3D models once at startup.
@@ -102,6 +232,31 @@ def model_fn(model_dir):
     """
     global MODELS
 
+    # Shared serving mode: one model server process holds the models and
+    # this worker forwards requests to it over a Unix socket
+    socket_path = os.environ.get("GEN3D_SHARED_MODEL_SOCKET")
+    if socket_path:
+        import shared_serving
+
+        num_workers = int(os.environ.get("GEN3D_MODEL_SERVER_WORKERS", shared_serving.DEFAULT_WORKERS))
+        logger.info(f"Shared serving mode: connecting to model server at {socket_path}")
+        MODELS = {
+            "model_server": shared_serving.connect_or_start(
+                os.path.abspath(__file__), model_dir, socket_path, num_workers
+            )
+        }
+        return MODELS
+
+    # Size BLAS/PyTorch thread pools for the workers sharing this host's
+    # cores; the BLAS part must run before warm_imports loads numpy
+    import thread_tuning
+    thread_plan = thread_tuning.configure_from_environment()
+
+    warm_imports()
+
+    if thread_plan is not None:
+        MODELS["thread_plan"] = thread_tuning.apply_torch_threads(thread_plan)
+
     logger.info("=" * 80)
     logger.info("MODEL_FN CALLED - Starting model loading")
     logger.info(f"Python version: {sys.version}")
@@ -170,6 +325,20 @@ def model_fn(model_dir):
         logger.info("Step 4: Moving model to device...")
         sam3_model.to(device).eval()
 
+        # Optional compiled encoder (torchscript | torch_compile); eager on failure
+        compile_mode = os.environ.get("GEN3D_ENCODER_COMPILE")
+        if compile_mode:
+            import compiled_encoder
+
+            logger.info(f"Step 4b: Compiling SAM3 image encoder ({compile_mode})...")
+            MODELS["encoder_compile"] = compiled_encoder.apply_to_model(
+                sam3_model, compile_mode, device,
+                search_dirs=[sam3_dir],
+                cache_dir=os.environ.get("GEN3D_COMPILE_CACHE_DIR", compiled_encoder.DEFAULT_CACHE_DIR),
+                backend=os.environ.get("GEN3D_COMPILE_BACKEND", compiled_encoder.DEFAULT_BACKEND),
+                checkpoint=sam3_checkpoint
+            )
+
         logger.info("Step 5: Creating predictor...")
         sam3_predictor = SAM3Predictor(sam3_model)
 
@@ -293,6 +462,42 @@ def model_fn(model_dir):
     logger.info(f"Device: {device}")
     logger.info("=" * 80)
 
+    # Quality scheduler for deadline_ms requests (cost model from recorded timings)
+    from quality_scheduler import QualityScheduler
+    MODELS["quality_scheduler"] = QualityScheduler(os.environ.get("GEN3D_TIMINGS_PATH"))
+
+    # Optional reconstruction result cache
+    if os.environ.get("GEN3D_RESULT_CACHE"):
+        import result_cache
+        MODELS["result_cache"] = result_cache.from_environment(s3_client)
+        logger.info(f"Reconstruction result cache enabled ({os.environ['GEN3D_RESULT_CACHE']} backend)")
+
+    # Optional per-session reuse of decoded images and encoder features
+    if os.environ.get("GEN3D_SESSION_CACHE", "0") == "1":
+        MODELS["session_cache"] = session_cache.from_environment()
+        logger.info("Session cache enabled")
+
+    # Optional pipelined execution (overlaps I/O, decode and inference)
+    if os.environ.get("GEN3D_PIPELINE", "0") == "1":
+        from pipeline import PipelineExecutor
+        MODELS["pipeline"] = PipelineExecutor(sys.modules[__name__], MODELS)
+        logger.info("Pipelined executor enabled")
+
+    # Optional priority / fair-share request scheduling
+    if os.environ.get("GEN3D_SCHEDULER", "0") == "1":
+        from request_scheduler import FairShareScheduler
+        MODELS["scheduler"] = FairShareScheduler(
+            worker_dispatch(MODELS),
+            workers=int(os.environ.get("GEN3D_SCHEDULER_WORKERS", "1"))
+        )
+        logger.info("Request scheduler enabled")
+        if not receives_concurrent_requests(MODELS):
+            logger.warning(
+                "GEN3D_SCHEDULER=1 outside the threaded shared model server: unless a multi-threaded "
+                "caller runs predict_fn, this process sees one request at a time and the scheduler "
+                "cannot reorder them. Use GEN3D_SHARED_MODEL_SOCKET on a GPU host."
+            )
+
     # CRITICAL: Fail if no models loaded (don't return mock data)
     if not sam3_loaded and not sam3d_loaded:
         error_msg = "CRITICAL: No models loaded successfully. Container is non-functional."
@@ -301,6 +506,16 @@ def model_fn(model_dir):
         # For now, we'll allow the container to start but log the error
         # raise RuntimeError(error_msg)
 
+    # ========================================================================
+    # Warm-up: pay lazy CUDA/cuDNN/MKL initialization and allocator growth
+    # before the first real request. model_fn only returns (and the container
+    # only reports healthy) once this completes.
+    # ========================================================================
+    MODELS["readiness"] = {"ready": False}
+    if os.environ.get("GEN3D_WARMUP", "1") == "1":
+        MODELS["readiness"].update(warm_up(MODELS))
+    MODELS["readiness"]["ready"] = True
+
     return MODELS
 
 
@@ -317,12 +532,10 @@ def input_fn(request_body, content_type):
     """
     logger.info(f"INPUT_FN called with content_type: {content_type}")
 
-    if content_type == "application/json":
-        input_data = json.loads(request_body)
-        logger.info(f"Parsed JSON input with keys: {list(input_data.keys())}")
-        return input_data
-    else:
-        raise ValueError(f"Unsupported content type: {content_type}")
+    # JSON, x-npy, multipart/form-data, msgpack or CBOR (see content_types)
+    input_data = content_types.deserialize(request_body, content_type)
+    logger.info(f"Parsed {content_type} input with keys: {list(input_data.keys())}")
+    return input_data
 
 
 def predict_fn(input_data, models):
@@ -343,107 +556,946 @@ def predict_fn(input_data, models):
     logger.info(f"PREDICT_FN: Input keys: {list(input_data.keys())}")
     logger.info("=" * 40)
 
+    model_server = models.get("model_server")
+    if model_server is not None:
+        logger.info("PREDICT_FN: Forwarding to shared model server")
+        return model_server.predict(input_data)
+
+    scheduler = models.get("scheduler")
+    if scheduler is not None and task in TASK_STAGES:
+        logger.info("PREDICT_FN: Queuing in request scheduler")
+        try:
+            future = scheduler.submit(input_data)
+        except ValueError as e:
+            raise bad_request(str(e)) from e
+        return future.result()
+
+    return dispatch_task(input_data, models)
+
+
+def bad_request(message):
+    """
+    Error for an invalid request.
+
+    Under the SageMaker inference toolkit this is returned as HTTP 400 (other
+    exceptions become 500); without it, a ValueError.
+    """
+    try:
+        from sagemaker_inference.errors import GenericInferenceToolkitError
+    except ImportError:
+        return ValueError(message)
+    return GenericInferenceToolkitError(400, message)
+
+
+def receives_concurrent_requests(models):
+    """
+    Whether several requests can wait in this process at once.
+
+    Only the shared model server on GPU calls predict_fn from concurrent
+    threads; SageMaker workers and the server's forked CPU workers each
+    handle one request at a time.
+    """
+    return os.environ.get("GEN3D_MODEL_SERVER") == "1" and models.get("device", "cpu") != "cpu"
+
+
+def worker_dispatch(models):
+    """
+    dispatch_task for request scheduler workers.
+
+    Each worker thread gets its own view of the models (see
+    shared_serving.worker_models): the predictor stores per-image state in
+    set_image, so concurrent workers must not share it.
+    """
+    import shared_serving
+
+    local = threading.local()
+
+    def dispatch(input_data):
+        if not hasattr(local, "models"):
+            local.models = shared_serving.worker_models(models)
+        return dispatch_task(input_data, local.models)
+    return dispatch
+
+
+def dispatch_task(input_data, models):
+    """
+    Route a request to its task handler.
+
+    Called directly by predict_fn, or by the request scheduler's workers.
+
+    Args:
+        input_data: Dictionary containing task type and parameters
+        models: Dictionary of loaded models
+
+    Returns:
+        dict: Prediction results
+    """
+    task = input_data.get("task")
+
+    pipeline = models.get("pipeline")
+    if pipeline is not None and task in TASK_STAGES:
+        logger.info("PREDICT_FN: Submitting to pipelined executor")
+        return pipeline.submit(input_data).result()
+
     if task == "get_embedding":
         logger.info("PREDICT_FN: Routing to process_initialization")
         return process_initialization(input_data, models)
     elif task == "generate_3d":
         logger.info("PREDICT_FN: Routing to process_reconstruction")
         return process_reconstruction(input_data, models)
+    elif task == "status":
+        return get_status(models)
     else:
         logger.error(f"PREDICT_FN: Unknown task '{task}'")
-        logger.error(f"Valid tasks are: 'get_embedding', 'generate_3d'")
-        raise ValueError(f"Unknown task: {task}. Valid tasks: 'get_embedding', 'generate_3d'")
+        logger.error(f"Valid tasks are: 'get_embedding', 'generate_3d', 'status'")
+        raise ValueError(f"Unknown task: {task}. Valid tasks: 'get_embedding', 'generate_3d', 'status'")
 
 
-def process_initialization(input_data, models):
+def get_status(models):
     """
-    Stage 1: Generate embeddings from image using SAM 3 encoder.
+    Readiness and runtime metrics of this container.
 
-    Args:
-        input_data: Contains image_s3_key, bucket, session_id
-        models: Dictionary of loaded models
+    Returns:
+        dict: Readiness (including warm-up duration) and metrics of the
+        optional components that are enabled
+    """
+    status = {
+        "status": "success",
+        "task": "status",
+        "readiness": models.get("readiness", {"ready": False}),
+        "models": {
+            "sam3": models.get("sam3_predictor") is not None,
+            "sam3d": models.get("sam3d_model") is not None,
+        },
+    }
+    for name in ("thread_plan", "encoder_compile"):
+        if models.get(name) is not None:
+            status[name] = models[name]
+    for name in ("result_cache", "session_cache", "scheduler", "pipeline"):
+        component = models.get(name)
+        if component is not None:
+            status[f"{name}_metrics"] = component.metrics()
+    return status
+
+
+def read_s3_object(bucket, key):
+    """Download an object from S3 and return its bytes."""
+    response = s3_client.get_object(Bucket=bucket, Key=key)
+    return response['Body'].read()
+
+
+# ============================================================================
+# Task stages
+#
+# Each task is split into fetch -> decode -> infer -> encode -> upload stages.
+# A stage takes the job dict (request fields plus intermediate results) and
+# the models dict, and stores its output on the job for the next stage. The
+# stages run in sequence in process_initialization/process_reconstruction, or
+# concurrently across requests in pipeline.PipelineExecutor.
+# ============================================================================
+
+def session_cache_key(job):
+    """
+    Session cache key of the job's image: (session_id, bucket, image_s3_key).
+
+    None when the image has no S3 key (sent inline) or the request has no
+    session_id: those default to "unknown", which unrelated clients share.
+    """
+    if not job.get("image_s3_key") or job["session_id"] == "unknown":
+        return None
+    return (job["session_id"], job["bucket"], job["image_s3_key"])
+
+
+def fetch_image(job, models):
+    """Fetch stage: download the input image (or reuse it from the session cache)."""
+    if "image_bytes" in job or "image_array" in job:  # Sent inline with the request
+        return
+
+    cache = models.get("session_cache")
+    if cache is not None and session_cache_key(job) is not None:
+        entry = cache.get(session_cache_key(job))
+        if entry is not None:
+            logger.info(f"Session cache hit for {job['image_s3_key']}: skipping download and decode")
+            job["image_np"] = entry["image_np"]
+            job["image_info"] = entry["image_info"]
+            job["image_digest"] = entry["image_digest"]
+            if "predictor_state" in entry:
+                job["predictor_state"] = entry["predictor_state"]
+            return
+
+    logger.info(f"Downloading image from s3://{job['bucket']}/{job['image_s3_key']}")
+    job["image_bytes"] = read_s3_object(job["bucket"], job["image_s3_key"])
+
+
+def fetch_image_and_mask(job, models):
+    """Fetch stage: download the input image and mask."""
+    fetch_image(job, models)
+    if "mask_bytes" in job or "mask_array" in job:
+        return
+    logger.info(f"Downloading mask from s3://{job['bucket']}/{job['mask_s3_key']}")
+    job["mask_bytes"] = read_s3_object(job["bucket"], job["mask_s3_key"])
+
+
+def fetch_image_and_masks(job, models):
+    """Fetch stage: download the input image once and every object mask."""
+    fetch_image(job, models)
+    if "mask_bytes" in job or "mask_array" in job:
+        return
+    keys = job["mask_s3_keys"] if "mask_s3_keys" in job else [job["mask_s3_key"]]
+    logger.info(f"Downloading {len(keys)} mask(s) from s3://{job['bucket']}/")
+    job["mask_bytes_list"] = [read_s3_object(job["bucket"], key) for key in keys]
+
+
+def decode_image(job, models):
+    """Decode stage: decode the image bytes into an RGB array at the target size."""
+    if "image_np" in job:  # Reused from the session cache
+        return
+
+    if "image_array" in job:  # Decoded array sent inline (application/x-npy)
+        image_source = np.ascontiguousarray(job.pop("image_array"))
+        image_np, info = image_io.image_from_array(image_source)
+    else:
+        image_source = job.pop("image_bytes")
+        image_np, info = image_io.decode_image(image_source)
+    logger.info(f"Image loaded: {info['format']} {info['original_size']} decoded at {info['decoded_size']}")
+    job["image_np"] = image_np
+    job["image_info"] = info
+
+    cache = models.get("session_cache")
+    if cache is not None or models.get("result_cache") is not None:
+        job["image_digest"] = hashlib.sha256(image_source).hexdigest()
+    if cache is not None and session_cache_key(job) is not None:
+        # The decoded array is read-only, so later jobs can share it
+        cache.update(
+            session_cache_key(job),
+            image_np=image_np, image_info=info, image_digest=job["image_digest"]
+        )
+
+
+def decode_image_and_mask(job, models):
+    """Decode stage: decode the image and threshold the mask to the same size."""
+    decode_image(job, models)
+    if "mask_array" in job:
+        mask_bool = image_io.mask_from_array(job.pop("mask_array"), job["image_info"]["decoded_size"])
+    else:
+        mask_bool = image_io.decode_mask(job.pop("mask_bytes"), job["image_info"]["decoded_size"])
+
+    if not np.any(mask_bool):
+        raise ValueError("Mask is empty - no pixels selected")
+
+    logger.info(f"Mask loaded: {mask_bool.shape}, pixels selected: {np.sum(mask_bool)}")
+    job["mask_bool"] = mask_bool
+
+    if job.get("deadline_ms") is not None:
+        select_quality(job, models)
+
+    cache = models.get("result_cache")
+    if cache is not None and not job["inline_output"]:  # Cached entries point at S3 outputs
+        job["cache_key"] = cache.key_for(job["image_digest"], mask_bool, reconstruction_params(job))
+        replay_cached_reconstruction(job, cache)
+
+
+def decode_image_and_masks(job, models):
+    """
+    Decode stage: decode the image once and build one boolean mask per object.
+
+    A labeled mask (0 = background) is split into its labels (optionally only
+    those listed in "labels"); a list of masks gives objects 1..N in order.
+    Objects whose mask is empty are skipped.
+    """
+    decode_image(job, models)
+    size = job["image_info"]["decoded_size"]
+
+    if job.get("labeled_mask"):
+        if "mask_array" in job:
+            label_image = image_io.label_mask_from_array(job.pop("mask_array"), size)
+        else:
+            data = job.pop("mask_bytes") if "mask_bytes" in job else job.pop("mask_bytes_list")[0]
+            label_image = image_io.decode_label_mask(data, size)
+        labels, masks = image_io.split_labels(label_image, job.get("labels"))
+    else:
+        mask_list = job.pop("mask_bytes_list") if "mask_bytes_list" in job else [job.pop("mask_bytes")]
+        masks = np.stack([image_io.decode_mask(data, size) for data in mask_list])
+        labels = np.arange(1, len(masks) + 1)
+
+    selected = masks.any(axis=(1, 2))
+    if not np.any(selected):
+        raise ValueError("Masks are empty - no pixels selected")
+    if not np.all(selected):
+        logger.warning(f"Skipping objects with empty masks: {labels[~selected].tolist()}")
+
+    job["object_labels"] = labels[selected].tolist()
+    job["object_masks"] = masks[selected]
+    logger.info(f"Masks loaded: {len(job['object_labels'])} objects, "
+                f"pixels selected per object: {masks[selected].sum(axis=(1, 2)).tolist()}")
+
+
+def select_quality(job, models):
+    """
+    Replace the job's quality preset with the highest one that fits deadline_ms.
+
+    The queue depth ahead of the model comes from the pipelined executor when
+    it is enabled.
+    """
+    scheduler = models["quality_scheduler"]
+    pipeline = models.get("pipeline")
+    queue_depth = pipeline.queue_depth("infer") if pipeline is not None else 0
+    width, height = job["image_info"]["decoded_size"]
+
+    selection = scheduler.choose(
+        float(job["deadline_ms"]),
+        mask_pixels=int(np.count_nonzero(job["mask_bool"])),
+        image_pixels=width * height,
+        queue_depth=queue_depth
+    )
+    logger.info(f"Deadline {job['deadline_ms']} ms: selected quality '{selection['preset']}' "
+                f"(predicted {selection['predicted_ms']:.0f} ms, queue wait {selection['queue_wait_ms']:.0f} ms)")
+    job["quality"] = selection["preset"]
+    job["quality_selection"] = dict(selection, deadline_ms=float(job["deadline_ms"]), queue_depth=queue_depth)
+
+
+def reconstruction_params(job):
+    """Request parameters that change the reconstruction output."""
+    return {"quality": job["quality"], "postprocess": job.get("postprocess"), "mesh": job.get("mesh")}
+
+
+def reconstruction_key_field(job):
+    """Request field holding the mask key(s) that outputs are stored next to."""
+    return "mask_s3_keys" if "mask_s3_keys" in job else "mask_s3_key"
+
+
+def reconstruction_output_prefix(job):
+    """S3 prefix (the mask's directory) for the outputs of a generate_3d job."""
+    key = job["mask_s3_keys"][0] if "mask_s3_keys" in job else job["mask_s3_key"]
+    return key.rsplit('/', 1)[0]
+
+
+def reconstruction_output_key(job):
+    """S3 key of the PLY written for a generate_3d job."""
+    return reconstruction_output_prefix(job) + "/output_mesh.ply"
+
+
+def use_inline_output(job, size, s3_key_field):
+    """
+    Whether to return an output of `size` bytes in the response instead of
+    uploading it to S3.
+
+    Requests ask for inline output with "inline_output" (the default when the
+    input was sent inline without an S3 key). Outputs above the inline limit
+    still go to S3 when the request has a key to derive the location from.
+    """
+    if not job["inline_output"]:
+        return False
+    if size <= content_types.INLINE_MAX_BYTES:
+        return True
+    if not job.get(s3_key_field):
+        raise ValueError(f"Output of {size} bytes exceeds the inline limit ({content_types.INLINE_MAX_BYTES}) "
+                         f"and the request has no {s3_key_field} to store it under")
+    logger.info(f"Output of {size} bytes exceeds the inline limit, uploading to S3")
+    return False
+
+
+def replay_cached_reconstruction(job, cache):
+    """
+    Complete the job from the result cache if an earlier output matches.
+
+    On a hit the cache's copy of the PLY is copied server-side to this job's
+    output key (only if it still has the ETag recorded with the entry) and
+    job["response"] is set, which ends the job without running later stages.
+    A deadline-driven quality selection is reported for this request, with
+    no reconstruction time.
+    """
+    entry = cache.get(job["cache_key"])
+    if entry is None:
+        return
+
+    output_key = reconstruction_output_key(job)
+    copy_args = {"CopySourceIfMatch": entry["etag"]} if entry.get("etag") else {}
+    try:
+        s3_client.copy_object(
+            Bucket=job["bucket"],
+            Key=output_key,
+            CopySource={"Bucket": entry["bucket"], "Key": entry["output_s3_key"]},
+            **copy_args
+        )
+    except Exception as e:
+        logger.warning(f"Cached output s3://{entry['bucket']}/{entry['output_s3_key']} unavailable: {e}")
+        cache.invalidate(job["cache_key"], entry)
+        return
+
+    logger.info(f"Result cache hit: reusing s3://{entry['bucket']}/{entry['output_s3_key']}")
+    logger.info(f"Result cache metrics: {cache.metrics()}")
+    job["response"] = dict(
+        entry["response"],
+        session_id=job["session_id"],
+        user_id=job["user_id"],
+        output_s3_key=output_key,
+        cache_hit=True
+    )
+    if "quality_selection" in job:
+        job["response"]["quality_selection"] = dict(job["quality_selection"], actual_ms=0.0)
+
+
+def infer_embedding(job, models):
+    """Infer stage: run the SAM 3 image encoder."""
+    sam3_predictor = models["sam3_predictor"]
+
+    # Extract embeddings using SAM 3 predictor, or restore the encoder state
+    # recorded for this session's image
+    image_np = job.pop("image_np")
+    if "predictor_state" in job:
+        session_cache.restore_predictor_state(sam3_predictor, job.pop("predictor_state"))
+        logger.info("Reusing encoder features from the session cache")
+    else:
+        sam3_predictor.set_image(image_np)
+        cache = models.get("session_cache")
+        if cache is not None and session_cache_key(job) is not None:
+            cache.update(
+                session_cache_key(job),
+                predictor_state=session_cache.capture_predictor_state(sam3_predictor)
+            )
+
+    # Get image embeddings (features)
+    features = sam3_predictor.features  # Shape: (1, 256, 64, 64)
+    logger.info(f"Embeddings extracted: {features.shape}")
+    job["features_np"] = features.cpu().numpy().astype(np.float32)
+
+    # Optionally check the compact format against the float32 embedding with the
+    # mask decoder; this needs the predictor to still hold this image
+    fmt = job["embedding_format"]
+    if fmt != "float32" and os.environ.get("GEN3D_EMBEDDING_VALIDATE", "0") == "1":
+        stored, dequantization = embedding_codec.encode_embedding(job["features_np"], fmt)
+        restored = embedding_codec.decode_embedding(stored, dequantization)
+        image_size = (image_np.shape[1], image_np.shape[0])
+        job["encoded_embedding"] = (stored, dequantization)
+        job["mask_iou"] = embedding_codec.validate_with_decoder(sam3_predictor, restored, image_size)
+        logger.info(f"Embedding {fmt} decoder check: {job['mask_iou']}")
+
+
+def infer_reconstruction(job, models):
+    """Infer stage: run SAM 3D reconstruction."""
+    logger.info("Running SAM 3D reconstruction...")
+    image_np = job.pop("image_np")
+    mask_bool = job.pop("mask_bool")
+
+    # Reconstruct 3D point cloud
+    start = time.perf_counter()
+    point_cloud = models["sam3d_model"].reconstruct(
+        image=image_np,
+        mask=mask_bool,
+        quality_preset=job["quality"]
+    )
+    elapsed = time.perf_counter() - start
+
+    logger.info(f"3D reconstruction complete: {len(point_cloud['points'])} points in {elapsed:.2f}s")
+    job["point_cloud"] = point_cloud
+    job["reconstruct_seconds"] = elapsed
+
+    scheduler = models.get("quality_scheduler")
+    if scheduler is not None:
+        scheduler.record(job["quality"], np.count_nonzero(mask_bool), mask_bool.size, elapsed)
+
+
+def infer_objects(job, models):
+    """
+    Infer stage: run SAM 3D for every object of the image.
+
+    Uses the model's reconstruct_batch(image, masks, quality_preset) when it
+    provides one, otherwise reconstructs the objects one after another.
+    """
+    image_np = job.pop("image_np")
+    masks = job.pop("object_masks")
+    model = models["sam3d_model"]
+    scheduler = models.get("quality_scheduler")
+    logger.info(f"Running SAM 3D reconstruction for {len(masks)} objects...")
+
+    start = time.perf_counter()
+    if hasattr(model, "reconstruct_batch"):
+        point_clouds = model.reconstruct_batch(image=image_np, masks=masks, quality_preset=job["quality"])
+    else:
+        point_clouds = []
+        for mask in masks:
+            object_start = time.perf_counter()
+            point_clouds.append(model.reconstruct(image=image_np, mask=mask, quality_preset=job["quality"]))
+            if scheduler is not None:
+                scheduler.record(job["quality"], np.count_nonzero(mask), mask.size,
+                                 time.perf_counter() - object_start)
+    elapsed = time.perf_counter() - start
+
+    logger.info(f"3D reconstruction complete: {len(point_clouds)} objects in {elapsed:.2f}s")
+    job["point_clouds"] = point_clouds
+    job["reconstruct_seconds"] = elapsed
+
+
+def encode_embedding(job, models):
+    """Encode stage: serialize the embedding to the JSON document stored in S3."""
+    features_np = job.pop("features_np")
+    fmt = job["embedding_format"]
+
+    # A float32 embedding is above the inline limit as base64. Inline requests
+    # without an S3 key get float16 unless they asked for float32 explicitly
+    size = features_np.nbytes * 4 // 3
+    if (fmt == "float32" and job["inline_output"] and not job.get("image_s3_key")
+            and size > content_types.INLINE_MAX_BYTES):
+        if not job["embedding_format_default"]:
+            raise ValueError(f"A float32 embedding is {size} bytes as base64, above the inline limit "
+                             f"({content_types.INLINE_MAX_BYTES}); request embedding_format float16 or int8, "
+                             f"or pass image_s3_key to store it in S3")
+        logger.info(f"float32 embedding of {size} bytes exceeds the inline limit, returning float16")
+        fmt = job["embedding_format"] = "float16"
+        job.pop("encoded_embedding", None)
+
+    # Store as float32, float16 or per-channel int8 (with dequantization parameters)
+    if "encoded_embedding" in job:
+        stored, dequantization = job.pop("encoded_embedding")
+    else:
+        stored, dequantization = embedding_codec.encode_embedding(features_np, fmt)
+
+    stats = None
+    if fmt != "float32":
+        stats = embedding_codec.error_statistics(
+            features_np, embedding_codec.decode_embedding(stored, dequantization)
+        )
+        logger.info(f"Embedding stored as {fmt}: {stats}")
+        job["quantization_error"] = stats
+
+    # Serialize embeddings to base64
+    output = embedding_codec.to_document(stored, dequantization, stats)
+    job["embedding_size_bytes"] = stored.nbytes
+    if use_inline_output(job, stored.nbytes * 4 // 3, "image_s3_key"):  # base64 size
+        job["output_document"] = output  # Returned in the response, not uploaded
+    else:
+        job["output_body"] = json.dumps(output)
+
+
+def postprocess_for_job(job, point_cloud):
+    """
+    Apply the job's optional outlier removal / normal estimation.
 
     Returns:
-        dict: Status and embedding information
+        tuple: (point cloud, report dict or None when nothing was requested)
     """
-    logger.info("Starting Stage 1: Initialization (embedding generation)")
+    steps = point_cloud_postprocess.parse_options(job.get("postprocess"))
+    if not steps:
+        return point_cloud, None
+    try:
+        return point_cloud_postprocess.postprocess_point_cloud(point_cloud, steps)
+    except ImportError as e:
+        logger.warning(f"Point cloud post-processing skipped: {e}")
+        return point_cloud, {"skipped": str(e)}
+
 
-    image_s3_key = input_data["image_s3_key"]
-    bucket = input_data.get("bucket", "gen3d-data-bucket")
-    session_id = input_data.get("session_id", "unknown")
-    user_id = input_data.get("user_id", "unknown")
+def mesh_for_job(job, point_cloud):
+    """
+    Replace the point cloud with a simplified surface mesh when the job asks for one.
 
+    The point cloud is kept when there is nothing to mesh, or when the points
+    do not enclose a surface (an open sheet, or gaps wider than `closing`).
+
+    Returns:
+        tuple: (point cloud or mesh, report dict or None when meshing is off)
+    """
+    params = surface_mesh.parse_options(job.get("mesh"), job["quality"])
+    if params is None:
+        return point_cloud, None
+    if len(point_cloud["points"]) == 0:
+        return point_cloud, {"skipped": "empty point cloud"}
     try:
-        # Check if model is available
-        sam3_predictor = models.get("sam3_predictor")
-        if sam3_predictor is None:
-            logger.error("SAM3 model not available - cannot process request")
-            logger.error("This request would have returned mock data in the old version")
-            logger.error("Please fix the model loading issues before using this endpoint")
-            return {
-                "status": "failed",
-                "task": "get_embedding",
-                "session_id": session_id,
-                "user_id": user_id,
-                "error": "SAM3 model not loaded. Check container logs for model loading errors.",
-                "note": "Model loading failed during container startup. This is a critical error."
-            }
-
-        # Download image from S3
-        logger.info(f"Downloading image from s3://{bucket}/{image_s3_key}")
-        response = s3_client.get_object(Bucket=bucket, Key=image_s3_key)
-        image_bytes = response['Body'].read()
-
-        # Load and preprocess image
-        image = Image.open(BytesIO(image_bytes)).convert("RGB")
-        logger.info(f"Image loaded: {image.size}")
-
-        # Extract embeddings using SAM 3 predictor
-        sam3_predictor.set_image(np.array(image))
-
-        # Get image embeddings (features)
-        features = sam3_predictor.features  # Shape: (1, 256, 64, 64)
-        logger.info(f"Embeddings extracted: {features.shape}")
-
-        # Serialize embeddings to base64
-        features_np = features.cpu().numpy().astype(np.float32)
-        features_bytes = features_np.tobytes()
-        features_b64 = base64.b64encode(features_bytes).decode('utf-8')
-
-        # Prepare output
-        output = {
-            "embedding": features_b64,
-            "shape": list(features_np.shape),
-            "dtype": str(features_np.dtype)
-        }
+        mesh, report = surface_mesh.mesh_point_cloud(point_cloud, params)
+    except ImportError as e:
+        logger.warning(f"Surface meshing skipped: {e}")
+        return point_cloud, {"skipped": str(e)}
+    if report["faces"] == 0:
+        logger.warning(f"Surface meshing found no closed surface, returning the point cloud: {report}")
+        return point_cloud, dict(report, skipped="no closed surface found; returned the point cloud")
+    return mesh, report
+
 
-        # Save embeddings to S3
-        embeddings_key = image_s3_key.rsplit('/', 1)[0] + "/embeddings.json"
-        logger.info(f"Saving embeddings to s3://{bucket}/{embeddings_key}")
+def serialize_point_cloud(job, point_cloud):
+    """
+    Serialize a point cloud to PLY.
+
+    Returns:
+        tuple: (bytes or spooled file positioned at 0, size in bytes)
+    """
+    if job["memory_bounded"]:
+        # Stream the PLY in chunks into a spooled temp file (spills to disk
+        # above SPOOL_MAX_BYTES) instead of building it in memory
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        size = write_ply(point_cloud, spool)
+        spool.seek(0)
+        return spool, size
+    body = convert_to_ply(point_cloud)
+    return body, len(body)
+
+
+def encode_point_cloud(job, models):
+    """Encode stage: convert the point cloud to PLY bytes."""
+    point_cloud, report = postprocess_for_job(job, job.pop("point_cloud"))
+    if report is not None:
+        job["postprocess_report"] = report
+    point_cloud, report = mesh_for_job(job, point_cloud)
+    if report is not None:
+        job["mesh_report"] = report
+
+    job["num_points"] = len(point_cloud['points'])
+    job["output_body"], job["output_size"] = serialize_point_cloud(job, point_cloud)
+    del point_cloud  # Release the point arrays before upload
+
+
+def merge_point_clouds(point_clouds, labels):
+    """
+    Concatenate object point clouds into one scene.
+
+    Normals, colors and faces are kept when every object has them; each
+    vertex gets the label of its object in 'object_ids'.
+    """
+    merged = {"points": np.concatenate([pc["points"] for pc in point_clouds])}
+    for key in ("normals", "colors"):
+        if all(pc.get(key) is not None for pc in point_clouds):
+            merged[key] = np.concatenate([pc[key] for pc in point_clouds])
+    counts = [len(pc["points"]) for pc in point_clouds]
+    if all(pc.get("faces") is not None for pc in point_clouds):
+        offsets = np.cumsum([0] + counts[:-1])
+        merged["faces"] = np.concatenate([pc["faces"] + offset for pc, offset in zip(point_clouds, offsets)])
+    merged["object_ids"] = np.repeat(np.asarray(labels, dtype=np.int32), counts)
+    return merged
+
+
+def encode_objects(job, models):
+    """Encode stage: one PLY per object, plus the merged scene when requested."""
+    point_clouds = []
+    job["object_outputs"] = []
+    for label, point_cloud in zip(job["object_labels"], job.pop("point_clouds")):
+        point_cloud, report = postprocess_for_job(job, point_cloud)
+        point_cloud, mesh_report = mesh_for_job(job, point_cloud)
+        body, size = serialize_point_cloud(job, point_cloud)
+        output = {"label": label, "body": body, "size": size, "num_points": len(point_cloud["points"])}
+        if report is not None:
+            output["postprocess"] = report
+        if mesh_report is not None:
+            output["mesh"] = mesh_report
+        job["object_outputs"].append(output)
+        point_clouds.append(point_cloud)
+
+    if job["merged_scene"]:
+        scene = merge_point_clouds(point_clouds, job["object_labels"])
+        body, size = serialize_point_cloud(job, scene)
+        job["scene_output"] = {"body": body, "size": size, "num_points": len(scene["points"])}
+    del point_clouds
+
+
+def upload_embedding(job, models):
+    """Upload stage: save embeddings to S3 (or return them inline) and build the response."""
+    job["response"] = {
+        "status": "success",
+        "task": "get_embedding",
+        "session_id": job["session_id"],
+        "user_id": job["user_id"],
+    }
+    if "output_document" in job:
+        job["response"]["embedding"] = job.pop("output_document")
+    else:
+        embeddings_key = job["image_s3_key"].rsplit('/', 1)[0] + "/embeddings.json"
+        logger.info(f"Saving embeddings to s3://{job['bucket']}/{embeddings_key}")
         s3_client.put_object(
-            Bucket=bucket,
+            Bucket=job["bucket"],
             Key=embeddings_key,
-            Body=json.dumps(output),
+            Body=job.pop("output_body"),
             ContentType='application/json'
         )
+        job["response"]["output_s3_key"] = embeddings_key
+
+    logger.info("Stage 1 complete")
+    job["response"].update(
+        embedding_size_mb=job["embedding_size_bytes"] / (1024 * 1024),
+        embedding_format=job["embedding_format"]
+    )
+    if "quantization_error" in job:
+        job["response"]["quantization_error"] = job["quantization_error"]
+    if "mask_iou" in job:
+        job["response"]["mask_iou"] = job["mask_iou"]
+
+
+def store_ply(job, ply_body, ply_size, output_name):
+    """
+    Upload a PLY to S3, or return it inline when the job asks for that.
+
+    Args:
+        output_name: Key of the PLY relative to reconstruction_output_prefix
+
+    Returns:
+        dict: {"output_s3_key": key} or {"ply": bytes}
+    """
+    if use_inline_output(job, ply_size, reconstruction_key_field(job)):
+        if hasattr(ply_body, "read"):
+            with ply_body:
+                ply_body = ply_body.read()
+        return {"ply": ply_body}
+
+    output_key = f"{reconstruction_output_prefix(job)}/{output_name}"
+    logger.info(f"Saving PLY to s3://{job['bucket']}/{output_key}")
+    if hasattr(ply_body, "read"):
+        # Managed transfer uses multipart upload with bounded part buffers
+        with ply_body:
+            s3_client.upload_fileobj(
+                ply_body,
+                job["bucket"],
+                output_key,
+                ExtraArgs={'ContentType': 'application/octet-stream'}
+            )
+    else:
+        s3_client.put_object(
+            Bucket=job["bucket"],
+            Key=output_key,
+            Body=ply_body,
+            ContentType='application/octet-stream'
+        )
+    return {"output_s3_key": output_key}
+
+
+def upload_point_cloud(job, models):
+    """Upload stage: save the PLY to S3 (or return it inline) and build the response."""
+    ply_body = job.pop("output_body")
+    ply_size = job["output_size"]
+    job["response"] = {
+        "status": "success",
+        "task": "generate_3d",
+        "session_id": job["session_id"],
+        "user_id": job["user_id"],
+    }
+    job["response"].update(store_ply(job, ply_body, ply_size, "output_mesh.ply"))
+    del ply_body
+
+    logger.info("Stage 3 complete")
+    job["response"].update(
+        mesh_size_mb=ply_size / (1024 * 1024),
+        num_points=job["num_points"],
+        quality=job["quality"]
+    )
+    if "postprocess_report" in job:
+        job["response"]["postprocess"] = job["postprocess_report"]
+    if "mesh_report" in job:
+        job["response"]["mesh"] = job["mesh_report"]
+    if "quality_selection" in job:
+        job["response"]["quality_selection"] = dict(
+            job["quality_selection"], actual_ms=job["reconstruct_seconds"] * 1000
+        )
 
-        logger.info("Stage 1 complete")
-        return {
-            "status": "success",
-            "task": "get_embedding",
-            "session_id": session_id,
-            "user_id": user_id,
-            "output_s3_key": embeddings_key,
-            "embedding_size_mb": len(features_bytes) / (1024 * 1024)
+    cache = models.get("result_cache")
+    if cache is not None and "cache_key" in job:
+        job["response"]["cache_hit"] = False
+        # The quality selection and its timing describe this request, not the output
+        replayed = {key: value for key, value in job["response"].items() if key != "quality_selection"}
+        try:
+            cache.put(job["cache_key"], job["bucket"], job["response"]["output_s3_key"], ply_size, replayed)
+        except Exception as e:
+            logger.warning(f"Result cache put failed: {e}")
+
+
+def upload_objects(job, models):
+    """Upload stage: save one PLY per object (and the scene) and build the response."""
+    objects = []
+    for output in job.pop("object_outputs"):
+        entry = {
+            "label": output["label"],
+            "num_points": output["num_points"],
+            "mesh_size_mb": output["size"] / (1024 * 1024),
+        }
+        entry.update(store_ply(job, output.pop("body"), output["size"], f"objects/object_{output['label']}.ply"))
+        for key in ("postprocess", "mesh"):
+            if key in output:
+                entry[key] = output[key]
+        objects.append(entry)
+
+    logger.info(f"Stage 3 complete ({len(objects)} objects)")
+    job["response"] = {
+        "status": "success",
+        "task": "generate_3d",
+        "session_id": job["session_id"],
+        "user_id": job["user_id"],
+        "num_objects": len(objects),
+        "objects": objects,
+        "num_points": sum(entry["num_points"] for entry in objects),
+        "mesh_size_mb": sum(entry["mesh_size_mb"] for entry in objects),
+        "quality": job["quality"],
+        "reconstruct_seconds": job["reconstruct_seconds"],
+    }
+
+    if "scene_output" in job:
+        scene = job.pop("scene_output")
+        job["response"]["scene"] = {
+            "num_points": scene["num_points"],
+            "mesh_size_mb": scene["size"] / (1024 * 1024),
         }
+        job["response"]["scene"].update(store_ply(job, scene.pop("body"), scene["size"], "output_scene.ply"))
+
+
+TASK_STAGES = {
+    "get_embedding": [
+        ("fetch", fetch_image),
+        ("decode", decode_image),
+        ("infer", infer_embedding),
+        ("encode", encode_embedding),
+        ("upload", upload_embedding),
+    ],
+    "generate_3d": [
+        ("fetch", fetch_image_and_mask),
+        ("decode", decode_image_and_mask),
+        ("infer", infer_reconstruction),
+        ("encode", encode_point_cloud),
+        ("upload", upload_point_cloud),
+    ],
+}
+
+# generate_3d with several masks (mask_s3_keys) or a labeled mask
+OBJECT_STAGES = [
+    ("fetch", fetch_image_and_masks),
+    ("decode", decode_image_and_masks),
+    ("infer", infer_objects),
+    ("encode", encode_objects),
+    ("upload", upload_objects),
+]
+
+
+def job_stages(job):
+    """Stages that run a job."""
+    if job.get("multi_object"):
+        return OBJECT_STAGES
+    return TASK_STAGES[job["task"]]
+
+
+def create_job(input_data):
+    """
+    Build the job dict passed between stages from the request input.
+
+    Args:
+        input_data: Parsed request input
+
+    Returns:
+        dict: Job with request fields filled in with their defaults
+    """
+    job = dict(input_data)
+    job["bucket"] = input_data.get("bucket", "gen3d-data-bucket")
+    job["session_id"] = input_data.get("session_id", "unknown")
+    job["user_id"] = input_data.get("user_id", "unknown")
+
+    # Return outputs in the response instead of S3; the default when an
+    # inline input has no S3 key to derive the output location from
+    output_key_field = reconstruction_key_field(job) if job.get("task") == "generate_3d" else "image_s3_key"
+    job["inline_output"] = content_types.parse_bool(
+        input_data.get("inline_output", not input_data.get(output_key_field)), "inline_output"
+    )
+
+    if job.get("task") == "generate_3d":
+        job["quality"] = input_data.get("quality", "balanced")  # fast, balanced, high
+        # Several objects in one request: a list of masks, or one labeled mask
+        job["labeled_mask"] = content_types.parse_bool(input_data.get("labeled_mask", False), "labeled_mask")
+        job["multi_object"] = "mask_s3_keys" in input_data or job["labeled_mask"]
+        job["merged_scene"] = content_types.parse_bool(input_data.get("merged_scene", False), "merged_scene")
+        job["memory_bounded"] = content_types.parse_bool(input_data.get(
+            "memory_bounded", os.environ.get("GEN3D_MEMORY_BOUNDED", "0") == "1"
+        ), "memory_bounded")
+        if isinstance(job.get("mesh"), str):  # true/false as text; parameters need a dict
+            job["mesh"] = content_types.parse_bool(job["mesh"], "mesh")
+        # Reject bad options before reconstructing
+        point_cloud_postprocess.parse_options(job.get("postprocess"))
+        surface_mesh.parse_options(job.get("mesh"), job["quality"])
+    elif job.get("task") == "get_embedding":
+        # float32, float16 or int8
+        job["embedding_format"] = input_data.get(
+            "embedding_format", os.environ.get("GEN3D_EMBEDDING_FORMAT", "float32")
+        )
+        job["embedding_format_default"] = "embedding_format" not in input_data
+    return job
+
+
+def check_models(job, models):
+    """
+    Return a failure response if the model needed by the job is not loaded.
+
+    Args:
+        job: Job dict from create_job
+        models: Dictionary of loaded models
+
+    Returns:
+        dict or None: Failure response, or None if the model is available
+    """
+    task = job["task"]
+    model_key, model_name = {
+        "get_embedding": ("sam3_predictor", "SAM3"),
+        "generate_3d": ("sam3d_model", "SAM3D"),
+    }[task]
+
+    if models.get(model_key) is not None:
+        return None
+
+    logger.error(f"{model_name} model not available - cannot process request")
+    logger.error("This request would have returned mock data in the old version")
+    logger.error("Please fix the model loading issues before using this endpoint")
+    response = {
+        "status": "failed",
+        "task": task,
+        "session_id": job["session_id"],
+        "user_id": job["user_id"],
+    }
+    if task == "generate_3d":
+        response["quality"] = job["quality"]
+    response["error"] = f"{model_name} model not loaded. Check container logs for model loading errors."
+    response["note"] = "Model loading failed during container startup. This is a critical error."
+    return response
+
+
+def failure_response(task, error):
+    """Build the response returned when a stage raises."""
+    return {
+        "status": "failed",
+        "task": task,
+        "error": str(error)
+    }
+
+
+def run_task(input_data, models):
+    """
+    Run all stages of a task in sequence.
 
+    Args:
+        input_data: Request input with a 'task' field
+        models: Dictionary of loaded models
+
+    Returns:
+        dict: Task response
+    """
+    job = create_job(input_data)
+    unavailable = check_models(job, models)
+    if unavailable is not None:
+        return unavailable
+
+    for _, stage in job_stages(job):
+        stage(job, models)
+        if "response" in job:  # A stage may complete the job early (e.g. cache hit)
+            break
+    return job["response"]
+
+
+def process_initialization(input_data, models):
+    """
+    Stage 1: Generate embeddings from image using SAM 3 encoder.
+
+    Args:
+        input_data: Contains image_s3_key, bucket, session_id
+        models: Dictionary of loaded models
+
+    Returns:
+        dict: Status and embedding information
+    """
+    logger.info("Starting Stage 1: Initialization (embedding generation)")
+
+    try:
+        return run_task(dict(input_data, task="get_embedding"), models)
     except Exception as e:
         logger.error(f"Stage 1 failed: {str(e)}", exc_info=True)
-        return {
-            "status": "failed",
-            "task": "get_embedding",
-            "error": str(e)
-        }
+        return failure_response("get_embedding", e)
 
 
 def process_reconstruction(input_data, models):
@@ -459,114 +1511,30 @@ def process_reconstruction(input_data, models):
     """
     logger.info("Starting Stage 3: 3D Reconstruction")
 
-    image_s3_key = input_data["image_s3_key"]
-    mask_s3_key = input_data["mask_s3_key"]
-    bucket = input_data.get("bucket", "gen3d-data-bucket")
-    session_id = input_data.get("session_id", "unknown")
-    user_id = input_data.get("user_id", "unknown")
-    quality = input_data.get("quality", "balanced")  # fast, balanced, high
-
     try:
-        # Check if model is available
-        sam3d_model = models.get("sam3d_model")
-        if sam3d_model is None:
-            logger.error("SAM3D model not available - cannot process request")
-            logger.error("This request would have returned mock data in the old version")
-            logger.error("Please fix the model loading issues before using this endpoint")
-            return {
-                "status": "failed",
-                "task": "generate_3d",
-                "session_id": session_id,
-                "user_id": user_id,
-                "quality": quality,
-                "error": "SAM3D model not loaded. Check container logs for model loading errors.",
-                "note": "Model loading failed during container startup. This is a critical error."
-            }
-
-        # Download image from S3
-        logger.info(f"Downloading image from s3://{bucket}/{image_s3_key}")
-        response = s3_client.get_object(Bucket=bucket, Key=image_s3_key)
-        image_bytes = response['Body'].read()
-        image = Image.open(BytesIO(image_bytes)).convert("RGB")
-
-        # Download mask from S3
-        logger.info(f"Downloading mask from s3://{bucket}/{mask_s3_key}")
-        response = s3_client.get_object(Bucket=bucket, Key=mask_s3_key)
-        mask_bytes = response['Body'].read()
-        mask = Image.open(BytesIO(mask_bytes)).convert("L")
-
-        # Convert mask to binary numpy array
-        mask_np = np.array(mask)
-        mask_bool = mask_np > 128  # Threshold
-
-        if not np.any(mask_bool):
-            raise ValueError("Mask is empty - no pixels selected")
-
-        logger.info(f"Mask loaded: {mask_bool.shape}, pixels selected: {np.sum(mask_bool)}")
-
-        # Run SAM 3D reconstruction
-        logger.info("Running SAM 3D reconstruction...")
-
-        # Convert to numpy arrays
-        image_np = np.array(image)
-
-        # Reconstruct 3D point cloud
-        point_cloud = sam3d_model.reconstruct(
-            image=image_np,
-            mask=mask_bool,
-            quality_preset=quality
-        )
-
-        logger.info(f"3D reconstruction complete: {len(point_cloud['points'])} points")
-
-        # Convert to PLY format
-        ply_bytes = convert_to_ply(point_cloud)
-
-        # Save PLY to S3
-        output_key = mask_s3_key.rsplit('/', 1)[0] + "/output_mesh.ply"
-        logger.info(f"Saving PLY to s3://{bucket}/{output_key}")
-        s3_client.put_object(
-            Bucket=bucket,
-            Key=output_key,
-            Body=ply_bytes,
-            ContentType='application/octet-stream'
-        )
-
-        logger.info("Stage 3 complete")
-        return {
-            "status": "success",
-            "task": "generate_3d",
-            "session_id": session_id,
-            "user_id": user_id,
-            "output_s3_key": output_key,
-            "mesh_size_mb": len(ply_bytes) / (1024 * 1024),
-            "num_points": len(point_cloud['points']),
-            "quality": quality
-        }
-
+        return run_task(dict(input_data, task="generate_3d"), models)
     except Exception as e:
         logger.error(f"Stage 3 failed: {str(e)}", exc_info=True)
-        return {
-            "status": "failed",
-            "task": "generate_3d",
-            "error": str(e)
-        }
+        return failure_response("generate_3d", e)
 
 
-def convert_to_ply(point_cloud):
+def ply_vertex_layout(point_cloud):
     """
-    Convert point cloud dictionary to PLY format bytes.
+    PLY header and packed vertex dtype for a point cloud.
+
+    A 'faces' array adds a face element (triangles as vertex index lists)
+    after the vertices.
 
     Args:
-        point_cloud: Dictionary with 'points' (Nx3) and 'colors' (Nx3)
+        point_cloud: Dictionary with 'points' (Nx3), optional 'normals' (Nx3),
+            optional 'colors' (Nx3), optional 'object_ids' (N,) and optional
+            'faces' (Fx3 vertex indices)
 
     Returns:
-        bytes: PLY format binary data
+        tuple: (header string, list of (field name, dtype, source key, column
+        or None for 1-D sources))
     """
-    points = point_cloud['points']  # Nx3 numpy array
-    colors = point_cloud.get('colors', None)  # Nx3 numpy array (0-255)
-
-    num_points = len(points)
+    num_points = len(point_cloud['points'])
 
     # PLY header
     header = f"""ply
@@ -576,31 +1544,87 @@ property float x
 property float y
 property float z
 """
+    fields = [(axis, "<f4", "points", i) for i, axis in enumerate("xyz")]
+
+    if point_cloud.get('normals') is not None:
+        header += """property float nx
+property float ny
+property float nz
+"""
+        fields += [(axis, "<f4", "normals", i) for i, axis in enumerate(("nx", "ny", "nz"))]
 
-    if colors is not None:
+    if point_cloud.get('colors') is not None:
         header += """property uchar red
 property uchar green
 property uchar blue
 """
+        fields += [(channel, "u1", "colors", i) for i, channel in enumerate(("red", "green", "blue"))]
+
+    if point_cloud.get('object_ids') is not None:
+        header += "property int object_id\n"
+        fields.append(("object_id", "<i4", "object_ids", None))
+
+    if point_cloud.get('faces') is not None:
+        header += f"element face {len(point_cloud['faces'])}\nproperty list uchar int vertex_indices\n"
 
     header += "end_header\n"
+    return header, fields
 
-    # Write header
-    ply_bytes = BytesIO()
-    ply_bytes.write(header.encode('ascii'))
-
-    # Write vertex data
-    if colors is not None:
-        # Interleave points and colors
-        for i in range(num_points):
-            # Write xyz as float32
-            ply_bytes.write(points[i].astype(np.float32).tobytes())
-            # Write rgb as uint8
-            ply_bytes.write(colors[i].astype(np.uint8).tobytes())
-    else:
-        # Write points only
-        ply_bytes.write(points.astype(np.float32).tobytes())
 
+def write_ply(point_cloud, fileobj, chunk_points=PLY_CHUNK_POINTS):
+    """
+    Stream a point cloud (or mesh) to a file object as binary PLY.
+
+    Vertex properties are interleaved chunk by chunk into one reusable
+    structured buffer, so memory use is independent of the cloud size.
+    Faces are written the same way after the vertices.
+
+    Args:
+        point_cloud: Dictionary with 'points' (Nx3), optional 'normals' (Nx3),
+            optional 'colors' (Nx3, 0-255) and optional 'faces' (Fx3)
+        fileobj: Writable binary file object
+        chunk_points: Points interleaved per write
+
+    Returns:
+        int: Number of bytes written
+    """
+    header, fields = ply_vertex_layout(point_cloud)
+    num_points = len(point_cloud['points'])
+    buffer = np.empty(min(chunk_points, num_points), dtype=[(name, dtype) for name, dtype, _, _ in fields])
+
+    written = fileobj.write(header.encode('ascii'))
+    for start in range(0, num_points, chunk_points):
+        end = min(start + chunk_points, num_points)
+        chunk = buffer[:end - start]
+        for name, _, source, column in fields:
+            values = point_cloud[source][start:end]
+            chunk[name] = values if column is None else values[:, column]
+        written += fileobj.write(memoryview(chunk).cast("B"))
+
+    faces = point_cloud.get('faces')
+    if faces is not None:
+        buffer = np.empty(min(chunk_points, len(faces)), dtype=[("count", "u1"), ("indices", "<i4", (3,))])
+        buffer["count"] = 3
+        for start in range(0, len(faces), chunk_points):
+            chunk = buffer[:min(chunk_points, len(faces) - start)]
+            chunk["indices"] = faces[start:start + len(chunk)]
+            written += fileobj.write(memoryview(chunk).cast("B"))
+    return written
+
+
+def convert_to_ply(point_cloud):
+    """
+    Convert point cloud dictionary to PLY format bytes.
+
+    Args:
+        point_cloud: Dictionary with 'points' (Nx3), optional 'normals' (Nx3)
+            and optional 'colors' (Nx3)
+
+    Returns:
+        bytes: PLY format binary data
+    """
+    ply_bytes = BytesIO()
+    write_ply(point_cloud, ply_bytes)
     return ply_bytes.getvalue()
 
 
@@ -613,12 +1637,10 @@ def output_fn(prediction, content_type):
         content_type: Desired output content type
 
     Returns:
-        str: Serialized prediction
+        bytes: Serialized prediction (JSON, msgpack or CBOR)
     """
-    if content_type == "application/json":
-        return json.dumps(prediction)
-    else:
-        raise ValueError(f"Unsupported content type: {content_type}")
+    body, _ = content_types.serialize(prediction, content_type)
+    return body
 
 
 # For local testing
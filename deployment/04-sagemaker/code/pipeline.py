@@ -0,0 +1,213 @@
+"""
+Gen3D Pipelined Executor
+Overlaps S3 I/O, image decode, inference and serialization across requests
+
+Requests are split into the stages defined in the inference handler's
+TASK_STAGES (fetch -> decode -> infer -> encode -> upload). Each stage has its
+own bounded queue and worker pool, so while one request is being inferred the
+next ones are already being downloaded and decoded, and earlier results are
+being serialized and uploaded. The infer stage has a single worker: the model
+is fed continuously and never runs two requests at once.
+
+Enabled with GEN3D_PIPELINE=1; predict_fn then submits to the executor and
+waits for the result. Throughput improves whenever several requests are in
+flight in one process (e.g. shared_serving threads or a multi-threaded caller).
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+STAGE_NAMES = ["fetch", "decode", "infer", "encode", "upload"]
+
+# Worker threads per stage. fetch/upload are I/O bound; decode/encode are
+# CPU bound but PIL and numpy release the GIL; infer must stay at 1.
+DEFAULT_STAGE_WORKERS = {
+    "fetch": 8,
+    "decode": 4,
+    "infer": 1,
+    "encode": 2,
+    "upload": 8,
+}
+DEFAULT_QUEUE_SIZE = 16
+
+_STOP = object()
+
+
+class StageStats:
+    """Counters for one pipeline stage."""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.depth_samples = 0
+        self.depth_total = 0
+        self.max_depth = 0
+        self.lock = threading.Lock()
+
+    def record_depth(self, depth):
+        with self.lock:
+            self.depth_samples += 1
+            self.depth_total += depth
+            self.max_depth = max(self.max_depth, depth)
+
+    def record_item(self, seconds, failed=False):
+        with self.lock:
+            self.busy_seconds += seconds
+            if failed:
+                self.failed += 1
+            else:
+                self.processed += 1
+
+
+class PipelineExecutor:
+    """
+    Runs handler task stages in per-stage worker pools connected by bounded queues.
+
+    Args:
+        handler: Inference handler module (provides job_stages, create_job,
+            check_models and failure_response)
+        models: Dictionary of loaded models
+        stage_workers: Optional overrides of DEFAULT_STAGE_WORKERS
+        queue_size: Capacity of each stage's input queue
+    """
+
+    def __init__(self, handler, models, stage_workers=None, queue_size=DEFAULT_QUEUE_SIZE):
+        self.handler = handler
+        self.models = models
+        self.stage_workers = dict(DEFAULT_STAGE_WORKERS, **(stage_workers or {}))
+        self.stage_workers["infer"] = 1
+        self.queue_size = queue_size
+        self.queues = {}
+        self.stats = {}
+        self.threads = []
+        self.started_at = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Start the stage workers (called automatically on first submit)."""
+        with self._start_lock:
+            if self.threads:
+                return
+            self.started_at = time.monotonic()
+            for name in STAGE_NAMES:
+                self.queues[name] = queue.Queue(maxsize=self.queue_size)
+                self.stats[name] = StageStats(name, self.stage_workers[name])
+            for index, name in enumerate(STAGE_NAMES):
+                for i in range(self.stage_workers[name]):
+                    thread = threading.Thread(
+                        target=self._run_stage,
+                        args=(index,),
+                        name=f"pipeline-{name}-{i}",
+                        daemon=True
+                    )
+                    thread.start()
+                    self.threads.append(thread)
+            logger.info(f"Pipeline started with stage workers {self.stage_workers}")
+
+    def shutdown(self):
+        """Stop all stage workers after the queued requests have drained."""
+        for name in STAGE_NAMES:
+            for _ in range(self.stage_workers[name]):
+                self._put(name, _STOP)
+            for thread in [t for t in self.threads if t.name.startswith(f"pipeline-{name}-")]:
+                thread.join()
+        self.threads = []
+
+    def _put(self, stage_name, item):
+        self.queues[stage_name].put(item)
+        self.stats[stage_name].record_depth(self.queues[stage_name].qsize())
+
+    def submit(self, input_data):
+        """
+        Submit a request to the pipeline.
+
+        Blocks when the fetch queue is full, which bounds the number of
+        requests held in memory.
+
+        Args:
+            input_data: Request input with a 'task' field
+
+        Returns:
+            concurrent.futures.Future: Resolves to the task response dict
+        """
+        if not self.threads:
+            self.start()
+
+        future = Future()
+        job = self.handler.create_job(input_data)
+        unavailable = self.handler.check_models(job, self.models)
+        if unavailable is not None:
+            future.set_result(unavailable)
+            return future
+
+        self._put("fetch", (job, future))
+        return future
+
+    def _run_stage(self, index):
+        name = STAGE_NAMES[index]
+        inbox = self.queues[name]
+        stats = self.stats[name]
+        next_name = STAGE_NAMES[index + 1] if index + 1 < len(STAGE_NAMES) else None
+
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                return
+            job, future = item
+
+            stage = dict(self.handler.job_stages(job))[name]
+            start = time.monotonic()
+            try:
+                stage(job, self.models)
+            except Exception as e:
+                stats.record_item(time.monotonic() - start, failed=True)
+                logger.error(f"Pipeline stage '{name}' failed for task '{job['task']}': {e}", exc_info=True)
+                future.set_result(self.handler.failure_response(job["task"], e))
+                continue
+            stats.record_item(time.monotonic() - start)
+
+            if next_name is None or "response" in job:
+                future.set_result(job["response"])
+            else:
+                self._put(next_name, (job, future))
+
+    def queue_depth(self, stage_name):
+        """Number of requests waiting for a stage."""
+        stage_queue = self.queues.get(stage_name)
+        return stage_queue.qsize() if stage_queue is not None else 0
+
+    def metrics(self):
+        """
+        Per-stage queue depth and utilization since start.
+
+        Utilization is busy time divided by (elapsed time x workers).
+
+        Returns:
+            dict: Stage name -> metrics dict
+        """
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        result = {}
+        for name in STAGE_NAMES:
+            stats = self.stats.get(name)
+            if stats is None:
+                continue
+            with stats.lock:
+                result[name] = {
+                    "workers": stats.workers,
+                    "processed": stats.processed,
+                    "failed": stats.failed,
+                    "queue_depth": self.queues[name].qsize(),
+                    "mean_queue_depth": stats.depth_total / stats.depth_samples if stats.depth_samples else 0.0,
+                    "max_queue_depth": stats.max_depth,
+                    "busy_seconds": stats.busy_seconds,
+                    "utilization": stats.busy_seconds / (elapsed * stats.workers) if elapsed else 0.0,
+                }
+        return result
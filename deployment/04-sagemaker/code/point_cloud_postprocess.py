@@ -0,0 +1,215 @@
+"""
+Gen3D Point Cloud Post-Processing
+Optional cleanup between SAM 3D reconstruction and PLY serialization
+
+Steps (each toggled from the generate_3d payload's "postprocess" field):
+- statistical_outlier: drop points whose mean distance to their k nearest
+  neighbours exceeds mean + std_ratio * std over the cloud
+- radius_filter: drop points with fewer than min_neighbors other points
+  within radius (default radius: 3x the median nearest-neighbour spacing)
+- normals: estimate per-point normals by PCA over the k nearest neighbours
+  (at least MIN_NORMAL_NEIGHBORS), oriented towards the camera at the origin
+
+Clouds too small for a step (no more points than the neighbours it needs)
+pass through it unchanged; the report records the skip.
+
+All neighbour queries go through a scipy cKDTree and are processed in fixed
+size chunks, so peak memory stays bounded for multi-million point clouds.
+"""
+
+import logging
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 65536
+MIN_NORMAL_NEIGHBORS = 3  # Fewer points do not span a plane
+
+DEFAULTS = {
+    "statistical_outlier": {"k": 16, "std_ratio": 2.0},
+    "radius_filter": {"radius": None, "min_neighbors": 4},
+    "normals": {"k": 16},
+}
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and bool(np.isfinite(value))
+
+
+def _is_positive_int(value):
+    return _is_number(value) and value == int(value) and value >= 1
+
+
+# Parameter -> (check, conversion, description used in errors)
+PARAMETERS = {
+    "k": (_is_positive_int, int, "a positive integer"),
+    "min_neighbors": (_is_positive_int, int, "a positive integer"),
+    "std_ratio": (lambda value: _is_number(value) and value >= 0, float, "a non-negative number"),
+    "radius": (lambda value: value is None or _is_number(value) and value > 0,
+               lambda value: value if value is None else float(value), "a positive number or null"),
+}
+
+
+def parse_options(options):
+    """
+    Normalize the payload's postprocess field.
+
+    Each step may be given as true/false or as a dict of parameters.
+
+    Args:
+        options: dict from the request, or None
+
+    Returns:
+        dict: Enabled step name -> parameters (empty if nothing enabled)
+
+    Raises:
+        ValueError: For unknown steps or parameters, values other than
+            true/false/dict, and out-of-range parameters
+    """
+    if options is None:
+        return {}
+    if not isinstance(options, dict):
+        raise ValueError(f"Invalid postprocess options: {options!r}. Use an object of steps")
+
+    steps = {}
+    for name, value in options.items():
+        if name not in DEFAULTS:
+            raise ValueError(f"Unknown postprocess step: {name}. Valid steps: {', '.join(DEFAULTS)}")
+        if value is False:
+            continue
+        if value is True:
+            steps[name] = dict(DEFAULTS[name])
+            continue
+        if not isinstance(value, dict):
+            raise ValueError(f"Invalid postprocess step {name}: {value!r}. Use true, false or an object of parameters")
+
+        unknown = set(value) - set(DEFAULTS[name])
+        if unknown:
+            raise ValueError(f"Unknown {name} parameters: {', '.join(sorted(unknown))}. "
+                             f"Valid: {', '.join(DEFAULTS[name])}")
+        params = dict(DEFAULTS[name])
+        for key, raw in value.items():
+            check, convert, expected = PARAMETERS[key]
+            if not check(raw):
+                raise ValueError(f"Invalid {name} {key}: {raw!r}. Use {expected}")
+            params[key] = convert(raw)
+        steps[name] = params
+    return steps
+
+
+def _chunks(n):
+    for start in range(0, n, CHUNK_SIZE):
+        yield start, min(start + CHUNK_SIZE, n)
+
+
+def statistical_outlier_mask(tree, points, k, std_ratio):
+    """Boolean mask of points kept by statistical outlier removal."""
+    mean_distances = np.empty(len(points), dtype=np.float64)
+    for start, end in _chunks(len(points)):
+        distances, _ = tree.query(points[start:end], k=k + 1)  # First neighbour is the point itself
+        mean_distances[start:end] = distances[:, 1:].mean(axis=1)
+
+    threshold = mean_distances.mean() + std_ratio * mean_distances.std()
+    return mean_distances <= threshold
+
+
+def median_spacing(tree, points, sample_size=10000):
+    """Median nearest-neighbour distance, estimated on a sample of points."""
+    if len(points) < 2:
+        return 0.0
+    rng = np.random.default_rng(0)
+    sample = points if len(points) <= sample_size else points[rng.choice(len(points), sample_size, replace=False)]
+    distances, _ = tree.query(sample, k=2)
+    return float(np.median(distances[:, 1]))
+
+
+def radius_filter_mask(tree, points, radius, min_neighbors):
+    """Boolean mask of points with at least min_neighbors neighbours within radius."""
+    keep = np.empty(len(points), dtype=bool)
+    for start, end in _chunks(len(points)):
+        counts = tree.query_ball_point(points[start:end], r=radius, return_length=True)
+        keep[start:end] = counts - 1 >= min_neighbors  # Count includes the point itself
+    return keep
+
+
+def estimate_normals(tree, points, k):
+    """
+    Per-point unit normals from the smallest principal axis of the k-neighbourhood.
+
+    Returns:
+        numpy.ndarray: float32 (N, 3) normals oriented towards the origin
+    """
+    normals = np.empty((len(points), 3), dtype=np.float32)
+    for start, end in _chunks(len(points)):
+        _, indices = tree.query(points[start:end], k=k)
+        neighbours = points[indices]  # (chunk, k, 3)
+        centered = neighbours - neighbours.mean(axis=1, keepdims=True)
+        covariance = np.einsum("nki,nkj->nij", centered, centered) / k
+        _, eigenvectors = np.linalg.eigh(covariance)  # Ascending eigenvalues
+        chunk_normals = eigenvectors[:, :, 0]
+
+        # Orient towards the camera (origin)
+        flip = np.einsum("ni,ni->n", chunk_normals, points[start:end]) > 0
+        chunk_normals[flip] *= -1
+        normals[start:end] = chunk_normals
+    return normals
+
+
+def postprocess_point_cloud(point_cloud, steps):
+    """
+    Apply the enabled post-processing steps.
+
+    Args:
+        point_cloud: Dictionary with 'points' (Nx3) and optional per-point
+            arrays ('colors', ...) of length N; other entries pass through
+        steps: Result of parse_options
+
+    Returns:
+        tuple: (point cloud dict, report dict with points removed per step)
+    """
+    from scipy.spatial import cKDTree
+
+    start_time = time.perf_counter()
+    points = np.ascontiguousarray(point_cloud["points"], dtype=np.float32)
+    # Every other array with one row per point is filtered along with the points
+    per_point = {
+        key: value for key, value in point_cloud.items()
+        if key != "points" and isinstance(value, np.ndarray) and value.ndim and len(value) == len(points)
+    }
+    report = {"input_points": len(points)}
+
+    for name in ("statistical_outlier", "radius_filter"):
+        if name not in steps or len(points) == 0:
+            continue
+        params = steps[name]
+        needed = int(params["k"] if name == "statistical_outlier" else params["min_neighbors"])
+        if len(points) <= needed:
+            report[f"{name}_skipped"] = f"{len(points)} points, needs more than {needed}"
+            continue
+        tree = cKDTree(points)
+        if name == "statistical_outlier":
+            keep = statistical_outlier_mask(tree, points, int(params["k"]), float(params["std_ratio"]))
+        else:
+            radius = params["radius"] or 3 * median_spacing(tree, points)
+            report["radius"] = radius
+            keep = radius_filter_mask(tree, points, float(radius), int(params["min_neighbors"]))
+
+        report[f"{name}_removed"] = int(len(points) - np.count_nonzero(keep))
+        points = points[keep]
+        per_point = {key: value[keep] for key, value in per_point.items()}
+
+    result = dict(point_cloud, points=points, **per_point)
+
+    if "normals" in steps and len(points) >= MIN_NORMAL_NEIGHBORS:
+        k = min(max(int(steps["normals"]["k"]), MIN_NORMAL_NEIGHBORS), len(points))
+        result["normals"] = estimate_normals(cKDTree(points), points, k)
+        report["normals"] = True
+    elif "normals" in steps:
+        report["normals_skipped"] = f"{len(points)} points, needs {MIN_NORMAL_NEIGHBORS}"
+
+    report["output_points"] = len(points)
+    report["seconds"] = time.perf_counter() - start_time
+    logger.info(f"Point cloud post-processing: {report}")
+    return result, report
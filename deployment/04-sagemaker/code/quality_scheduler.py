@@ -0,0 +1,147 @@
+"""
+Gen3D Adaptive Quality Scheduler
+Picks the SAM 3D quality preset that fits a request's latency budget
+
+A generate_3d request may send deadline_ms instead of a quality preset. The
+scheduler predicts the reconstruction time of each preset from a cost model
+fitted to recorded timings (linear in mask and image megapixels, one model per
+preset) and chooses the highest quality whose predicted time, plus the
+expected wait behind requests already queued for inference, fits the deadline.
+When nothing fits, it degrades to the fastest preset.
+
+Every reconstruction is recorded, so the model keeps improving; timings can be
+persisted to a JSON-lines file (GEN3D_TIMINGS_PATH) to survive restarts.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Ordered from highest to lowest quality
+PRESETS = ["high", "balanced", "fast"]
+
+# Prior cost per preset (seconds) used until enough timings are recorded
+DEFAULT_PRESET_SECONDS = {
+    "high": 12.0,
+    "balanced": 5.0,
+    "fast": 2.0,
+}
+MIN_SAMPLES = 5
+MAX_SAMPLES = 500
+RIDGE = 1e-3
+
+
+class CostModel:
+    """Per-preset linear model: seconds = a + b * mask_mp + c * image_mp."""
+
+    def __init__(self):
+        self.samples = {preset: deque(maxlen=MAX_SAMPLES) for preset in PRESETS}
+        self.coefficients = {}
+        self._lock = threading.Lock()
+
+    def add(self, preset, mask_pixels, image_pixels, seconds):
+        with self._lock:
+            self.samples[preset].append((mask_pixels / 1e6, image_pixels / 1e6, seconds))
+            self.coefficients.pop(preset, None)  # Refit lazily
+
+    def _fit(self, preset):
+        samples = np.array(self.samples[preset], dtype=np.float64)
+        features = np.column_stack([np.ones(len(samples)), samples[:, 0], samples[:, 1]])
+        targets = samples[:, 2]
+        # Ridge-regularized least squares keeps the fit stable with few samples
+        gram = features.T @ features + RIDGE * np.eye(3)
+        return np.linalg.solve(gram, features.T @ targets)
+
+    def predict(self, preset, mask_pixels, image_pixels):
+        """Predicted reconstruction seconds for a preset."""
+        with self._lock:
+            if len(self.samples[preset]) < MIN_SAMPLES:
+                return DEFAULT_PRESET_SECONDS[preset]
+            if preset not in self.coefficients:
+                self.coefficients[preset] = self._fit(preset)
+            a, b, c = self.coefficients[preset]
+        return float(max(0.0, a + b * mask_pixels / 1e6 + c * image_pixels / 1e6))
+
+
+class QualityScheduler:
+    """
+    Chooses quality presets for deadline requests and records actual timings.
+
+    Args:
+        timings_path: Optional JSON-lines file to load and append timings
+    """
+
+    def __init__(self, timings_path=None):
+        self.cost_model = CostModel()
+        self.timings_path = timings_path
+        self._file_lock = threading.Lock()
+        if timings_path and os.path.exists(timings_path):
+            self._load(timings_path)
+
+    def _load(self, path):
+        count = 0
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    self.cost_model.add(record["preset"], record["mask_pixels"],
+                                        record["image_pixels"], record["seconds"])
+                    count += 1
+                except (ValueError, KeyError):
+                    continue
+        logger.info(f"Loaded {count} reconstruction timings from {path}")
+
+    def record(self, preset, mask_pixels, image_pixels, seconds):
+        """Record the measured time of a reconstruction."""
+        if preset not in DEFAULT_PRESET_SECONDS:
+            return
+        self.cost_model.add(preset, mask_pixels, image_pixels, seconds)
+        if self.timings_path:
+            record = {"preset": preset, "mask_pixels": int(mask_pixels),
+                      "image_pixels": int(image_pixels), "seconds": seconds}
+            with self._file_lock, open(self.timings_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def choose(self, deadline_ms, mask_pixels, image_pixels, queue_depth=0):
+        """
+        Pick the highest quality preset predicted to finish within the deadline.
+
+        The expected wait for queue_depth requests ahead of this one is
+        estimated with the fastest preset's cost, then subtracted from the
+        budget.
+
+        Args:
+            deadline_ms: Latency budget for the reconstruction
+            mask_pixels: Number of selected mask pixels
+            image_pixels: Number of image pixels
+            queue_depth: Requests waiting for the model ahead of this one
+
+        Returns:
+            dict: preset, predicted_ms, queue_wait_ms and deadline_met (predicted)
+        """
+        queue_wait = queue_depth * self.cost_model.predict(PRESETS[-1], mask_pixels, image_pixels)
+        budget = deadline_ms / 1000.0 - queue_wait
+
+        for preset in PRESETS:
+            predicted = self.cost_model.predict(preset, mask_pixels, image_pixels)
+            if predicted <= budget:
+                return {
+                    "preset": preset,
+                    "predicted_ms": predicted * 1000,
+                    "queue_wait_ms": queue_wait * 1000,
+                    "deadline_met": True,
+                }
+
+        predicted = self.cost_model.predict(PRESETS[-1], mask_pixels, image_pixels)
+        return {
+            "preset": PRESETS[-1],
+            "predicted_ms": predicted * 1000,
+            "queue_wait_ms": queue_wait * 1000,
+            "deadline_met": False,
+        }
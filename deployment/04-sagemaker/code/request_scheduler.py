@@ -0,0 +1,219 @@
+"""
+Gen3D Request Scheduler
+Priority and fair-share ordering of requests in front of predict_fn
+
+Without a scheduler, requests run in arrival order, so a user submitting a
+batch of generate_3d jobs (seconds each) delays every get_embedding call queued
+behind it. This scheduler keeps one queue per task type and orders requests by:
+1. priority: the request's "priority" field, defaulting per task
+   (interactive get_embedding calls rank above generate_3d)
+2. fair share: start-time fair queueing across user_id. Each request gets a
+   virtual finish tag = max(virtual clock, user's previous tag) + task cost,
+   and the smallest tag runs next, so a user's share of the workers does not
+   grow with the number of requests they submit.
+
+Requests are never interrupted mid-flight; a newly arrived higher-priority
+request preempts queued work at the next request boundary.
+
+Enabled with GEN3D_SCHEDULER=1 (GEN3D_SCHEDULER_WORKERS sets concurrency).
+The handler gives each worker thread its own predictor wrapper, since
+set_image stores per-image state.
+
+The scheduler only orders requests that are waiting in the same process at
+the same time. Standard SageMaker model-server workers are separate
+processes that each handle one request at a time, and so are the forked
+request workers of the shared model server on CPU; a scheduler there never
+has more than one request queued and never reorders anything. It is useful
+behind the shared model server on GPU (GEN3D_SHARED_MODEL_SOCKET), whose
+request threads all call predict_fn in one process, or behind another
+multi-threaded caller. model_fn logs a warning when it is enabled elsewhere.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# Default priority per task; higher runs first
+DEFAULT_PRIORITIES = {
+    "get_embedding": 10,
+    "generate_3d": 0,
+}
+
+# Relative cost per task used to advance a user's virtual time
+DEFAULT_TASK_COSTS = {
+    "get_embedding": 1.0,
+    "generate_3d": 5.0,
+}
+
+WAIT_SAMPLES = 1000
+
+
+def parse_priority(value):
+    """
+    Validate a request's priority.
+
+    Accepts integers and integer strings (x-npy and form fields are text).
+
+    Raises:
+        ValueError: For anything else
+    """
+    if not isinstance(value, bool) and not (isinstance(value, float) and not value.is_integer()):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            pass
+    raise ValueError(f"Invalid priority: {value!r}. Use an integer (higher runs first)")
+
+
+class QueueStats:
+    """Wait time statistics for one task queue."""
+
+    def __init__(self):
+        self.enqueued = 0
+        self.dispatched = 0
+        self.waits = []
+
+    def record_wait(self, seconds):
+        self.dispatched += 1
+        self.waits.append(seconds)
+        if len(self.waits) > WAIT_SAMPLES:
+            del self.waits[:len(self.waits) - WAIT_SAMPLES]
+
+    def summary(self, depth):
+        waits = sorted(self.waits)
+        return {
+            "depth": depth,
+            "enqueued": self.enqueued,
+            "dispatched": self.dispatched,
+            "mean_wait_ms": 1000 * sum(waits) / len(waits) if waits else 0.0,
+            "p95_wait_ms": 1000 * waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+            "max_wait_ms": 1000 * waits[-1] if waits else 0.0,
+        }
+
+
+class FairShareScheduler:
+    """
+    Dispatches requests to worker threads by priority and per-user fair share.
+
+    Args:
+        predict: Function called as predict(input_data) by the workers
+        workers: Number of requests run concurrently
+        policy: "fair" (priority + fair share) or "fifo" (arrival order)
+        priorities: Overrides of DEFAULT_PRIORITIES
+        task_costs: Overrides of DEFAULT_TASK_COSTS
+    """
+
+    def __init__(self, predict, workers=1, policy="fair", priorities=None, task_costs=None):
+        if policy not in ("fair", "fifo"):
+            raise ValueError(f"Unknown scheduling policy: {policy}. Valid policies: 'fair', 'fifo'")
+        self.predict = predict
+        self.workers = max(1, workers)
+        self.policy = policy
+        self.priorities = dict(DEFAULT_PRIORITIES, **(priorities or {}))
+        self.task_costs = dict(DEFAULT_TASK_COSTS, **(task_costs or {}))
+
+        self.queues = {}  # task -> heap of (sort key, entry)
+        self.stats = {}
+        self.virtual_time = 0.0
+        self.user_tags = {}
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.threads = []
+
+    def start(self):
+        """Start the worker threads (called automatically on first submit)."""
+        with self.condition:
+            if self.threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run_worker, name=f"scheduler-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+        logger.info(f"Request scheduler started ({self.policy}, {self.workers} workers)")
+
+    def _sort_key(self, task, user_id, priority, seq):
+        if self.policy == "fifo":
+            return (seq,)
+
+        cost = self.task_costs.get(task, 1.0)
+        tag = max(self.virtual_time, self.user_tags.get(user_id, 0.0)) + cost
+        self.user_tags[user_id] = tag
+        return (-priority, tag, seq)
+
+    def submit(self, input_data):
+        """
+        Queue a request.
+
+        Args:
+            input_data: Request input; uses 'task', 'user_id' and optional 'priority'
+
+        Returns:
+            concurrent.futures.Future: Resolves to the predict result
+
+        Raises:
+            ValueError: If the request's priority is not an integer
+        """
+        task = input_data.get("task")
+        user_id = input_data.get("user_id", "unknown")
+        priority = parse_priority(input_data.get("priority", self.priorities.get(task, 0)))
+
+        if not self.threads:
+            self.start()
+        future = Future()
+
+        with self.condition:
+            seq = next(self.sequence)
+            key = self._sort_key(task, user_id, priority, seq)
+            entry = (key, seq, input_data, future, time.monotonic())
+            heapq.heappush(self.queues.setdefault(task, []), entry)
+            self.stats.setdefault(task, QueueStats()).enqueued += 1
+            self.condition.notify()
+        return future
+
+    def _next_entry(self):
+        """Pop the best entry across all task queues (caller holds the lock)."""
+        best_task = None
+        for task, task_queue in self.queues.items():
+            if task_queue and (best_task is None or task_queue[0] < self.queues[best_task][0]):
+                best_task = task
+        if best_task is None:
+            return None, None
+        return best_task, heapq.heappop(self.queues[best_task])
+
+    def _run_worker(self):
+        while True:
+            with self.condition:
+                task, entry = self._next_entry()
+                while entry is None:
+                    self.condition.wait()
+                    task, entry = self._next_entry()
+
+                key, _, input_data, future, enqueued_at = entry
+                if self.policy == "fair":
+                    self.virtual_time = max(self.virtual_time, key[1] - self.task_costs.get(task, 1.0))
+                self.stats[task].record_wait(time.monotonic() - enqueued_at)
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self.predict(input_data))
+            except Exception as e:
+                future.set_exception(e)
+
+    def metrics(self):
+        """
+        Per-queue depth and wait time metrics.
+
+        Returns:
+            dict: Task name -> metrics dict
+        """
+        with self.condition:
+            return {
+                task: stats.summary(len(self.queues.get(task, [])))
+                for task, stats in self.stats.items()
+            }
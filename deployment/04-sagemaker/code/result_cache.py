@@ -0,0 +1,385 @@
+"""
+Gen3D Reconstruction Result Cache
+Skips SAM 3D re-inference for repeated generate_3d requests
+
+Entries are keyed by:
+- the SHA-256 of the uploaded image bytes
+- a canonical mask hash: the thresholded boolean mask downsampled to a coarse
+  grid (majority vote per cell), so resubmitted masks that differ by a few
+  pixels map to the same key
+- the reconstruction parameters (quality preset and any output options)
+
+On put the PLY is copied server-side to a key the cache owns (under
+GEN3D_RESULT_CACHE_OUTPUT_PREFIX, next to the job output), and the entry
+records that key and its ETag. Later jobs may overwrite their own output keys,
+but not the cached copy. On a hit the handler copies the cached object to the
+new output key (conditional on the ETag) instead of reconstructing.
+
+Eviction works from an in-process index of entry ages and sizes, so a put
+does not list the backend. Every INDEX_REFRESH_SECONDS a background thread
+lists the backend keys (one list_objects_v2 pass for S3, returning key and
+LastModified only) to pick up entries written or removed by other instances;
+only entries the index has not seen yet are read.
+
+Backends:
+- S3Backend: entries stored as small JSON objects, shared by all instances
+- LocalDiskBackend: entries stored as JSON files (tests and local runs)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 7 * 24 * 3600  # seconds
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_BYTES = 50 * 1024**3
+DEFAULT_MASK_GRID = 256  # cells on the longest mask side; 0 hashes the exact mask
+DEFAULT_OUTPUT_PREFIX = "cache/outputs/"
+INDEX_REFRESH_SECONDS = 3600
+
+
+def mask_hash(mask_bool, grid=DEFAULT_MASK_GRID):
+    """
+    Hash a boolean mask after canonicalizing it to a coarse grid.
+
+    Args:
+        mask_bool: Boolean mask array (H, W)
+        grid: Number of cells on the longest side; 0 hashes the mask as is
+
+    Returns:
+        str: Hex digest
+    """
+    mask = np.asarray(mask_bool, dtype=bool)
+    height, width = mask.shape
+    if grid and max(height, width) > grid:
+        cell = -(-max(height, width) // grid)  # ceil division
+        pad_h, pad_w = -height % cell, -width % cell
+        padded = np.pad(mask, ((0, pad_h), (0, pad_w)))
+        blocks = padded.reshape(padded.shape[0] // cell, cell, padded.shape[1] // cell, cell)
+        mask = blocks.mean(axis=(1, 3)) > 0.5
+
+    digest = hashlib.sha256()
+    digest.update(np.array(mask.shape, dtype=np.int64).tobytes())
+    digest.update(np.packbits(mask).tobytes())
+    return digest.hexdigest()
+
+
+def cache_key(image_digest, mask_digest, params):
+    """
+    Combine image/mask digests and reconstruction parameters into a cache key.
+
+    Args:
+        image_digest: SHA-256 hex digest of the image bytes
+        mask_digest: Result of mask_hash
+        params: JSON-serializable dict of parameters that affect the output
+
+    Returns:
+        str: Cache key
+    """
+    digest = hashlib.sha256()
+    digest.update(image_digest.encode())
+    digest.update(mask_digest.encode())
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class LocalDiskBackend:
+    """Stores one JSON file per entry in a directory."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key, entry):
+        tmp_path = self._path(key) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self._path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def list_keys(self):
+        """Yield (key, modified_at) for every entry without reading it."""
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                try:
+                    modified_at = os.path.getmtime(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                yield name[:-len(".json")], modified_at
+
+
+class S3Backend:
+    """Stores one JSON object per entry under an S3 prefix."""
+
+    def __init__(self, s3_client, bucket, prefix="cache/reconstruction/"):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def get(self, key):
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self.prefix + key)
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        return json.loads(response['Body'].read())
+
+    def put(self, key, entry):
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=self.prefix + key,
+            Body=json.dumps(entry),
+            ContentType='application/json'
+        )
+
+    def delete(self, key):
+        self.s3_client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+    def list_keys(self):
+        """Yield (key, modified_at) for every entry from the listing metadata alone."""
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"][len(self.prefix):], obj["LastModified"].timestamp()
+
+
+class ResultCache:
+    """
+    TTL- and size-bounded cache of reconstruction outputs.
+
+    Args:
+        backend: LocalDiskBackend or S3Backend (entry metadata)
+        s3_client: Client used to copy outputs into, and delete them from,
+            the cache's own keys
+        output_prefix: Key prefix of the cached output copies
+        ttl: Seconds before an entry expires
+        max_entries: Maximum number of entries kept
+        max_bytes: Maximum total size of the cached outputs
+        mask_grid: Grid size used for canonical mask hashing
+    """
+
+    def __init__(self, backend, s3_client, output_prefix=DEFAULT_OUTPUT_PREFIX, ttl=DEFAULT_TTL,
+                 max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, mask_grid=DEFAULT_MASK_GRID):
+        self.backend = backend
+        self.s3_client = s3_client
+        self.output_prefix = output_prefix
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.mask_grid = mask_grid
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.index = {}  # key -> (created_at, size_bytes, bucket, output_s3_key)
+        self.index_built_at = None
+        self._refresh_thread = None
+        self._lock = threading.Lock()
+
+    def key_for(self, image_digest, mask_bool, params):
+        """Build the cache key for a request (image_digest: SHA-256 of the image bytes)."""
+        return cache_key(image_digest, mask_hash(mask_bool, self.mask_grid), params)
+
+    def get(self, key):
+        """
+        Look up an entry, dropping it if it has expired.
+
+        Returns:
+            dict or None: Entry with bucket, output_s3_key (the cache's copy),
+            etag, size_bytes and the response fields recorded when it was
+            stored
+        """
+        entry = self.backend.get(key)
+        if entry is not None and time.time() - entry["created_at"] > self.ttl:
+            self._delete(key, entry["bucket"], entry["output_s3_key"])
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.bytes_saved += entry["size_bytes"]
+        return entry
+
+    def invalidate(self, key, entry):
+        """Remove an entry whose cached output is missing or was replaced."""
+        self._delete(key, entry["bucket"], entry["output_s3_key"])
+        with self._lock:
+            self.hits -= 1
+            self.misses += 1
+
+    def output_key(self, key):
+        """Key of the cache's own copy of an output."""
+        return f"{self.output_prefix}{key}.ply"
+
+    def put(self, key, bucket, source_s3_key, size_bytes, response):
+        """
+        Copy a reconstruction output into the cache and record it.
+
+        Args:
+            key: Cache key from key_for
+            bucket: Bucket of the output object (the copy is stored there too)
+            source_s3_key: Key the job wrote its output to
+            size_bytes: Size of the output object
+            response: Response fields to replay on a hit
+        """
+        output_key = self.output_key(key)
+        copied = self.s3_client.copy_object(
+            Bucket=bucket, Key=output_key, CopySource={"Bucket": bucket, "Key": source_s3_key}
+        )
+        now = time.time()
+        self.backend.put(key, {
+            "bucket": bucket,
+            "output_s3_key": output_key,
+            "etag": copied.get("CopyObjectResult", {}).get("ETag"),
+            "size_bytes": size_bytes,
+            "created_at": now,
+            "response": response,
+        })
+        with self._lock:
+            self.index[key] = (now, size_bytes, bucket, output_key)
+        self.evict(now)
+
+    def _delete(self, key, bucket, output_s3_key):
+        self.backend.delete(key)
+        try:
+            self.s3_client.delete_object(Bucket=bucket, Key=output_s3_key)
+        except Exception as e:
+            logger.warning(f"Could not delete cached output s3://{bucket}/{output_s3_key}: {e}")
+        with self._lock:
+            self.index.pop(key, None)
+
+    def refresh_index(self):
+        """
+        Reconcile the index with the backend listing.
+
+        Keys no longer listed are dropped (unless put after the listing
+        started), known keys take the newer of their recorded and listed
+        times, and only keys missing from the index are read.
+        """
+        started = time.time()
+        listed = dict(self.backend.list_keys())
+        with self._lock:
+            unknown = [key for key in listed if key not in self.index]
+
+        added = {}
+        for key in unknown:
+            entry = self.backend.get(key)
+            if entry is not None:
+                added[key] = (entry["created_at"], entry["size_bytes"], entry["bucket"], entry["output_s3_key"])
+
+        with self._lock:
+            for key, (created_at, size_bytes, bucket, output_s3_key) in list(self.index.items()):
+                if key in listed:
+                    self.index[key] = (max(created_at, listed[key]), size_bytes, bucket, output_s3_key)
+                elif created_at < started:
+                    del self.index[key]
+            for key, record in added.items():
+                self.index.setdefault(key, record)
+            self.index_built_at = started
+        logger.info(f"Result cache index refreshed: {len(listed)} entries listed, {len(added)} read")
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh_index()
+        except Exception as e:
+            logger.warning(f"Result cache index refresh failed: {e}")
+            with self._lock:
+                self.index_built_at = time.time()  # Retry after the next interval, not on every put
+
+    def evict(self, now=None):
+        """
+        Delete expired entries, then the oldest ones over the size limits.
+
+        A stale index starts a background refresh; this call evicts from the
+        index as it is.
+        """
+        now = now or time.time()
+        with self._lock:
+            stale = self.index_built_at is None or now - self.index_built_at > INDEX_REFRESH_SECONDS
+            if stale and (self._refresh_thread is None or not self._refresh_thread.is_alive()):
+                self._refresh_thread = threading.Thread(
+                    target=self._refresh_in_background, name="result-cache-index", daemon=True
+                )
+                self._refresh_thread.start()
+
+        with self._lock:
+            live = sorted((created_at, key) for key, (created_at, _, _, _) in self.index.items())
+            total_bytes = sum(size for _, size, _, _ in self.index.values())
+            doomed = []
+            while live and (now - live[0][0] > self.ttl or len(live) > self.max_entries
+                            or total_bytes > self.max_bytes):
+                _, key = live.pop(0)
+                doomed.append((key, self.index[key]))
+                total_bytes -= self.index[key][1]
+
+        for key, (_, _, bucket, output_s3_key) in doomed:
+            self._delete(key, bucket, output_s3_key)
+
+    def metrics(self):
+        """Hit/miss counters and bytes of output not regenerated."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+            }
+
+
+def from_environment(s3_client):
+    """
+    Build a ResultCache from GEN3D_RESULT_CACHE* environment variables.
+
+    GEN3D_RESULT_CACHE selects the backend ("s3" or "disk"); unset disables
+    the cache.
+
+    Returns:
+        ResultCache or None
+    """
+    backend_name = os.environ.get("GEN3D_RESULT_CACHE", "").lower()
+    if not backend_name:
+        return None
+
+    if backend_name == "disk":
+        backend = LocalDiskBackend(os.environ.get("GEN3D_RESULT_CACHE_DIR", "/tmp/gen3d-result-cache"))
+    elif backend_name == "s3":
+        backend = S3Backend(
+            s3_client,
+            os.environ.get("GEN3D_RESULT_CACHE_BUCKET", "gen3d-data-bucket"),
+            os.environ.get("GEN3D_RESULT_CACHE_PREFIX", "cache/reconstruction/")
+        )
+    else:
+        raise ValueError(f"Unknown result cache backend: {backend_name}. Valid backends: 's3', 'disk'")
+
+    return ResultCache(
+        backend,
+        s3_client,
+        output_prefix=os.environ.get("GEN3D_RESULT_CACHE_OUTPUT_PREFIX", DEFAULT_OUTPUT_PREFIX),
+        ttl=float(os.environ.get("GEN3D_RESULT_CACHE_TTL", DEFAULT_TTL)),
+        max_entries=int(os.environ.get("GEN3D_RESULT_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+        max_bytes=int(os.environ.get("GEN3D_RESULT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+        mask_grid=int(os.environ.get("GEN3D_CACHE_MASK_GRID", DEFAULT_MASK_GRID)),
+    )
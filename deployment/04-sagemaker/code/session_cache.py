@@ -0,0 +1,155 @@
+"""
+Gen3D Session Cache
+In-process reuse of decoded images and encoder state within a session
+
+A session calls get_embedding and then generate_3d for the same image. Both
+download and decode image_s3_key, and a repeated get_embedding runs the SAM 3
+encoder again. This cache keeps, per (session_id, bucket, image_s3_key):
+- the decoded image array and its decode info (read-only, shared by jobs)
+- the SHA-256 of the image bytes (used by the result cache key)
+- the SAM 3 predictor state after set_image (encoder features and sizes)
+
+Entries expire after a TTL and are evicted least-recently-used first when the
+total size exceeds the memory budget. The cache is per process, so it only
+helps when a session's requests reach the same worker.
+
+Enabled with GEN3D_SESSION_CACHE=1 (GEN3D_SESSION_CACHE_TTL,
+GEN3D_SESSION_CACHE_MAX_BYTES).
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 15 * 60  # seconds
+DEFAULT_MAX_BYTES = 1024**3
+
+# Predictor attributes set by set_image; restoring them skips the encoder
+PREDICTOR_STATE = ("features", "original_size", "input_size", "is_image_set")
+
+
+def value_nbytes(value):
+    """Approximate memory held by a cached value (arrays and tensors)."""
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if hasattr(value, "element_size") and hasattr(value, "numel"):
+        return value.element_size() * value.numel()
+    if isinstance(value, dict):
+        return sum(value_nbytes(v) for v in value.values())
+    return 0
+
+
+def capture_predictor_state(predictor):
+    """Copy the predictor's set_image state (tensors are shared, not cloned)."""
+    return {name: getattr(predictor, name) for name in PREDICTOR_STATE if hasattr(predictor, name)}
+
+
+def restore_predictor_state(predictor, state):
+    """Put a captured set_image state back on the predictor."""
+    for name, value in state.items():
+        setattr(predictor, name, value)
+
+
+class SessionCache:
+    """
+    TTL- and memory-bounded LRU cache of per-session image state.
+
+    Args:
+        ttl: Seconds after the last update before an entry expires
+        max_bytes: Memory budget for cached arrays and tensors
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (updated_at, size, fields)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Look up a session's image.
+
+        Args:
+            key: (session_id, bucket, image_s3_key)
+
+        Returns:
+            dict or None: Cached fields (image_np, image_info, image_digest,
+            predictor_state when recorded)
+        """
+        with self._lock:
+            item = self.entries.get(key)
+            if item is not None and time.monotonic() - item[0] > self.ttl:
+                self._remove(key)
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return dict(item[2])
+
+    def update(self, key, **fields):
+        """Add or merge fields into a session's entry (key as for get), then enforce the budget."""
+        with self._lock:
+            merged = {}
+            if key in self.entries:
+                merged.update(self.entries[key][2])
+                self._remove(key)
+            merged.update(fields)
+
+            size = value_nbytes(merged)
+            if size > self.max_bytes:
+                logger.info(f"Session cache: entry of {size} bytes exceeds the budget, not cached")
+                return
+            self.entries[key] = (time.monotonic(), size, merged)
+            self.total_bytes += size
+            self._evict()
+
+    def _remove(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.total_bytes -= size
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [k for k, (updated_at, _, _) in self.entries.items() if now - updated_at > self.ttl]:
+            self._remove(key)
+            self.evictions += 1
+        while self.total_bytes > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def metrics(self):
+        """Hit/miss counters and current memory use."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+def from_environment():
+    """
+    Build a SessionCache from GEN3D_SESSION_CACHE* environment variables.
+
+    Returns:
+        SessionCache or None when GEN3D_SESSION_CACHE is not "1"
+    """
+    if os.environ.get("GEN3D_SESSION_CACHE", "0") != "1":
+        return None
+    return SessionCache(
+        ttl=float(os.environ.get("GEN3D_SESSION_CACHE_TTL", DEFAULT_TTL)),
+        max_bytes=int(os.environ.get("GEN3D_SESSION_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+    )
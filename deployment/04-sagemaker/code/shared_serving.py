@@ -0,0 +1,366 @@
+"""
+Gen3D Shared Model Server
+Loads SAM3 and SAM3D once and serves requests from many workers
+
+SageMaker model-server workers each call model_fn, so every worker normally
+holds its own copy of the models. When GEN3D_SHARED_MODEL_SOCKET is set, the
+first worker starts a single model server process on that Unix socket and all
+workers forward predict_fn calls to it. The server loads the models once, moves
+CPU tensors into shared memory, freezes the GC heap and then:
+- on CPU: pre-forks request workers that share the model memory copy-on-write
+- on GPU: runs request threads (CUDA cannot be used across fork)
+
+Each request worker gets its own shallow copy of the SAM3 predictor, so
+set_image state is never shared between concurrent requests.
+
+Requests are pickled, so the socket is created owner-only (0600) and every
+connection must pass a challenge with a shared authkey. The key comes from
+GEN3D_SHARED_MODEL_AUTHKEY (hex) when set; otherwise the first worker
+generates one into an owner-only file next to the socket, and hands it to
+the server through that environment variable.
+"""
+
+import copy
+import fcntl
+import gc
+import importlib.util
+import logging
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import get_context
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+STARTUP_TIMEOUT = 900  # seconds; model loading can take several minutes
+AUTHKEY_ENV = "GEN3D_SHARED_MODEL_AUTHKEY"
+SERVER_ENV = "GEN3D_MODEL_SERVER"  # Set in the model server process before model_fn runs
+
+
+def load_authkey(socket_path):
+    """
+    Shared authkey for the model server socket.
+
+    Returns GEN3D_SHARED_MODEL_AUTHKEY when set. Otherwise reads the key file
+    next to the socket, creating it (mode 0600) with a random key on first use.
+
+    Returns:
+        bytes: Authkey for Listener/Client
+    """
+    if os.environ.get(AUTHKEY_ENV):
+        return bytes.fromhex(os.environ[AUTHKEY_ENV])
+
+    key_path = socket_path + ".key"
+    with open(socket_path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            with open(key_path) as f:
+                return bytes.fromhex(f.read().strip())
+        authkey = secrets.token_bytes(32)
+        with os.fdopen(fd, "w") as f:
+            f.write(authkey.hex())
+        return authkey
+
+
+def share_model_memory(models):
+    """
+    Move CPU model parameters into shared memory and freeze the GC heap.
+
+    Args:
+        models: Dictionary of loaded models (as returned by model_fn)
+
+    Returns:
+        int: Number of bytes of tensor storage moved to shared memory
+    """
+    import torch
+
+    modules = []
+    for obj in models.values():
+        if isinstance(obj, torch.nn.Module):
+            modules.append(obj)
+        elif isinstance(getattr(obj, "model", None), torch.nn.Module):
+            modules.append(obj.model)
+
+    shared_bytes = 0
+    for module in modules:
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            if tensor.device.type != "cpu":
+                continue
+            tensor.share_memory_()
+            shared_bytes += tensor.numel() * tensor.element_size()
+
+    # Objects created before fork are never touched by the collector again,
+    # which keeps their pages shared between the forked workers
+    gc.collect()
+    gc.freeze()
+
+    logger.info(f"Shared model memory: {shared_bytes / (1024**2):.1f} MB across {len(modules)} modules")
+    return shared_bytes
+
+
+def worker_models(models):
+    """
+    Create a per-worker view of the models.
+
+    Model weights are shared; only the predictor wrapper (which stores
+    per-image state in set_image) is copied.
+
+    Args:
+        models: Dictionary of loaded models
+
+    Returns:
+        dict: Models dictionary safe to use from one request worker
+    """
+    view = dict(models)
+    if view.get("sam3_predictor") is not None:
+        view["sam3_predictor"] = copy.copy(view["sam3_predictor"])
+    return view
+
+
+def load_handler(handler_path):
+    """Load the inference handler module from its file path."""
+    spec = importlib.util.spec_from_file_location("gen3d_inference_server", handler_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def serve_connections(listener, handler, models):
+    """
+    Accept one request per connection and reply with the prediction.
+
+    Replies are ("ok", result) or ("error", exception).
+    """
+    while True:
+        try:
+            conn = listener.accept()
+        except (AuthenticationError, EOFError, ConnectionError):
+            logger.warning("Model server rejected a connection that failed the authkey challenge")
+            continue
+        except OSError:
+            return  # Listener closed
+
+        with conn:
+            try:
+                message = conn.recv()
+                if message == "ping":
+                    conn.send(("ok", "pong"))
+                    continue
+                result = handler.predict_fn(message, models)
+                conn.send(("ok", result))
+            except EOFError:
+                continue
+            except Exception as e:
+                logger.error(f"Model server request failed: {e}", exc_info=True)
+                try:
+                    conn.send(("error", e))
+                except Exception:
+                    pass
+
+
+def _child_main(listener, handler, models):
+    """Entry point of a forked request worker."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    serve_connections(listener, handler, models)
+
+
+class ModelServer:
+    """
+    Single process that owns the models and serves requests over a Unix socket.
+    """
+
+    def __init__(self, handler_path, model_dir, socket_path, authkey, num_workers=DEFAULT_WORKERS):
+        self.handler_path = handler_path
+        self.model_dir = model_dir
+        self.socket_path = socket_path
+        self.authkey = authkey
+        self.num_workers = max(1, num_workers)
+        self.children = []
+        self.stopping = False
+
+    def serve_forever(self):
+        """Load the models, then run request workers until terminated."""
+        os.environ[SERVER_ENV] = "1"
+        handler = load_handler(self.handler_path)
+        models = handler.model_fn(self.model_dir)
+        device = models.get("device", "cpu")
+
+        if device == "cpu":
+            share_model_memory(models)
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        previous_umask = os.umask(0o177)  # Socket is created owner-only
+        try:
+            listener = Listener(self.socket_path, family="AF_UNIX", backlog=128, authkey=self.authkey)
+        finally:
+            os.umask(previous_umask)
+        os.chmod(self.socket_path, 0o600)
+        logger.info(f"Model server listening on {self.socket_path} ({self.num_workers} workers, device={device})")
+
+        signal.signal(signal.SIGTERM, self._handle_sigterm)
+        try:
+            if device == "cpu":
+                self._run_forked(listener, handler, models)
+            else:
+                self._run_threaded(listener, handler, models)
+        finally:
+            listener.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def _handle_sigterm(self, signum, frame):
+        self.stopping = True
+        for child in self.children:
+            if child.is_alive():
+                child.terminate()
+        raise SystemExit(0)
+
+    def _run_forked(self, listener, handler, models):
+        ctx = get_context("fork")
+
+        def spawn():
+            child = ctx.Process(
+                target=_child_main,
+                args=(listener, handler, worker_models(models)),
+                daemon=True
+            )
+            child.start()
+            return child
+
+        self.children = [spawn() for _ in range(self.num_workers)]
+        while not self.stopping:
+            for i, child in enumerate(self.children):
+                if not child.is_alive():
+                    logger.warning(f"Model server worker {child.pid} exited with {child.exitcode}, restarting")
+                    self.children[i] = spawn()
+            time.sleep(1)
+
+    def _run_threaded(self, listener, handler, models):
+        threads = [
+            threading.Thread(
+                target=serve_connections,
+                args=(listener, handler, worker_models(models)),
+                name=f"model-worker-{i}",
+                daemon=True
+            )
+            for i in range(self.num_workers)
+        ]
+        for thread in threads:
+            thread.start()
+        while not self.stopping:
+            time.sleep(1)
+
+
+class ModelClient:
+    """
+    Lightweight handle used by serving workers in place of the models dict.
+    """
+
+    def __init__(self, socket_path, authkey, start_server=None):
+        self.socket_path = socket_path
+        self.authkey = authkey
+        self.start_server = start_server
+
+    def _request(self, message):
+        with Client(self.socket_path, family="AF_UNIX", authkey=self.authkey) as conn:
+            conn.send(message)
+            status, payload = conn.recv()
+        if status == "error":
+            raise payload
+        return payload
+
+    def ping(self):
+        """Return True if the model server is accepting requests."""
+        try:
+            return self._request("ping") == "pong"
+        except (OSError, EOFError, AuthenticationError):
+            return False
+
+    def predict(self, input_data):
+        """
+        Run predict_fn in the model server.
+
+        If the server has gone away, it is restarted once before giving up.
+        """
+        try:
+            return self._request(input_data)
+        except (ConnectionRefusedError, FileNotFoundError):
+            if self.start_server is None:
+                raise
+            logger.warning("Model server unavailable, restarting it")
+            self.start_server()
+            return self._request(input_data)
+
+
+def connect_or_start(handler_path, model_dir, socket_path, num_workers=DEFAULT_WORKERS,
+                     timeout=STARTUP_TIMEOUT):
+    """
+    Connect to the shared model server, starting it if no worker has yet.
+
+    A file lock next to the socket ensures only one server is started even
+    when several serving workers call model_fn at the same time.
+
+    Args:
+        handler_path: Path to the inference handler script
+        model_dir: Directory where models are stored
+        socket_path: Unix socket path of the model server
+        num_workers: Number of request workers in the model server
+        timeout: Seconds to wait for the server to finish loading models
+
+    Returns:
+        ModelClient: Handle for forwarding predictions
+    """
+    authkey = load_authkey(socket_path)
+
+    def start_server():
+        with open(socket_path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            client = ModelClient(socket_path, authkey)
+            if client.ping():
+                return
+
+            logger.info(f"Starting shared model server on {socket_path}")
+            env = dict(os.environ)
+            env.pop("GEN3D_SHARED_MODEL_SOCKET", None)
+            env[AUTHKEY_ENV] = authkey.hex()
+            # The server's request workers are the processes sharing the cores
+            env.setdefault("GEN3D_INFERENCE_WORKERS", str(num_workers))
+            process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__),
+                 handler_path, model_dir, socket_path, str(num_workers)],
+                env=env,
+                start_new_session=True
+            )
+
+            deadline = time.monotonic() + timeout
+            while not client.ping():
+                if process.poll() is not None:
+                    raise RuntimeError(f"Model server exited during startup with code {process.returncode}")
+                if time.monotonic() > deadline:
+                    process.terminate()
+                    raise RuntimeError(f"Model server did not become ready within {timeout}s")
+                time.sleep(0.5)
+            logger.info("Shared model server is ready")
+
+    start_server()
+    return ModelClient(socket_path, authkey, start_server=start_server)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    handler_path, model_dir, socket_path, num_workers = sys.argv[1:5]
+    ModelServer(handler_path, model_dir, socket_path, load_authkey(socket_path), int(num_workers)).serve_forever()
@@ -0,0 +1,325 @@
+"""
+Gen3D Surface Meshing
+Optional triangle mesh output in place of the dense point cloud
+
+Enabled from the generate_3d payload's "mesh" field (true, or a dict
+overriding the quality preset's defaults):
+- voxelize: bin the points into an occupancy grid with `resolution` voxels
+  along the longest axis, then fill the enclosed interior. The shell is
+  dilated by `closing` voxels before filling (and the solid eroded by the
+  same amount after), which seals gaps between sparse points. By default
+  `closing` covers the largest gap expected between randomly spread points:
+  about sqrt(log2 N) median point spacings for N points
+- extract: smooth the solid occupancy with a Gaussian of `sigma` voxels and
+  extract its 0.5 iso-surface with surface nets (the dual form of marching
+  cubes: one vertex per boundary cell, one quad per crossing grid edge)
+- simplify: merge vertices on a coarser grid (vertex clustering) until the
+  mesh has at most `target_faces` triangles
+
+Vertex colors come from the nearest input point. Every step is vectorized
+over the grid or the surface, so the cost scales with resolution^3 for the
+grid filters and with the surface size for extraction and simplification.
+
+Request parameters are clamped to bounded ranges (resolution, closing,
+sigma, target_faces), and a padded grid above MAX_GRID_VOXELS is rejected
+before it is allocated: the grid filters peak at about 50 bytes per voxel,
+and sparse clouds get a wide closing margin, which pads the grid further.
+"""
+
+import logging
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Per quality preset; requests may override any field
+PRESET_DEFAULTS = {
+    "fast": {"resolution": 64, "target_faces": 10000, "closing": None, "sigma": 1.0},
+    "balanced": {"resolution": 128, "target_faces": 50000, "closing": None, "sigma": 1.0},
+    "high": {"resolution": 256, "target_faces": 200000, "closing": None, "sigma": 1.0},
+}
+PADDING = 3  # Empty voxels around the points, so the surface is closed
+CLOSING_MARGIN = 1.5  # Default dilation over the expected largest gap
+MIN_RESOLUTION = 16
+MAX_RESOLUTION = 384
+MAX_CLOSING_FRACTION = 1 / 8  # closing is at most resolution / 8 voxels
+MAX_SIGMA = 4.0
+MAX_TARGET_FACES = 1_000_000
+MAX_GRID_VOXELS = 36 * 1024**2  # Padded grid, about 1.9 GB at peak
+MAX_SIMPLIFY_ITERATIONS = 8
+LEVEL = 0.5
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and bool(np.isfinite(value))
+
+
+def _is_positive_int(value):
+    return _is_number(value) and value == int(value) and value >= 1
+
+
+def max_closing(resolution):
+    """Largest closing (in voxels) used at a resolution."""
+    return max(1, int(resolution * MAX_CLOSING_FRACTION))
+
+
+def parse_options(options, quality):
+    """
+    Normalize the payload's mesh field.
+
+    Parameters are validated, then clamped: resolution to
+    [MIN_RESOLUTION, MAX_RESOLUTION], closing to max_closing(resolution),
+    sigma to MAX_SIGMA and target_faces to MAX_TARGET_FACES.
+
+    Args:
+        options: true/false, a dict of parameters, or None
+        quality: Quality preset whose defaults fill in missing parameters
+
+    Returns:
+        dict or None: Meshing parameters, or None when meshing is off
+
+    Raises:
+        ValueError: For unknown parameters, or values that are not positive
+            integers (resolution, closing, target_faces) or positive numbers
+            (sigma); closing may also be null (automatic)
+    """
+    if not options:
+        return None
+    params = dict(PRESET_DEFAULTS.get(quality, PRESET_DEFAULTS["balanced"]))
+    if isinstance(options, dict):
+        unknown = set(options) - set(params)
+        if unknown:
+            raise ValueError(f"Unknown mesh parameters: {', '.join(sorted(unknown))}. Valid: {', '.join(params)}")
+        params.update(options)
+    elif options is not True:
+        raise ValueError(f"Invalid mesh options: {options!r}. Use true, false or an object of parameters")
+
+    for name in ("resolution", "target_faces"):
+        if not _is_positive_int(params[name]):
+            raise ValueError(f"Invalid mesh {name}: {params[name]!r}. Use a positive integer")
+    if params["closing"] is not None and not _is_positive_int(params["closing"]):
+        raise ValueError(f"Invalid mesh closing: {params['closing']!r}. Use a positive integer or null")
+    if not (_is_number(params["sigma"]) and params["sigma"] > 0):
+        raise ValueError(f"Invalid mesh sigma: {params['sigma']!r}. Use a positive number")
+
+    params["resolution"] = min(max(int(params["resolution"]), MIN_RESOLUTION), MAX_RESOLUTION)
+    params["target_faces"] = min(int(params["target_faces"]), MAX_TARGET_FACES)
+    if params["closing"] is not None:
+        params["closing"] = min(int(params["closing"]), max_closing(params["resolution"]))
+    params["sigma"] = min(float(params["sigma"]), MAX_SIGMA)
+    return params
+
+
+def voxel_size(points, resolution):
+    """Voxel edge length giving `resolution` voxels along the longest axis."""
+    extent = points.max(axis=0) - points.min(axis=0)
+    return float(extent.max()) / (resolution - 1) or 1.0
+
+
+def occupancy_grid(points, voxel, padding):
+    """
+    Bin points into a boolean voxel grid with `padding` empty voxels on every side.
+
+    Returns:
+        tuple: (grid, origin of voxel (0, 0, 0))
+
+    Raises:
+        ValueError: If the grid would exceed MAX_GRID_VOXELS
+    """
+    origin = points.min(axis=0) - padding * voxel
+    indices = np.floor((points - origin) / voxel).astype(np.int64)
+    shape = tuple(int(n) for n in indices.max(axis=0) + padding + 1)
+    if np.prod(shape, dtype=np.int64) > MAX_GRID_VOXELS:
+        raise ValueError(f"Mesh grid {shape} exceeds {MAX_GRID_VOXELS} voxels; request a lower resolution or closing")
+
+    grid = np.zeros(shape, dtype=bool)
+    grid.flat[np.ravel_multi_index(indices.T, shape)] = True
+    return grid, origin
+
+
+def solid_field(grid, closing, sigma):
+    """
+    Seal gaps, fill the enclosed interior and smooth into a [0, 1] field.
+
+    Dilation and erosion use Euclidean balls of `closing` voxels (thresholded
+    distance transforms), which seal gaps of the same width in every
+    direction. The grid's padding must exceed `closing`, so the dilated shell
+    stays clear of the border and the outside remains one region.
+    """
+    from scipy import ndimage
+
+    shell = ndimage.distance_transform_edt(~grid) <= closing
+    solid = ndimage.binary_fill_holes(shell)
+    del shell
+    solid &= ndimage.distance_transform_edt(solid) > closing
+    return ndimage.gaussian_filter(solid.astype(np.float32), sigma=float(sigma))
+
+
+def surface_nets(field, level=LEVEL):
+    """
+    Extract the level iso-surface of a scalar field as triangles.
+
+    Each grid edge whose endpoints lie on opposite sides of the level emits a
+    quad joining the four cells around it. Each cell's vertex is the mean of
+    the edge crossings it touches. Quads are wound so normals point out of
+    the region above the level.
+
+    Returns:
+        tuple: (float32 (V, 3) vertices in voxel coordinates, int32 (F, 3) faces)
+    """
+    inside = field > level
+    cells_shape = tuple(n - 1 for n in field.shape)
+    corners, crossings = [], []
+    for axis in range(3):
+        u, v = (axis + 1) % 3, (axis + 2) % 3
+        start = tuple(slice(None, -1) if a == axis else slice(None) for a in range(3))
+        end = tuple(slice(1, None) if a == axis else slice(None) for a in range(3))
+        crossing = inside[start] != inside[end]
+        coords = np.argwhere(crossing)
+
+        f0, f1 = field[start][crossing], field[end][crossing]
+        position = coords.astype(np.float32)
+        position[:, axis] += (level - f0) / (f1 - f0)
+        crossings.append(position)
+
+        # The four cells sharing the edge, counter-clockwise around +axis
+        quad = np.empty((len(coords), 4), dtype=np.int64)
+        for i, (du, dv) in enumerate(((0, 0), (1, 0), (1, 1), (0, 1))):
+            cell = coords.copy()
+            cell[:, u] += du - 1
+            cell[:, v] += dv - 1
+            quad[:, i] = np.ravel_multi_index(cell.T, cells_shape)
+        entering = ~inside[start][crossing]  # Inside lies in +axis: the normal points -axis
+        quad[entering] = quad[entering, ::-1]
+        corners.append(quad)
+
+    corners = np.concatenate(corners)
+    if len(corners) == 0:
+        return np.empty((0, 3), dtype=np.float32), np.empty((0, 3), dtype=np.int32)
+
+    _, vertex_ids = np.unique(corners, return_inverse=True)
+    vertex_ids = vertex_ids.reshape(corners.shape)
+    flat_ids = vertex_ids.ravel()
+    edge_points = np.repeat(np.concatenate(crossings), 4, axis=0)  # Aligned with flat_ids
+    counts = np.bincount(flat_ids)
+    vertices = np.stack(
+        [np.bincount(flat_ids, weights=edge_points[:, d]) for d in range(3)], axis=1
+    ) / counts[:, None]
+
+    faces = np.concatenate([vertex_ids[:, [0, 1, 2]], vertex_ids[:, [0, 2, 3]]])
+    return vertices.astype(np.float32), faces.astype(np.int32)
+
+
+def cluster_vertices(vertices, faces, cell_size):
+    """
+    Merge vertices that fall in the same cell of a cubic grid.
+
+    Faces that collapse to an edge or a point are dropped. Faces that land on
+    the same three vertices are summed with their orientation: opposite pairs
+    (a fold flattened by the merge) cancel, so the mesh stays closed.
+    Unreferenced vertices are removed.
+
+    Returns:
+        tuple: (vertices, faces)
+    """
+    keys = np.floor((vertices - vertices.min(axis=0)) / cell_size).astype(np.int64)
+    linear = np.ravel_multi_index(keys.T, tuple(keys.max(axis=0) + 1))
+    _, cluster, counts = np.unique(linear, return_inverse=True, return_counts=True)
+    merged = np.stack(
+        [np.bincount(cluster, weights=vertices[:, d]) for d in range(3)], axis=1
+    ) / counts[:, None]
+
+    faces = cluster[faces]
+    faces = faces[(faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])]
+    # Orientation: +1 for an even rotation of the sorted vertices, -1 for odd
+    rotated = np.argmin(faces, axis=1)
+    faces = np.take_along_axis(faces, (rotated[:, None] + np.arange(3)) % 3, axis=1)
+    sign = np.where(faces[:, 1] < faces[:, 2], 1, -1)
+    keys, first, group = np.unique(np.sort(faces, axis=1), axis=0, return_index=True, return_inverse=True)
+    net = np.bincount(group.ravel(), weights=sign, minlength=len(keys))
+    keep = net != 0
+    faces = keys[keep]
+    flip = net[keep] < 0
+    faces[flip] = faces[flip][:, [0, 2, 1]]
+    faces = faces[np.argsort(first[keep], kind="stable")]
+
+    used, faces = np.unique(faces, return_inverse=True)
+    return merged[used].astype(np.float32), faces.reshape(-1, 3).astype(np.int32)
+
+
+def simplify(vertices, faces, target_faces, voxel):
+    """
+    Reduce a mesh to at most target_faces triangles by vertex clustering.
+
+    The first cell size assumes the face count falls with its square; each
+    further pass grows the cell until the target is met.
+
+    Args:
+        voxel: Spacing of the grid the mesh was extracted on, in vertex units
+    """
+    if len(faces) <= target_faces:
+        return vertices, faces
+
+    cell_size = voxel * np.sqrt(len(faces) / target_faces)
+    for _ in range(MAX_SIMPLIFY_ITERATIONS):
+        simplified_vertices, simplified_faces = cluster_vertices(vertices, faces, cell_size)
+        if len(simplified_faces) <= target_faces:
+            break
+        cell_size *= 1.05 * np.sqrt(len(simplified_faces) / target_faces)
+    return simplified_vertices, simplified_faces
+
+
+def mesh_point_cloud(point_cloud, params):
+    """
+    Build a simplified triangle mesh from a point cloud.
+
+    Args:
+        point_cloud: Dictionary with 'points' (Nx3) and optional 'colors' (Nx3)
+        params: Result of parse_options
+
+    Returns:
+        tuple: (mesh dict with 'points', 'faces' and 'colors' when the input
+        has them, report dict with vertex/face counts and timing)
+    """
+    from scipy.spatial import cKDTree
+    from point_cloud_postprocess import median_spacing
+
+    start_time = time.perf_counter()
+    points = np.ascontiguousarray(point_cloud["points"], dtype=np.float32)
+    report = {"input_points": len(points), "resolution": int(params["resolution"])}
+    if len(points) == 0:
+        raise ValueError("Cannot mesh an empty point cloud")
+
+    tree = cKDTree(points)
+    voxel = voxel_size(points, int(params["resolution"]))
+    closing = params["closing"]
+    if closing is None:
+        largest_gap = np.sqrt(np.log2(max(len(points), 2))) * median_spacing(tree, points)
+        closing = int(np.clip(np.ceil(CLOSING_MARGIN * largest_gap / voxel), 1, max_closing(params["resolution"])))
+    closing = int(closing)
+    report["closing"] = closing
+
+    grid, origin = occupancy_grid(points, voxel, closing + PADDING)
+    field = solid_field(grid, closing, params["sigma"])
+    del grid
+    vertices, faces = surface_nets(field)
+    del field
+    report["extracted_faces"] = len(faces)
+
+    vertices, faces = simplify(vertices, faces, int(params["target_faces"]), 1.0)
+    vertices = (vertices * voxel + origin).astype(np.float32)
+
+    mesh = {"points": vertices, "faces": faces}
+    if point_cloud.get("colors") is not None and len(vertices):
+        _, nearest = tree.query(vertices, k=1)
+        mesh["colors"] = np.asarray(point_cloud["colors"])[nearest]
+
+    report.update(
+        voxel_size=voxel,
+        vertices=len(vertices),
+        faces=len(faces),
+        seconds=time.perf_counter() - start_time,
+    )
+    logger.info(f"Surface meshing: {report}")
+    return mesh, report
@@ -0,0 +1,169 @@
+"""
+Gen3D CPU Thread Tuning
+Per-worker intra-op / inter-op / BLAS thread counts for CPU inference
+
+By default every worker process sizes PyTorch's and the BLAS library's thread
+pools to all cores of the host, so N workers run N x cores threads and thrash.
+The plan divides the detected cores (CPU affinity and cgroup quota aware)
+between the inference workers on the host:
+- intra-op threads per worker = max(1, cores // workers)
+- inter-op threads per worker = 1 (requests already run in parallel)
+- BLAS threads (OpenMP/MKL/OpenBLAS) = intra-op threads
+
+Configuration (environment):
+- GEN3D_THREAD_TUNING: "0" disables tuning (default "1")
+- GEN3D_INFERENCE_WORKERS: inference processes on the host (default:
+  SAGEMAKER_MODEL_SERVER_WORKERS, else 1)
+- GEN3D_INTRA_OP_THREADS, GEN3D_INTER_OP_THREADS, GEN3D_BLAS_THREADS:
+  explicit overrides
+
+BLAS pools read their size when the library loads, so configure_from_environment
+must run before numpy is imported; if it already is, threadpoolctl (optional)
+is used to resize the loaded pools. PyTorch's pools are sized separately by
+apply_torch_threads, so torch can load in parallel with the other imports.
+"""
+
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+BLAS_ENV_VARS = [
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+]
+
+
+def cgroup_cpu_limit():
+    """CPU limit from the cgroup quota (v2 cpu.max or v1 cfs quota), or None."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return max(1, int(int(quota) / int(period)))
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0:
+            return max(1, quota // period)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def detect_cores():
+    """Number of cores this process may use."""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    return min(cores, limit) if limit else cores
+
+
+def configured_workers():
+    """Number of inference worker processes on this host."""
+    value = os.environ.get("GEN3D_INFERENCE_WORKERS") or os.environ.get("SAGEMAKER_MODEL_SERVER_WORKERS")
+    return max(1, int(value)) if value else 1
+
+
+def plan_threads(cores, workers, intra_op=None, inter_op=None, blas=None):
+    """
+    Split cores between workers.
+
+    Args:
+        cores: Cores available on the host
+        workers: Inference worker processes sharing them
+        intra_op, inter_op, blas: Explicit overrides (None = derive)
+
+    Returns:
+        dict: cores, workers, intra_op, inter_op and blas thread counts
+    """
+    intra_op = intra_op or max(1, cores // workers)
+    return {
+        "cores": cores,
+        "workers": workers,
+        "intra_op": intra_op,
+        "inter_op": inter_op or 1,
+        "blas": blas or intra_op,
+    }
+
+
+def set_blas_threads(plan):
+    """
+    Size the BLAS pools: environment variables for libraries not yet loaded,
+    threadpoolctl for numpy if it is already loaded.
+    """
+    for var in BLAS_ENV_VARS:
+        os.environ[var] = str(plan["blas"])
+
+    if "numpy" in sys.modules:
+        try:
+            from threadpoolctl import threadpool_limits
+            threadpool_limits(plan["blas"])
+        except ImportError:
+            logger.warning("numpy already loaded and threadpoolctl not installed; BLAS threads unchanged")
+
+
+def apply_torch_threads(plan):
+    """
+    Size PyTorch's intra-op and inter-op pools and log the plan.
+
+    Returns:
+        dict: The plan, with the thread counts actually in effect
+    """
+    import torch
+
+    torch.set_num_threads(plan["intra_op"])
+    try:
+        torch.set_num_interop_threads(plan["inter_op"])
+    except RuntimeError as e:
+        # Can only be set once, before any inter-op parallel work
+        logger.warning(f"Could not set inter-op threads: {e}")
+
+    applied = dict(plan)
+    applied["intra_op"] = torch.get_num_threads()
+    applied["inter_op"] = torch.get_num_interop_threads()
+    logger.info(
+        f"CPU thread plan: {applied['cores']} cores / {applied['workers']} workers -> "
+        f"intra-op={applied['intra_op']} inter-op={applied['inter_op']} blas={applied['blas']}"
+    )
+    return applied
+
+
+def _int_env(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+def configure_from_environment():
+    """
+    Build the thread plan from the environment and size the BLAS pools.
+
+    Call apply_torch_threads with the result once torch may be imported.
+
+    Returns:
+        dict or None: Thread plan, or None when tuning is disabled
+    """
+    if os.environ.get("GEN3D_THREAD_TUNING", "1") != "1":
+        logger.info("CPU thread tuning disabled (GEN3D_THREAD_TUNING=0)")
+        return None
+
+    plan = plan_threads(
+        detect_cores(),
+        configured_workers(),
+        intra_op=_int_env("GEN3D_INTRA_OP_THREADS"),
+        inter_op=_int_env("GEN3D_INTER_OP_THREADS"),
+        blas=_int_env("GEN3D_BLAS_THREADS"),
+    )
+    set_blas_threads(plan)
+    return plan
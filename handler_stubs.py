@@ -0,0 +1,200 @@
+"""
+Synthetic S3 and SAM 3 / SAM 3D stand-ins shared by the benchmark and check scripts
+
+The stubs implement exactly the interface the inference handler calls:
+- S3: get_object, put_object, upload_fileobj, copy_object (with ETags and
+  CopySourceIfMatch) and delete_object, each with a fixed request latency
+- SAM 3: sam_model_registry["vit_h"](checkpoint=...) -> model with .to/.eval,
+  SAM3Predictor(model).set_image(image) -> .features tensor
+- SAM 3D: SAM3DReconstructor(device=...) / .from_pretrained(checkpoint,
+  device=...) with .eval and .reconstruct(image, mask, quality_preset)
+
+Scripts either pass Synthetic* instances to the handler as `models`, or call
+install_stub_models() before model_fn so the handler loads the stubs itself.
+"""
+import hashlib
+import importlib.util
+import io
+import os
+import sys
+import time
+import types
+
+import numpy as np
+
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "deployment/04-sagemaker/code")
+INFERENCE_SCRIPT = CODE_DIR + "/inference.fixed.py"
+FEATURES_SHAPE = (1, 256, 64, 64)
+
+# Checkpoint layout of the model.tar.gz produced for SageMaker
+STUB_CHECKPOINTS = [
+    "sam3/sam3.pt",
+    "sam3d/checkpoints/pipeline.ckpt",
+]
+
+
+def load_handler():
+    """Load the inference handler module from its file path."""
+    if CODE_DIR not in sys.path:
+        sys.path.insert(0, CODE_DIR)
+    spec = importlib.util.spec_from_file_location("gen3d_inference", INFERENCE_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def create_stub_model_dir(root):
+    """Create a model directory with empty checkpoint files."""
+    for relpath in STUB_CHECKPOINTS:
+        path = os.path.join(root, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "wb").close()
+    return root
+
+
+class NoSuchKey(Exception):
+    pass
+
+
+class PreconditionFailed(Exception):
+    pass
+
+
+class SyntheticS3:
+    """In-memory S3 with fixed request latency."""
+
+    exceptions = types.SimpleNamespace(NoSuchKey=NoSuchKey)
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.objects = {}
+
+    def _read(self, Bucket, Key):
+        try:
+            return self.objects[(Bucket, Key)]
+        except KeyError:
+            raise NoSuchKey(f"s3://{Bucket}/{Key}") from None
+
+    def get_object(self, Bucket, Key):
+        time.sleep(self.latency)
+        return {"Body": io.BytesIO(self._read(Bucket, Key))}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        time.sleep(self.latency)
+        self.objects[(Bucket, Key)] = Body.read() if hasattr(Body, "read") else Body
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None):
+        self.put_object(Bucket, Key, Fileobj.read())
+
+    def copy_object(self, Bucket, Key, CopySource, CopySourceIfMatch=None, **kwargs):
+        time.sleep(self.latency)
+        body = self._read(CopySource["Bucket"], CopySource["Key"])
+        if CopySourceIfMatch is not None and CopySourceIfMatch != self.etag(body):
+            raise PreconditionFailed(f"s3://{CopySource['Bucket']}/{CopySource['Key']}")
+        self.objects[(Bucket, Key)] = body
+        return {"CopyObjectResult": {"ETag": self.etag(body)}}
+
+    def delete_object(self, Bucket, Key):
+        time.sleep(self.latency)
+        self.objects.pop((Bucket, Key), None)
+
+    @staticmethod
+    def etag(body):
+        return f'"{hashlib.md5(body.encode() if isinstance(body, str) else body).hexdigest()}"'
+
+
+class SyntheticFeatures:
+    """Stands in for the torch tensor returned by the predictor."""
+
+    array = None  # Shared across instances: generated once
+
+    def __init__(self):
+        if SyntheticFeatures.array is None:
+            SyntheticFeatures.array = np.random.default_rng(0).standard_normal(FEATURES_SHAPE, dtype=np.float32)
+        self.shape = self.array.shape
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+class SyntheticSam:
+    def to(self, device):
+        return self
+
+    def eval(self):
+        return self
+
+
+class SyntheticPredictor:
+    """SAM 3 predictor whose set_image takes encoder_seconds."""
+
+    encoder_seconds = 0.0
+
+    def __init__(self, model=None, encoder_seconds=None):
+        self.model = model
+        if encoder_seconds is not None:
+            self.encoder_seconds = encoder_seconds
+
+    def set_image(self, image):
+        time.sleep(self.encoder_seconds)
+        self.features = SyntheticFeatures()
+
+
+class SyntheticReconstructor:
+    """
+    SAM 3D reconstructor returning a random colored point cloud.
+
+    num_points is a count, or a dict of counts per quality preset.
+    """
+
+    num_points = 20000
+    reconstruct_seconds = 0.0
+
+    def __init__(self, device=None, num_points=None, reconstruct_seconds=None):
+        self.device = device
+        if num_points is not None:
+            self.num_points = num_points
+        if reconstruct_seconds is not None:
+            self.reconstruct_seconds = reconstruct_seconds
+        self.rng = np.random.default_rng(0)
+
+    @classmethod
+    def from_pretrained(cls, checkpoint, device=None):
+        return cls(device=device)
+
+    def eval(self):
+        return self
+
+    def reconstruct(self, image, mask, quality_preset):
+        time.sleep(self.reconstruct_seconds)
+        n = self.num_points[quality_preset] if isinstance(self.num_points, dict) else self.num_points
+        return {
+            "points": self.rng.normal(size=(n, 3)).astype(np.float32),
+            "colors": self.rng.integers(0, 255, size=(n, 3), dtype=np.uint8)
+        }
+
+
+def synthetic_models(encoder_seconds=0.0, reconstruct_seconds=0.0, num_points=None):
+    """A models dict as returned by model_fn, with synthetic models."""
+    return {
+        "sam3_predictor": SyntheticPredictor(encoder_seconds=encoder_seconds),
+        "sam3d_model": SyntheticReconstructor(num_points=num_points, reconstruct_seconds=reconstruct_seconds),
+        "device": "cpu"
+    }
+
+
+def install_stub_models(encoder_seconds=0.0, reconstruct_seconds=0.0, num_points=None):
+    """Register stub sam3 and sam3d modules for model_fn to import."""
+    predictor = type("SAM3Predictor", (SyntheticPredictor,), {"encoder_seconds": encoder_seconds})
+    reconstructor = type("SAM3DReconstructor", (SyntheticReconstructor,), {
+        "reconstruct_seconds": reconstruct_seconds,
+        "num_points": SyntheticReconstructor.num_points if num_points is None else num_points,
+    })
+    sys.modules["sam3"] = types.SimpleNamespace(
+        sam_model_registry={"vit_h": lambda checkpoint=None: SyntheticSam()}, SAM3Predictor=predictor
+    )
+    sys.modules["sam3d"] = types.SimpleNamespace(SAM3DReconstructor=reconstructor)
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Simulate SageMaker async inference capacity, queueing and cold starts offline
+
+Step 1 measures the handler in a fresh interpreter with stub SAM 3 / SAM 3D
+models and a synthetic S3 (fixed per-request latency): import + model_fn time
+(the container part of a cold start) and the median time of every stage of
+process_initialization and process_reconstruction per quality preset. The stub
+models return instantly, so model compute is added from ENCODER_SECONDS and the
+quality scheduler's per-preset reconstruction priors.
+
+Step 2 replays a request trace through a discrete-event model of an async
+endpoint for each autoscaling policy and worker count:
+- requests wait in the endpoint queue until a worker on an in-service instance
+  is free
+- each instance runs `workers` handler processes; fetch/decode and
+  encode/upload overlap across workers, inference runs one request at a time
+  on the instance's accelerator
+- every EVALUATION_PERIOD the policy compares the period's average backlog
+  (queued + in progress) per instance with its target, launching instances
+  (ready after PROVISION_SECONDS + MODEL_LOAD_SECONDS + the measured import
+  and model_fn time) or, once the backlog has stayed below capacity for the
+  scale-in cooldown, retiring idle ones
+
+Traces are JSON lines, one request per line with the handler's fields (task,
+quality, mask_s3_keys) and an optional "arrival" in seconds from the start of
+the trace; lines without one arrive as a Poisson process at the given rate.
+Missing fields default to a balanced generate_3d request.
+
+Instance-hours are billed over the same window for every policy and worker
+count: until the slowest run has served the trace and scaled back to its
+minimum, so a fixed fleet pays for the idle time an autoscaled one spends in
+its scale-in cooldown.
+
+Usage:
+    python simulate_async_inference.py [trace.jsonl | poisson] [--rate PER_MINUTE] [--duration MINUTES]
+                                       [--workers N ...] [--runs N]
+"""
+import argparse
+import heapq
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+
+from handler_stubs import CODE_DIR
+
+MEASURE_RUNS = 3
+S3_LATENCY = 0.03         # seconds per GET/PUT
+IMAGE_SIZE = 1024         # pixels per side
+STUB_POINTS = {"fast": 50000, "balanced": 200000, "high": 500000}
+
+ENCODER_SECONDS = 0.5     # SAM 3 set_image on the accelerator
+PROVISION_SECONDS = 240.0 # instance launch and container image pull
+MODEL_LOAD_SECONDS = 60.0 # checkpoint download and load (stubs skip this)
+EVALUATION_PERIOD = 60.0  # CloudWatch metric period behind the scaling alarms
+
+WORKER_COUNTS = [1, 2, 4]
+EMBEDDING_SHARE = 0.5     # Share of get_embedding requests in Poisson traces
+QUALITY_MIX = {"fast": 0.3, "balanced": 0.5, "high": 0.2}
+
+# Target tracking on backlog per instance (ApproximateBacklogSizePerInstance)
+POLICIES = {
+    "fixed-1": {"min": 1, "max": 1, "target_backlog": 1, "scale_out_cooldown": 0, "scale_in_cooldown": 0},
+    "fixed-2": {"min": 2, "max": 2, "target_backlog": 1, "scale_out_cooldown": 0, "scale_in_cooldown": 0},
+    "min-1-target-4": {"min": 1, "max": 4, "target_backlog": 4, "scale_out_cooldown": 120,
+                       "scale_in_cooldown": 600},
+    "scale-from-zero": {"min": 0, "max": 4, "target_backlog": 4, "scale_out_cooldown": 120,
+                        "scale_in_cooldown": 600},
+}
+
+MEASURE_SNIPPET = """
+import io, json, logging, statistics, sys, tempfile, time
+sys.path.insert(0, {root!r})
+logging.disable(logging.INFO)
+import numpy as np
+from PIL import Image
+from handler_stubs import SyntheticS3, create_stub_model_dir, install_stub_models, load_handler
+
+install_stub_models(num_points={points!r})
+start = time.perf_counter()
+handler = load_handler()
+import_seconds = time.perf_counter() - start
+
+start = time.perf_counter()
+with tempfile.TemporaryDirectory() as model_dir:
+    models = handler.model_fn(create_stub_model_dir(model_dir))
+model_fn_seconds = time.perf_counter() - start
+
+s3 = SyntheticS3({s3_latency!r})
+handler.s3_client = s3
+rng = np.random.default_rng(0)
+image = rng.integers(0, 255, size=({size}, {size}, 3), dtype=np.uint8)
+mask = np.zeros(({size}, {size}), dtype=np.uint8)
+mask[{size} // 4:3 * {size} // 4, {size} // 4:3 * {size} // 4] = 255
+for key, array, fmt in [("image.jpg", image, "JPEG"), ("mask.png", mask, "PNG")]:
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, format=fmt)
+    s3.objects[("bench", "users/u/sessions/s/" + key)] = buffer.getvalue()
+
+stage_timings = {{}}
+
+
+def timed(name, fn):
+    def stage(job, models):
+        start = time.perf_counter()
+        fn(job, models)
+        key = job["task"] if job["task"] == "get_embedding" else "generate_3d/" + job["quality"]
+        stage_timings.setdefault(key, {{}}).setdefault(name, []).append(time.perf_counter() - start)
+    return stage
+
+
+for task, stages in handler.TASK_STAGES.items():
+    handler.TASK_STAGES[task] = [(name, timed(name, fn)) for name, fn in stages]
+
+request = {{"bucket": "bench", "session_id": "s", "user_id": "u", "image_s3_key": "users/u/sessions/s/image.jpg"}}
+for _ in range({runs}):
+    response = handler.process_initialization(request, models)
+    assert response["status"] == "success", response
+    for quality in {points!r}:
+        response = handler.process_reconstruction(
+            dict(request, mask_s3_key="users/u/sessions/s/mask.png", quality=quality), models
+        )
+        assert response["status"] == "success", response
+
+print(json.dumps({{
+    "import_seconds": import_seconds,
+    "model_fn_seconds": model_fn_seconds,
+    "stages": {{key: {{name: statistics.median(values) for name, values in stages.items()}}
+                for key, stages in stage_timings.items()}},
+}}))
+"""
+
+
+def measure_handler(runs=MEASURE_RUNS):
+    """Cold-start and per-stage handler timings with stub models (fresh interpreter)."""
+    snippet = MEASURE_SNIPPET.format(
+        root=os.path.dirname(os.path.abspath(__file__)), points=STUB_POINTS, s3_latency=S3_LATENCY, size=IMAGE_SIZE, runs=runs
+    )
+    env = dict(os.environ, GEN3D_PIPELINE="0", GEN3D_SCHEDULER="0")
+    env.pop("GEN3D_SHARED_MODEL_SOCKET", None)
+    result = subprocess.run([sys.executable, "-W", "ignore", "-c", snippet],
+                            capture_output=True, text=True, env=env, timeout=1800)
+    if result.returncode != 0:
+        raise RuntimeError(f"Handler measurement failed (code {result.returncode}):\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def service_phases(timings, request):
+    """
+    (pre, infer, post) seconds for a request.
+
+    pre is fetch + decode and post is encode + upload, both on a worker;
+    infer holds the instance's accelerator and includes the model compute
+    the stubs skip.
+    """
+    from quality_scheduler import DEFAULT_PRESET_SECONDS
+
+    if request["task"] == "get_embedding":
+        stages = timings["stages"]["get_embedding"]
+        model_seconds = ENCODER_SECONDS
+    else:
+        stages = timings["stages"][f"generate_3d/{request['quality']}"]
+        model_seconds = DEFAULT_PRESET_SECONDS[request["quality"]] * request["objects"]
+    return (
+        stages["fetch"] + stages["decode"],
+        stages["infer"] + model_seconds,
+        stages["encode"] + stages["upload"],
+    )
+
+
+def trace_request(arrival, fields):
+    return {
+        "arrival": arrival,
+        "task": fields.get("task", "generate_3d"),
+        "quality": fields.get("quality", "balanced"),
+        "objects": len(fields.get("mask_s3_keys") or [None]),
+    }
+
+
+def load_trace(path, rate, seed=0):
+    """Requests from a JSON-lines trace; lines without "arrival" arrive at `rate` per second."""
+    rng = random.Random(seed)
+    clock = 0.0
+    requests = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            fields = json.loads(line)
+            if "arrival" in fields:
+                arrival = float(fields["arrival"])
+            else:
+                clock += rng.expovariate(rate)
+                arrival = clock
+            requests.append(trace_request(arrival, fields))
+    return sorted(requests, key=lambda r: r["arrival"])
+
+
+def poisson_trace(rate, duration, seed=0):
+    """Poisson arrivals at `rate` per second with the EMBEDDING_SHARE / QUALITY_MIX request mix."""
+    rng = random.Random(seed)
+    requests = []
+    clock = rng.expovariate(rate)
+    while clock < duration:
+        if rng.random() < EMBEDDING_SHARE:
+            fields = {"task": "get_embedding"}
+        else:
+            quality = rng.choices(list(QUALITY_MIX), weights=list(QUALITY_MIX.values()))[0]
+            fields = {"task": "generate_3d", "quality": quality}
+        requests.append(trace_request(clock, fields))
+        clock += rng.expovariate(rate)
+    return requests
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))] if values else 0.0
+
+
+class Instance:
+    """One endpoint instance: `workers` handler processes sharing an accelerator."""
+
+    def __init__(self, launched_at, ready_at, workers):
+        self.launched_at = launched_at
+        self.ready_at = ready_at
+        self.terminated_at = None
+        self.ready = False
+        self.idle_workers = workers
+        self.workers = workers
+        self.accelerator_busy = False
+        self.accelerator_queue = []
+
+
+def simulate(requests, timings, policy, workers):
+    """
+    Replay a trace against one autoscaling policy and worker count.
+
+    Returns:
+        dict: Queue wait and latency percentiles, launches, the number of
+        requests that arrived with no instance in service, each instance's
+        (launch, termination or None) span, and the time the trace was served
+        and capacity was back at the minimum
+    """
+    cold_start_seconds = PROVISION_SECONDS + MODEL_LOAD_SECONDS + timings["import_seconds"] + timings["model_fn_seconds"]
+    events = []
+    sequence = 0
+
+    def schedule(time, kind, payload=None):
+        nonlocal sequence
+        heapq.heappush(events, (time, sequence, kind, payload))
+        sequence += 1
+
+    instances = []
+    backlog = []  # Requests waiting for a worker, in arrival order
+    # in_flight counts queued and in-progress requests (the async backlog);
+    # load_area integrates it over the current evaluation period
+    state = {"in_flight": 0, "load_area": 0.0, "load_changed_at": 0.0,
+             "last_scale_out": -math.inf, "low_since": None}
+    waits, latencies = [], []
+    arrived_at_zero = 0
+
+    def launch(now, count):
+        for _ in range(count):
+            instance = Instance(now, now + cold_start_seconds, workers)
+            instances.append(instance)
+            schedule(instance.ready_at, "ready", instance)
+
+    def change_load(now, delta):
+        state["load_area"] += state["in_flight"] * (now - state["load_changed_at"])
+        state["load_changed_at"] = now
+        state["in_flight"] += delta
+
+    def active():
+        return [i for i in instances if i.terminated_at is None]
+
+    def dispatch(now):
+        while backlog:
+            ready = [i for i in active() if i.ready and i.idle_workers]
+            if not ready:
+                return
+            instance = max(ready, key=lambda i: i.idle_workers)
+            request = backlog.pop(0)
+            instance.idle_workers -= 1
+            request["started"] = now
+            request["phases"] = service_phases(timings, request)
+            schedule(now + request["phases"][0], "pre_done", (instance, request))
+
+    def start_inference(now, instance, request):
+        instance.accelerator_busy = True
+        schedule(now + request["phases"][1], "infer_done", (instance, request))
+
+    def evaluate(now):
+        change_load(now, 0)
+        load = state["load_area"] / EVALUATION_PERIOD
+        state["load_area"] = 0.0
+
+        current = active()
+        desired = min(policy["max"], max(policy["min"], math.ceil(load / policy["target_backlog"])))
+        if desired >= len(current):
+            state["low_since"] = None
+        elif state["low_since"] is None:
+            state["low_since"] = now
+
+        if desired > len(current) and now - state["last_scale_out"] >= policy["scale_out_cooldown"]:
+            launch(now, desired - len(current))
+            state["last_scale_out"] = now
+        elif state["low_since"] is not None and now - state["low_since"] >= policy["scale_in_cooldown"]:
+            idle = [i for i in current if i.ready and i.idle_workers == i.workers]
+            for instance in idle[:len(current) - desired]:
+                instance.terminated_at = now
+            state["low_since"] = now
+
+    launch(0.0, policy["min"])
+    for instance in instances:  # Initial capacity is in service when the trace starts
+        instance.ready_at = 0.0
+        instance.ready = True
+    for request in requests:
+        schedule(request["arrival"], "arrival", dict(request))
+    schedule(EVALUATION_PERIOD, "evaluate")
+
+    remaining = len(requests)
+    now = 0.0
+    while events:
+        now, _, kind, payload = heapq.heappop(events)
+        if kind == "arrival":
+            if not any(i.ready for i in active()):
+                arrived_at_zero += 1
+            backlog.append(payload)
+            change_load(now, 1)
+            dispatch(now)
+        elif kind == "ready":
+            if payload.terminated_at is None:
+                payload.ready = True
+                dispatch(now)
+        elif kind == "pre_done":
+            instance, request = payload
+            if instance.accelerator_busy:
+                instance.accelerator_queue.append(request)
+            else:
+                start_inference(now, instance, request)
+        elif kind == "infer_done":
+            instance, request = payload
+            instance.accelerator_busy = False
+            schedule(now + request["phases"][2], "done", (instance, request))
+            if instance.accelerator_queue:
+                start_inference(now, instance, instance.accelerator_queue.pop(0))
+        elif kind == "done":
+            instance, request = payload
+            instance.idle_workers += 1
+            change_load(now, -1)
+            remaining -= 1
+            waits.append(request["started"] - request["arrival"])
+            latencies.append(now - request["arrival"])
+            dispatch(now)
+        elif kind == "evaluate":
+            evaluate(now)
+            # Keep evaluating until the trace is served and capacity is back at the minimum
+            if remaining or len(active()) > policy["min"]:
+                schedule(now + EVALUATION_PERIOD, "evaluate")
+
+    return {
+        "requests": len(latencies),
+        "mean_wait": sum(waits) / len(waits) if waits else 0.0,
+        "p95_wait": percentile(waits, 0.95),
+        "p50_latency": percentile(latencies, 0.5),
+        "p95_latency": percentile(latencies, 0.95),
+        "launches": len(instances) - policy["min"],
+        "arrived_at_zero": arrived_at_zero,
+        "instance_spans": [(i.launched_at, i.terminated_at) for i in instances],
+        "settled_at": max([now] + [r["arrival"] for r in requests]),
+    }
+
+
+def instance_hours(result, window_end):
+    """Instance-hours billed from the start of the trace to window_end."""
+    return sum(
+        (window_end if terminated_at is None else min(terminated_at, window_end)) - launched_at
+        for launched_at, terminated_at in result["instance_spans"]
+    ) / 3600
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace", nargs="?", default="poisson",
+                        help="JSON-lines trace file, or 'poisson' for a generated trace (default)")
+    parser.add_argument("--rate", type=float, default=6.0,
+                        help="requests per minute for Poisson arrivals (default 6)")
+    parser.add_argument("--duration", type=float, default=60.0,
+                        help="minutes of Poisson trace to generate (default 60)")
+    parser.add_argument("--workers", type=int, nargs="+", default=WORKER_COUNTS,
+                        help=f"handler processes per instance to compare (default {WORKER_COUNTS})")
+    parser.add_argument("--runs", type=int, default=MEASURE_RUNS,
+                        help=f"handler measurement runs per request type (default {MEASURE_RUNS})")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    rate = args.rate / 60
+    duration = args.duration * 60
+
+    sys.path.insert(0, CODE_DIR)
+
+    print("=" * 60)
+    print("Gen3D Async Inference Capacity Simulation")
+    print("=" * 60)
+
+    timings = measure_handler(args.runs)
+    print(f"Handler import {timings['import_seconds']:.2f} s, model_fn (stub models) "
+          f"{timings['model_fn_seconds']:.2f} s; cold start = {PROVISION_SECONDS:.0f} s provisioning + "
+          f"{MODEL_LOAD_SECONDS:.0f} s model load + both")
+    print(f"Median handler stage seconds (S3 latency {S3_LATENCY * 1000:.0f} ms, {IMAGE_SIZE}px image):")
+    for key, stages in timings["stages"].items():
+        print(f"  {key:<22} " + "  ".join(f"{name} {seconds:.3f}" for name, seconds in stages.items()))
+
+    if args.trace == "poisson":
+        requests = poisson_trace(rate, duration)
+        print(f"\nTrace: Poisson, {rate * 60:.1f} requests/min for {duration / 60:.0f} min ({len(requests)} requests)")
+    else:
+        requests = load_trace(args.trace, rate)
+        print(f"\nTrace: {args.trace} ({len(requests)} requests)")
+
+    results = [
+        (name, workers, simulate(requests, timings, policy, workers))
+        for name, policy in POLICIES.items()
+        for workers in args.workers
+    ]
+    # Bill every run over the same window: until the slowest run has served
+    # the trace and scaled back to its minimum (including scale-in cooldown)
+    window_end = max(r["settled_at"] for _, _, r in results)
+    print(f"Instance-hours billed over the first {window_end / 3600:.2f} h for every policy")
+
+    print(f"\n{'policy':<17} {'workers':>7} {'wait avg':>9} {'wait p95':>9} {'p50':>8} {'p95':>8} "
+          f"{'inst-h':>7} {'launches':>8} {'at zero':>7}")
+    for name, workers, r in results:
+        print(f"{name:<17} {workers:>7} {r['mean_wait']:>8.1f}s {r['p95_wait']:>8.1f}s "
+              f"{r['p50_latency']:>7.1f}s {r['p95_latency']:>7.1f}s {instance_hours(r, window_end):>7.2f} "
+              f"{r['launches']:>8} {r['arrived_at_zero']:>7}")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Simulate a mixed interactive/batch workload through the request scheduler
+
+Two batch users submit bursts of generate_3d jobs while three interactive users
+send get_embedding calls at random (Poisson) times. The arrivals are generated
+once and replayed open-loop, so both arrival-order (fifo) and priority /
+fair-share (fair) scheduling serve exactly the same requests, using a
+synthetic predict function that sleeps for each task's service time.
+Latency is measured from each request's arrival to its completion.
+
+Usage:
+    python simulate_scheduler.py [workers]
+"""
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, "deployment/04-sagemaker/code")
+from request_scheduler import FairShareScheduler
+
+SERVICE_TIME = {
+    "get_embedding": 0.05,
+    "generate_3d": 0.5,
+}
+BATCH_USERS = {"batch-a": 10, "batch-b": 6}
+INTERACTIVE_USERS = ["alice", "bob", "carol"]
+INTERACTIVE_DURATION = 4.0   # seconds
+INTERACTIVE_MEAN_GAP = 0.4   # seconds between calls per user
+
+
+def synthetic_predict(input_data):
+    time.sleep(SERVICE_TIME[input_data["task"]])
+    return {"status": "success", "task": input_data["task"]}
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))] if values else 0.0
+
+
+def build_trace(seed=0):
+    """Open-loop arrivals as (seconds from start, request), shared by every policy."""
+    rng = random.Random(seed)
+    trace = [
+        (0.0, {"task": "generate_3d", "user_id": user})
+        for user, count in BATCH_USERS.items()
+        for _ in range(count)
+    ]
+    for user in INTERACTIVE_USERS:
+        arrival = rng.expovariate(1 / INTERACTIVE_MEAN_GAP)
+        while arrival < INTERACTIVE_DURATION:
+            trace.append((arrival, {"task": "get_embedding", "user_id": user}))
+            arrival += rng.expovariate(1 / INTERACTIVE_MEAN_GAP)
+    trace.sort(key=lambda item: item[0])  # Stable: batch bursts keep submission order
+    return trace
+
+
+def run_workload(policy, workers, trace):
+    """Replay the trace and return latencies per (task, user) and scheduler metrics."""
+    scheduler = FairShareScheduler(synthetic_predict, workers=workers, policy=policy)
+    scheduler.start()
+    latencies = []
+    lock = threading.Lock()
+
+    def record(request, arrival):
+        def done(future):
+            with lock:
+                latencies.append((request["task"], request["user_id"], time.monotonic() - arrival))
+        return done
+
+    futures = []
+    start = time.monotonic()
+    for offset, request in trace:
+        delay = start + offset - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        future = scheduler.submit(request)
+        future.add_done_callback(record(request, time.monotonic()))
+        futures.append(future)
+
+    for future in futures:
+        future.result()
+    return latencies, scheduler.metrics()
+
+
+if __name__ == "__main__":
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+
+    print("=" * 60)
+    print("Gen3D Request Scheduler Simulation")
+    print("=" * 60)
+    trace = build_trace()
+    print(f"Workers: {workers}; batch users: {BATCH_USERS}; interactive users: {len(INTERACTIVE_USERS)}; "
+          f"{len(trace)} requests\n")
+
+    for policy in ["fifo", "fair"]:
+        latencies, metrics = run_workload(policy, workers, trace)
+        embedding = [l for task, _, l in latencies if task == "get_embedding"]
+        batch = [l for task, _, l in latencies if task == "generate_3d"]
+
+        print(f"Policy: {policy}")
+        print(f"  get_embedding: n={len(embedding)} p50={percentile(embedding, 0.5) * 1000:.0f} ms "
+              f"p95={percentile(embedding, 0.95) * 1000:.0f} ms")
+        print(f"  generate_3d:   n={len(batch)} p50={percentile(batch, 0.5):.2f} s "
+              f"p95={percentile(batch, 0.95):.2f} s")
+        for user in BATCH_USERS:
+            user_latencies = [l for task, u, l in latencies if u == user]
+            print(f"  {user}: mean completion {sum(user_latencies) / len(user_latencies):.2f} s")
+        for task, m in metrics.items():
+            print(f"  queue {task}: dispatched={m['dispatched']} mean wait={m['mean_wait_ms']:.0f} ms "
+                  f"p95 wait={m['p95_wait_ms']:.0f} ms")
+        print()
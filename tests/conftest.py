@@ -0,0 +1,57 @@
+"""
+Fixtures for handler tests
+
+Tests run the inference handler in-process against handler_stubs: a fresh
+handler module per test, an in-memory S3 and stub SAM 3 / SAM 3D modules.
+"""
+import io
+import logging
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import handler_stubs  # noqa: E402
+
+sys.path.insert(0, handler_stubs.CODE_DIR)
+
+
+@pytest.fixture
+def handler():
+    """A freshly loaded handler module using a SyntheticS3."""
+    module = handler_stubs.load_handler()
+    logging.getLogger(module.__name__).setLevel(logging.WARNING)
+    module.s3_client = handler_stubs.SyntheticS3()
+    return module
+
+
+@pytest.fixture
+def load_models(handler, tmp_path, monkeypatch):
+    """Run model_fn against stub models, with extra environment variables."""
+    monkeypatch.setenv("GEN3D_WARMUP", "0")
+    for name in ("sam3", "sam3d"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    handler_stubs.install_stub_models(num_points=2000)
+
+    def load(**env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        return handler.model_fn(handler_stubs.create_stub_model_dir(str(tmp_path)))
+    return load
+
+
+def encode_image(array, fmt="PNG"):
+    """Encode an array with PIL, as a client would upload it."""
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def image_bytes():
+    rng = np.random.default_rng(0)
+    return encode_image(rng.integers(0, 255, size=(64, 64, 3), dtype=np.uint8))
@@ -0,0 +1,111 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+import content_types
+from conftest import encode_image
+
+
+def npy(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    return buffer.getvalue()
+
+
+def multipart(fields, files=()):
+    boundary = "gen3d-test-boundary"
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, data in files:
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{name}.png"\r\n'
+                     f'Content-Type: image/png\r\n\r\n'.encode() + data + b"\r\n")
+    return b"".join(parts) + f"--{boundary}--\r\n".encode(), f"multipart/form-data; boundary={boundary}"
+
+
+def labeled_image():
+    rgba = np.zeros((32, 32, 4), dtype=np.uint8)
+    rgba[..., :3] = 128
+    rgba[4:12, 4:12, 3] = 1
+    rgba[16:28, 16:28, 3] = 2
+    return rgba
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("true", True), (" Yes ", True), ("1", True), ("off", False), ("", False), (0, False), (True, True),
+])
+def test_parse_bool(value, expected):
+    assert content_types.parse_bool(value, "flag") is expected
+
+
+def test_parse_bool_rejects():
+    with pytest.raises(ValueError, match="Invalid boolean for flag"):
+        content_types.parse_bool("maybe", "flag")
+
+
+def test_npy_parameters_decode_json_fields():
+    content_type = ('application/x-npy; task=generate_3d; labeled_mask=true; labels=[2]; '
+                    'postprocess={"normals":true}; mesh={"resolution":64}')
+    fields = content_types.deserialize(npy(labeled_image()), content_type)
+
+    assert fields["labels"] == [2]
+    assert fields["postprocess"] == {"normals": True}
+    assert fields["mesh"] == {"resolution": 64}
+    assert fields["labeled_mask"] == "true"  # Flags are parsed by the handler
+    assert fields["image_array"].shape == (32, 32, 3)
+    assert fields["mask_array"].shape == (32, 32)
+
+
+@pytest.mark.parametrize("mesh, expected", [("true", True), ("yes", "yes"), ('{"closing":2}', {"closing": 2})])
+def test_mesh_may_be_a_flag(mesh, expected):
+    fields = content_types.deserialize(npy(labeled_image()), f"application/x-npy; mesh={mesh}")
+    assert fields["mesh"] == expected
+
+
+@pytest.mark.parametrize("params", ["labels=2", "labels=1,2", "postprocess=normals", "postprocess=true",
+                                    "mesh=[1]", 'mask_s3_keys="a.png"'])
+def test_npy_parameters_reject_malformed_json_fields(params):
+    with pytest.raises(ValueError, match="Give it as JSON"):
+        content_types.deserialize(npy(labeled_image()), f"application/x-npy; {params}")
+
+
+def test_multipart_form_fields_decode_json_fields():
+    image = encode_image(np.zeros((8, 8, 3), dtype=np.uint8))
+    body, content_type = multipart(
+        {"request": json.dumps({"task": "generate_3d"}), "labels": "[1, 3]",
+         "postprocess": '{"statistical_outlier": {"k": 8}}', "session_id": "s1"},
+        files=[("image", image)]
+    )
+    fields = content_types.deserialize(body, content_type)
+
+    assert fields["task"] == "generate_3d"
+    assert fields["labels"] == [1, 3]
+    assert fields["postprocess"] == {"statistical_outlier": {"k": 8}}
+    assert fields["session_id"] == "s1"
+    assert fields["image_bytes"] == image
+
+
+def test_multipart_rejects_malformed_labels():
+    body, content_type = multipart({"labels": "one"})
+    with pytest.raises(ValueError, match="Invalid labels"):
+        content_types.deserialize(body, content_type)
+
+
+def test_json_fields_are_not_decoded_twice():
+    body = json.dumps({"task": "generate_3d", "labels": [1], "mesh": "yes"})
+    fields = content_types.deserialize(body, "application/json")
+    assert fields["labels"] == [1]
+    assert fields["mesh"] == "yes"
+
+
+def test_npy_labeled_request_runs(handler, load_models):
+    models = load_models()
+    content_type = ('application/x-npy; task=generate_3d; session_id=s; user_id=u; labeled_mask=true; '
+                    'labels=[2]; postprocess={"statistical_outlier":true}; inline_output=true')
+    result = handler.predict_fn(handler.input_fn(npy(labeled_image()), content_type), models)
+
+    assert result["status"] == "success", result
+    assert [entry["label"] for entry in result["objects"]] == [2]
+    assert "postprocess" in result["objects"][0]
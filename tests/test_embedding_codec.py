@@ -0,0 +1,51 @@
+import base64
+import json
+
+import numpy as np
+import pytest
+
+import embedding_codec
+
+SHAPE = (1, 8, 4, 4)
+
+
+def features():
+    rng = np.random.default_rng(0)
+    array = rng.standard_normal(SHAPE, dtype=np.float32)
+    array[0, 3] = 0.25  # Constant channel
+    return array
+
+
+def round_trip(original, fmt):
+    stored, dequantization = embedding_codec.encode_embedding(original, fmt)
+    stats = embedding_codec.error_statistics(original, embedding_codec.decode_embedding(stored, dequantization))
+    document = json.loads(json.dumps(embedding_codec.to_document(stored, dequantization, stats), allow_nan=False))
+    stored = np.frombuffer(base64.b64decode(document["embedding"]), dtype=document["dtype"]).reshape(document["shape"])
+    return embedding_codec.decode_embedding(stored, document.get("dequantization")), document
+
+
+@pytest.mark.parametrize("fmt, dtype, tolerance", [("float16", "float16", 1e-2), ("int8", "int8", 0.05)])
+def test_round_trip(fmt, dtype, tolerance):
+    original = features()
+    restored, document = round_trip(original, fmt)
+
+    assert document["dtype"] == dtype
+    assert restored.dtype == np.float32 and restored.shape == SHAPE
+    np.testing.assert_allclose(restored, original, atol=tolerance)
+    np.testing.assert_allclose(restored[0, 3], 0.25, atol=1e-3)
+    assert document["error"]["snr_db"] > 20
+
+
+@pytest.mark.parametrize("fmt", ["float16", "int8"])
+def test_exact_restore_is_valid_json(fmt):
+    original = np.zeros(SHAPE, dtype=np.float32)  # Both codecs restore zeros exactly
+    restored, document = round_trip(original, fmt)
+
+    assert np.array_equal(restored, original)
+    assert document["error"]["rmse"] == 0.0
+    assert document["error"]["snr_db"] is None
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError, match="Unknown embedding format"):
+        embedding_codec.encode_embedding(features(), "bfloat16")
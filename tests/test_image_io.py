@@ -0,0 +1,60 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import image_io
+
+TARGET_SIZE = 64
+
+
+def encode(image, fmt):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def gradient(size=(200, 150)):
+    x = np.linspace(0, 255, size[0], dtype=np.uint8)
+    return np.tile(x, (size[1], 1))
+
+
+@pytest.mark.parametrize("image_mode, fmt", [
+    ("P", "PNG"),
+    ("P", "GIF"),
+    ("1", "TIFF"),
+    ("1", "PNG"),
+    ("I;16", "TIFF"),
+    ("I;16", "PNG"),
+    ("LA", "PNG"),
+    ("RGBA", "PNG"),
+])
+@pytest.mark.parametrize("mode", ["RGB", "L"])
+def test_reduces_any_mode(image_mode, fmt, mode):
+    source = Image.fromarray(gradient()).convert(image_mode)
+    array, info = image_io.decode_image(encode(source, fmt), target_size=TARGET_SIZE, mode=mode)
+
+    assert info["original_size"] == (200, 150)
+    assert info["decoded_size"] == (67, 50)  # reduce(3) rounds partial blocks up
+    assert array.dtype == np.uint8
+    assert array.shape[:2] == (50, 67)
+    assert array.ndim == (3 if mode == "RGB" else 2)
+
+
+def test_palette_reduced_after_conversion():
+    # Averaging palette indices would produce colors that are not in the image
+    source = Image.fromarray(np.tile(np.array([[0, 255]], dtype=np.uint8), (128, 64)), "L").convert("RGB")
+    palette = source.quantize(colors=2)
+    array, _ = image_io.decode_image(encode(palette, "PNG"), target_size=TARGET_SIZE)
+
+    assert array.shape == (64, 64, 3)
+    assert 120 <= array[..., 0].mean() <= 135
+
+
+def test_small_image_is_not_reduced():
+    source = Image.fromarray(gradient((48, 32))).convert("P")
+    array, info = image_io.decode_image(encode(source, "GIF"), target_size=TARGET_SIZE)
+
+    assert info["decoded_size"] == (48, 32)
+    assert array.shape == (32, 48, 3)
@@ -0,0 +1,65 @@
+"""
+Import-time budget for the inference handler
+
+Imports deployment/04-sagemaker/code/inference.fixed.py in a fresh interpreter
+several times; the median import time must stay within the budget and no heavy
+dependency may be imported eagerly. Health checks and worker forks import the
+handler, so it must stay cheap.
+
+GEN3D_IMPORT_BUDGET_MS overrides the budget (e.g. on slow CI hosts).
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+import pytest
+
+from handler_stubs import INFERENCE_SCRIPT
+
+BUDGET_MS = float(os.environ.get("GEN3D_IMPORT_BUDGET_MS", 100))
+RUNS = 5
+
+# Modules that must not be loaded by importing the handler
+HEAVY_MODULES = ["torch", "numpy", "PIL", "boto3", "botocore"]
+
+MEASURE_SNIPPET = f"""
+import importlib.util, json, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("gen3d_inference", {INFERENCE_SCRIPT!r})
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+elapsed_ms = (time.perf_counter() - start) * 1000
+heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+print(json.dumps({{"elapsed_ms": elapsed_ms, "heavy": heavy}}))
+"""
+
+
+def measure_import():
+    """Import the handler in a fresh interpreter and return (elapsed_ms, heavy_modules)"""
+    result = subprocess.run(
+        [sys.executable, "-c", MEASURE_SNIPPET],
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Handler import failed:\n{result.stderr}")
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    return data["elapsed_ms"], data["heavy"]
+
+
+@pytest.fixture(scope="module")
+def imports():
+    return [measure_import() for _ in range(RUNS)]
+
+
+def test_no_heavy_modules_imported_eagerly(imports):
+    heavy = sorted({module for _, loaded in imports for module in loaded})
+    assert not heavy, f"Heavy modules imported eagerly: {', '.join(heavy)}"
+
+
+def test_import_time_within_budget(imports):
+    median_ms = statistics.median(elapsed_ms for elapsed_ms, _ in imports)
+    assert median_ms <= BUDGET_MS, f"Median import {median_ms:.1f} ms exceeds the {BUDGET_MS:.0f} ms budget"
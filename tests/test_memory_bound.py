@@ -0,0 +1,87 @@
+"""
+Peak-RSS regression test for memory-bounded point cloud serialization
+
+Runs the handler's encode and upload stages for generate_3d on a large
+synthetic point cloud, in a fresh interpreter per mode, and compares the peak
+RSS growth with the size of the point arrays. In memory-bounded mode the PLY is
+streamed in chunks to a spooled temp file and uploaded with a managed
+(multipart) transfer, so peak growth must stay near 1x the point-array size.
+"""
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NUM_POINTS = 4_000_000
+MAX_RATIO = 1.25          # Allowed peak growth / point-array bytes
+SLACK_BYTES = 16 * 1024**2  # Chunk buffers, upload parts and allocator noise
+SPOOL_MAX_BYTES = 8 * 1024**2
+
+MEASURE_SNIPPET = """
+import json, os, re, sys
+os.environ["GEN3D_SPOOL_MAX_BYTES"] = {spool!r}
+sys.path.insert(0, {repo_root!r})
+from handler_stubs import SyntheticS3, load_handler
+handler = load_handler()
+import logging; logging.getLogger(handler.__name__).setLevel(logging.WARNING)
+import numpy as np
+
+class SinkS3(SyntheticS3):
+    # Discards uploads, consuming them the way a multipart transfer does: one part at a time
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None):
+        while Fileobj.read(8 * 1024 * 1024):
+            pass
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        pass
+
+handler.s3_client = SinkS3()
+# Peak RSS of this process image; ru_maxrss would carry over the forking pytest process's peak
+kb = lambda: int(re.search(r"VmHWM:\\s+(\\d+)", open("/proc/self/status").read()).group(1)) * 1024
+
+num_points = {num_points}
+rss_before = kb()
+rng = np.random.default_rng(0)
+points = np.empty((num_points, 3), dtype=np.float32)
+colors = np.empty((num_points, 3), dtype=np.uint8)
+for start in range(0, num_points, 1 << 18):
+    end = min(start + (1 << 18), num_points)
+    rng.standard_normal(size=(end - start, 3), dtype=np.float32, out=points[start:end])
+    colors[start:end] = rng.integers(0, 255, size=(end - start, 3), dtype=np.uint8)
+array_bytes = points.nbytes + colors.nbytes
+
+job = handler.create_job({{
+    "task": "generate_3d", "bucket": "check", "image_s3_key": "u/s/image.jpg",
+    "mask_s3_key": "u/s/mask.png", "memory_bounded": {bounded}
+}})
+job["point_cloud"] = {{"points": points, "colors": colors}}
+del points, colors
+handler.encode_point_cloud(job, {{}})
+handler.upload_point_cloud(job, {{}})
+
+print(json.dumps({{"array_bytes": array_bytes, "peak_growth": kb() - rss_before,
+                   "ply_bytes": job["output_size"]}}))
+"""
+
+
+def measure(num_points, bounded):
+    snippet = MEASURE_SNIPPET.format(
+        spool=str(SPOOL_MAX_BYTES), repo_root=REPO_ROOT, num_points=num_points, bounded=bounded
+    )
+    result = subprocess.run([sys.executable, "-c", snippet], capture_output=True, text=True, timeout=600)
+    if result.returncode != 0:
+        raise RuntimeError(f"Measurement failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_memory_bounded_peak_stays_near_array_size():
+    in_memory = measure(NUM_POINTS, bounded=False)
+    bounded = measure(NUM_POINTS, bounded=True)
+
+    assert bounded["ply_bytes"] == in_memory["ply_bytes"]
+    ratio = bounded["peak_growth"] / bounded["array_bytes"]
+    assert bounded["peak_growth"] <= MAX_RATIO * bounded["array_bytes"] + SLACK_BYTES, (
+        f"Memory-bounded peak growth is {ratio:.2f}x the point-array size (limit {MAX_RATIO}x)"
+    )
+    # The in-memory path holds the whole PLY as well, so the check can tell them apart
+    assert in_memory["peak_growth"] > bounded["peak_growth"] + SLACK_BYTES
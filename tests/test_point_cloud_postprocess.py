@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+import point_cloud_postprocess as postprocess
+
+pytest.importorskip("scipy")
+
+
+def cloud(num_points, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        "points": rng.normal(size=(num_points, 3)).astype(np.float32),
+        "colors": rng.integers(0, 255, size=(num_points, 3), dtype=np.uint8),
+    }
+
+
+def run(point_cloud, **options):
+    return postprocess.postprocess_point_cloud(point_cloud, postprocess.parse_options(options))
+
+
+@pytest.mark.parametrize("num_points", [1, 10, 16])
+def test_outlier_filter_keeps_clouds_no_larger_than_k(num_points):
+    result, report = run(cloud(num_points), statistical_outlier=True)
+    assert len(result["points"]) == num_points
+    assert len(result["colors"]) == num_points
+    assert "statistical_outlier_skipped" in report
+
+
+def test_outlier_filter_removes_far_points():
+    point_cloud = cloud(2000)
+    point_cloud["points"][:5] += 100.0
+    result, report = run(point_cloud, statistical_outlier=True)
+    assert report["statistical_outlier_removed"] >= 5
+    assert np.abs(result["points"]).max() < 50
+
+
+def test_radius_filter_keeps_tiny_clouds():
+    result, report = run(cloud(3), radius_filter=True)
+    assert len(result["points"]) == 3
+    assert "radius_filter_skipped" in report
+
+
+@pytest.mark.parametrize("num_points", [1, 2])
+def test_normals_skipped_below_three_points(num_points):
+    result, report = run(cloud(num_points), normals=True)
+    assert "normals" not in result
+    assert "normals_skipped" in report
+
+
+@pytest.mark.parametrize("num_points, k", [(3, 16), (10, 1), (500, 16)])
+def test_normals_are_unit_and_face_the_origin(num_points, k):
+    point_cloud = cloud(num_points)
+    result, report = run(point_cloud, normals={"k": k})
+    normals = result["normals"]
+    assert report["normals"] is True
+    assert normals.shape == (num_points, 3)
+    np.testing.assert_allclose(np.linalg.norm(normals, axis=1), 1.0, rtol=1e-4)
+    assert np.all(np.einsum("ni,ni->n", normals, point_cloud["points"]) <= 1e-6)
+
+
+def test_normals_of_a_plane():
+    rng = np.random.default_rng(0)
+    points = np.column_stack([rng.uniform(-1, 1, size=(400, 2)), np.full(400, 5.0)]).astype(np.float32)
+    result, _ = run({"points": points}, normals=True)
+    np.testing.assert_allclose(result["normals"], np.tile([0, 0, -1], (400, 1)), atol=1e-4)
+
+
+def test_empty_cloud():
+    result, report = run(cloud(0), statistical_outlier=True, radius_filter=True, normals=True)
+    assert len(result["points"]) == 0
+    assert report["output_points"] == 0
+
+
+def test_filters_every_per_point_array():
+    point_cloud = cloud(2000)
+    point_cloud["points"][:5] += 100.0
+    point_cloud["confidence"] = np.arange(2000, dtype=np.float32)
+    point_cloud["label"] = 7
+    result, report = run(point_cloud, statistical_outlier=True)
+
+    kept = len(result["points"])
+    assert kept == 2000 - report["statistical_outlier_removed"]
+    assert len(result["colors"]) == kept
+    assert len(result["confidence"]) == kept
+    assert not np.isin(np.arange(5), result["confidence"]).any()
+    assert result["label"] == 7
+
+
+@pytest.mark.parametrize("options", [
+    {"statistical_outlier": "true"},
+    {"normals": 1},
+    {"radius_filter": None},
+    {"statistical_outlier": {"k": 0}},
+    {"statistical_outlier": {"k": 2.5}},
+    {"statistical_outlier": {"k": "16"}},
+    {"statistical_outlier": {"std_ratio": -1}},
+    {"statistical_outlier": {"std_ratio": float("nan")}},
+    {"radius_filter": {"radius": 0}},
+    {"radius_filter": {"radius": float("inf")}},
+    {"radius_filter": {"min_neighbors": 0}},
+    {"normals": {"k": True}},
+    {"normals": {"radius": 1.0}},
+    {"smoothing": True},
+])
+def test_parse_options_rejects(options):
+    with pytest.raises(ValueError):
+        postprocess.parse_options(options)
+
+
+def test_parse_options_rejects_non_object():
+    with pytest.raises(ValueError, match="object of steps"):
+        postprocess.parse_options("statistical_outlier")
+
+
+def test_parse_options_normalizes():
+    steps = postprocess.parse_options({
+        "statistical_outlier": {"k": 8.0},
+        "radius_filter": {"radius": None, "min_neighbors": 2},
+        "normals": False,
+    })
+    assert steps == {
+        "statistical_outlier": {"k": 8, "std_ratio": 2.0},
+        "radius_filter": {"radius": None, "min_neighbors": 2},
+    }
+    assert isinstance(steps["statistical_outlier"]["k"], int)
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+import handler_stubs
+from request_scheduler import FairShareScheduler, parse_priority
+
+
+@pytest.mark.parametrize("value, expected", [(3, 3), ("7", 7), (" -2 ", -2), (4.0, 4)])
+def test_parse_priority(value, expected):
+    assert parse_priority(value) == expected
+
+
+@pytest.mark.parametrize("value", ["high", "", None, 1.5, True, [1]])
+def test_parse_priority_rejects(value):
+    with pytest.raises(ValueError, match="Invalid priority"):
+        parse_priority(value)
+
+
+def test_bad_priority_is_not_queued():
+    scheduler = FairShareScheduler(lambda request: request)
+    with pytest.raises(ValueError):
+        scheduler.submit({"task": "generate_3d", "priority": "urgent"})
+    assert scheduler.metrics() == {}
+
+
+def test_priority_orders_queued_requests():
+    gate = threading.Event()
+    order = []
+
+    def predict(request):
+        gate.wait()
+        order.append(request["name"])
+
+    scheduler = FairShareScheduler(predict, workers=1)
+    first = scheduler.submit({"task": "generate_3d", "name": "running"})
+    time.sleep(0.05)  # The worker holds "running" while the others queue
+    futures = [
+        scheduler.submit({"task": "generate_3d", "name": "low", "priority": "0"}),
+        scheduler.submit({"task": "generate_3d", "name": "high", "priority": 5}),
+    ]
+    gate.set()
+    for future in [first] + futures:
+        future.result(timeout=5)
+    assert order == ["running", "high", "low"]
+
+
+def test_handler_rejects_bad_priority(handler, load_models, image_bytes):
+    models = load_models(GEN3D_SCHEDULER="1")
+    with pytest.raises(ValueError, match="Invalid priority"):
+        handler.predict_fn({"task": "get_embedding", "image": image_bytes, "priority": "soon"}, models)
+
+
+class RecordingPredictor(handler_stubs.SyntheticPredictor):
+    """Records which threads called set_image on which predictor."""
+
+    calls = []
+
+    def set_image(self, image):
+        self.calls.append((id(self), threading.current_thread().name))
+        time.sleep(0.02)
+        super().set_image(image)
+
+
+def test_scheduler_workers_use_their_own_predictor(handler, load_models, image_bytes, monkeypatch):
+    import sys
+
+    monkeypatch.setattr(sys.modules["sam3"], "SAM3Predictor", RecordingPredictor)
+    monkeypatch.setattr(RecordingPredictor, "calls", [])
+    models = load_models(GEN3D_SCHEDULER="1", GEN3D_SCHEDULER_WORKERS="3")
+    handler.s3_client.objects[("bucket", "u/s/image.png")] = image_bytes
+
+    request = {"task": "get_embedding", "bucket": "bucket", "image_s3_key": "u/s/image.png",
+               "embedding_format": "int8"}
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(handler.predict_fn(dict(request), models)))
+        for _ in range(9)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [r["status"] for r in results] == ["success"] * 9
+    threads_per_predictor = {}
+    for predictor, thread in RecordingPredictor.calls:
+        threads_per_predictor.setdefault(predictor, set()).add(thread)
+    assert len(threads_per_predictor) > 1
+    assert all(len(names) == 1 for names in threads_per_predictor.values())
+    assert id(models["sam3_predictor"]) not in threads_per_predictor
+
+
+def test_warns_when_requests_arrive_one_at_a_time(handler, load_models, caplog):
+    load_models(GEN3D_SCHEDULER="1")
+    assert "cannot reorder" in caplog.text
+
+
+
+def test_concurrent_requests_only_in_threaded_model_server(handler, monkeypatch):
+    assert not handler.receives_concurrent_requests({"device": "cuda"})
+    monkeypatch.setenv("GEN3D_MODEL_SERVER", "1")
+    assert not handler.receives_concurrent_requests({"device": "cpu"})  # Forked request workers
+    assert handler.receives_concurrent_requests({"device": "cuda"})
@@ -0,0 +1,79 @@
+import json
+
+import numpy as np
+
+import handler_stubs
+import result_cache
+from conftest import encode_image
+
+
+def make_cache(directory, s3):
+    return result_cache.ResultCache(result_cache.LocalDiskBackend(str(directory)), s3)
+
+
+def put_entry(cache, s3, key):
+    s3.objects[("bucket", f"outputs/{key}.ply")] = b"ply"
+    cache.put(key, "bucket", f"outputs/{key}.ply", 3, {"status": "success"})
+
+
+def count_reads(monkeypatch, backend):
+    reads = []
+    get = backend.get
+    monkeypatch.setattr(backend, "get", lambda key: reads.append(key) or get(key))
+    return reads
+
+
+def test_refresh_reads_only_unseen_entries(tmp_path, monkeypatch):
+    s3 = handler_stubs.SyntheticS3()
+    writer = make_cache(tmp_path, s3)
+    for key in ("a", "b"):
+        put_entry(writer, s3, key)
+    writer._refresh_thread.join()
+
+    reader = make_cache(tmp_path, s3)
+    reads = count_reads(monkeypatch, reader.backend)
+    reader.refresh_index()
+    assert sorted(reads) == ["a", "b"]
+
+    put_entry(writer, s3, "c")
+    reads.clear()
+    reader.refresh_index()
+    assert reads == ["c"]
+    assert sorted(reader.index) == ["a", "b", "c"]
+
+    writer.backend.delete("a")
+    reader.refresh_index()
+    assert sorted(reader.index) == ["b", "c"]
+
+
+def test_put_refreshes_index_in_background(tmp_path, monkeypatch):
+    s3 = handler_stubs.SyntheticS3()
+    cache = make_cache(tmp_path, s3)
+    put_entry(cache, s3, "a")
+    cache._refresh_thread.join()
+    assert cache.index_built_at is not None
+    assert list(cache.index) == ["a"]
+
+
+def test_hit_reports_its_own_quality_selection(handler, load_models, tmp_path):
+    models = load_models(GEN3D_RESULT_CACHE="disk", GEN3D_RESULT_CACHE_DIR=str(tmp_path / "cache"))
+    rng = np.random.default_rng(0)
+    handler.s3_client.objects[("bucket", "image.png")] = encode_image(
+        rng.integers(0, 255, size=(64, 64, 3), dtype=np.uint8)
+    )
+    mask = np.zeros((64, 64), dtype=np.uint8)
+    mask[16:48, 16:48] = 255
+    handler.s3_client.objects[("bucket", "mask.png")] = encode_image(mask)
+
+    body = json.dumps({
+        "task": "generate_3d", "bucket": "bucket", "session_id": "s", "user_id": "u",
+        "image_s3_key": "image.png", "mask_s3_key": "mask.png", "deadline_ms": 60000,
+    })
+    first = handler.predict_fn(handler.input_fn(body, "application/json"), models)
+    second = handler.predict_fn(handler.input_fn(body, "application/json"), models)
+
+    assert first["cache_hit"] is False and second["cache_hit"] is True, (first, second)
+    assert first["quality_selection"]["actual_ms"] > 0
+    assert second["quality_selection"]["actual_ms"] == 0.0
+    entry = models["result_cache"].backend.get(next(iter(models["result_cache"].index)))
+    assert "quality_selection" not in entry["response"]
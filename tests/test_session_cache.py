@@ -0,0 +1,64 @@
+import base64
+import json
+
+import numpy as np
+
+from conftest import encode_image
+
+
+def embedding_request(handler, models, **fields):
+    body = json.dumps(dict({"task": "get_embedding", "session_id": "s", "user_id": "u"}, **fields))
+    return handler.predict_fn(handler.input_fn(body, "application/json"), models)
+
+
+def test_inline_image_with_session_cache(handler, load_models, image_bytes):
+    models = load_models(GEN3D_SESSION_CACHE="1")
+    image = base64.b64encode(image_bytes).decode()
+
+    for _ in range(2):
+        result = embedding_request(handler, models, image=image)
+        assert result["status"] == "success", result
+        assert "embedding" in result
+    # Nothing to key an inline image on: neither request is cached
+    assert models["session_cache"].metrics()["entries"] == 0
+
+
+def test_s3_image_reuses_session_cache(handler, load_models, image_bytes):
+    models = load_models(GEN3D_SESSION_CACHE="1")
+    handler.s3_client.objects[("bucket", "u/s/image.png")] = image_bytes
+
+    for _ in range(2):
+        result = embedding_request(handler, models, bucket="bucket", image_s3_key="u/s/image.png")
+        assert result["status"] == "success", result
+    metrics = models["session_cache"].metrics()
+    assert metrics["entries"] == 1
+    assert metrics["hits"] == 1
+
+
+def test_same_key_in_another_bucket_is_not_shared(handler, load_models, image_bytes):
+    models = load_models(GEN3D_SESSION_CACHE="1")
+    other = encode_image(np.zeros((64, 64, 3), dtype=np.uint8))
+    handler.s3_client.objects[("bucket-a", "u/s/image.png")] = image_bytes
+    handler.s3_client.objects[("bucket-b", "u/s/image.png")] = other
+
+    results = [
+        embedding_request(handler, models, bucket=bucket, image_s3_key="u/s/image.png", inline_output=True)
+        for bucket in ("bucket-a", "bucket-b")
+    ]
+    assert all(result["status"] == "success" for result in results), results
+    metrics = models["session_cache"].metrics()
+    assert metrics["entries"] == 2
+    assert metrics["hits"] == 0
+
+
+def test_requests_without_session_id_are_not_cached(handler, load_models, image_bytes):
+    models = load_models(GEN3D_SESSION_CACHE="1")
+    handler.s3_client.objects[("bucket", "image.png")] = image_bytes
+
+    for _ in range(2):
+        body = json.dumps({"task": "get_embedding", "bucket": "bucket", "image_s3_key": "image.png"})
+        result = handler.predict_fn(handler.input_fn(body, "application/json"), models)
+        assert result["status"] == "success", result
+    metrics = models["session_cache"].metrics()
+    assert metrics["entries"] == 0
+    assert metrics["hits"] == metrics["misses"] == 0
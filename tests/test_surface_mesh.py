@@ -0,0 +1,141 @@
+import numpy as np
+import pytest
+
+import surface_mesh
+
+pytest.importorskip("scipy")
+
+
+def sphere(num_points, seed=0):
+    """Points spread at random on the unit sphere, with colors."""
+    rng = np.random.default_rng(seed)
+    points = rng.normal(size=(num_points, 3))
+    points /= np.linalg.norm(points, axis=1, keepdims=True)
+    return {
+        "points": points.astype(np.float32),
+        "colors": rng.integers(0, 255, size=(num_points, 3), dtype=np.uint8),
+    }
+
+
+def plane(num_points, seed=0):
+    rng = np.random.default_rng(seed)
+    points = np.column_stack([rng.uniform(-1, 1, size=(num_points, 2)), np.zeros(num_points)])
+    return {"points": points.astype(np.float32)}
+
+
+def assert_watertight(faces):
+    """Every edge is shared by exactly two faces, traversed once in each direction."""
+    directed = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]])
+    edges, inverse, counts = np.unique(np.sort(directed, axis=1), axis=0, return_inverse=True, return_counts=True)
+    assert np.all(counts == 2)
+    direction = np.where(directed[:, 0] < directed[:, 1], 1, -1)
+    assert np.all(np.bincount(inverse.ravel(), weights=direction) == 0)
+
+
+def signed_volume(vertices, faces):
+    a, b, c = (vertices[faces[:, i]].astype(np.float64) for i in range(3))
+    return np.einsum("ij,ij->i", a, np.cross(b, c)).sum() / 6
+
+
+@pytest.mark.parametrize("num_points, quality", [
+    (2000, "fast"),
+    (2000, "balanced"),
+    (20000, "balanced"),
+])
+def test_sparse_sphere_gives_closed_mesh(num_points, quality):
+    point_cloud = sphere(num_points)
+    params = surface_mesh.parse_options(True, quality)
+    mesh, report = surface_mesh.mesh_point_cloud(point_cloud, params)
+
+    assert 0 < report["faces"] <= params["target_faces"]
+    assert_watertight(mesh["faces"])
+    # Outward facing, enclosing about the unit ball, with vertices near the sphere
+    assert signed_volume(mesh["points"], mesh["faces"]) == pytest.approx(4 / 3 * np.pi, rel=0.15)
+    radii = np.linalg.norm(mesh["points"], axis=1)
+    assert np.all(np.abs(radii - 1) < 0.1)
+    assert mesh["colors"].shape == (len(mesh["points"]), 3)
+
+
+def test_surface_nets_output_is_closed():
+    field = np.zeros((12, 12, 12), dtype=np.float32)
+    field[3:9, 4:8, 2:10] = 1.0
+    vertices, faces = surface_mesh.surface_nets(field)
+    assert len(faces) > 0
+    assert_watertight(faces)
+    assert signed_volume(vertices, faces) > 0
+
+
+def test_parse_options():
+    assert surface_mesh.parse_options(False, "fast") is None
+    assert surface_mesh.parse_options({"resolution": 32}, "high")["resolution"] == 32
+    with pytest.raises(ValueError, match="Unknown mesh parameters"):
+        surface_mesh.parse_options({"faces": 10}, "fast")
+
+
+def test_parse_options_clamps():
+    params = surface_mesh.parse_options({"resolution": 4096, "closing": 500, "sigma": 50, "target_faces": 10**9}, "fast")
+    assert params["resolution"] == surface_mesh.MAX_RESOLUTION
+    assert params["closing"] == surface_mesh.max_closing(surface_mesh.MAX_RESOLUTION)
+    assert params["sigma"] == surface_mesh.MAX_SIGMA
+    assert params["target_faces"] == surface_mesh.MAX_TARGET_FACES
+    assert surface_mesh.parse_options({"resolution": 2}, "fast")["resolution"] == surface_mesh.MIN_RESOLUTION
+
+
+@pytest.mark.parametrize("options", [
+    {"resolution": 0},
+    {"resolution": 64.5},
+    {"resolution": "512"},
+    {"closing": 0},
+    {"closing": True},
+    {"sigma": 0},
+    {"sigma": float("nan")},
+    {"target_faces": -1},
+    "yes",
+])
+def test_parse_options_rejects(options):
+    with pytest.raises(ValueError, match="Invalid mesh"):
+        surface_mesh.parse_options(options, "fast")
+
+
+def test_sparse_cloud_closing_is_clamped():
+    params = surface_mesh.parse_options(True, "fast")
+    _, report = surface_mesh.mesh_point_cloud(sphere(200), params)
+    assert report["closing"] == surface_mesh.max_closing(params["resolution"])
+
+
+def test_oversized_grid_is_rejected(monkeypatch):
+    monkeypatch.setattr(surface_mesh, "MAX_GRID_VOXELS", 64**3)
+    with pytest.raises(ValueError, match="exceeds"):
+        surface_mesh.mesh_point_cloud(sphere(2000), surface_mesh.parse_options(True, "fast"))
+
+
+def test_handler_rejects_bad_mesh_options_before_reconstructing(handler, load_models, image_bytes):
+    models = load_models()
+    result = handler.predict_fn(
+        {"task": "generate_3d", "image": image_bytes, "mask": image_bytes, "mesh": {"resolution": -1}}, models
+    )
+    assert result["status"] == "failed"
+    assert "Invalid mesh resolution" in result["error"]
+
+
+def test_open_sheet_keeps_point_cloud(handler):
+    point_cloud = plane(5000)
+    result, report = handler.mesh_for_job({"mesh": True, "quality": "fast"}, point_cloud)
+    assert result is point_cloud
+    assert report["faces"] == 0
+    assert "skipped" in report
+
+
+def test_empty_cloud_keeps_point_cloud(handler):
+    point_cloud = {"points": np.empty((0, 3), dtype=np.float32)}
+    result, report = handler.mesh_for_job({"mesh": True, "quality": "fast"}, point_cloud)
+    assert result is point_cloud
+    assert "skipped" in report
+
+
+def test_merged_scene_counts_fallback_points(handler):
+    meshed, _ = handler.mesh_for_job({"mesh": True, "quality": "fast"}, sphere(2000))
+    sheet, _ = handler.mesh_for_job({"mesh": True, "quality": "fast"}, plane(500))
+    scene = handler.merge_point_clouds([meshed, sheet], [1, 2])
+    assert len(scene["points"]) == len(meshed["points"]) + 500
+    assert "faces" not in scene  # Not every object is a mesh